@@ -1,15 +1,36 @@
+import math
+import os
+
 from dotenv import load_dotenv
-from flask import Flask, jsonify, make_response, Response, request
+from flask import Flask, g, jsonify, make_response, Response, request
+from flask.logging import default_handler
+from app.utils.api_utils import inflight, response_cache
+from app.utils.auth_tokens import token_required, token_signer
+from app.utils import db_utils
 from app.utils.db_utils import check_database_connection, check_table_exists
+from app.utils.logger import configure_logger
+from app.utils import metrics
+from app.utils.password_hasher import HasherBusyError, password_hasher
+from app.utils.rate_limiter import login_throttle
+from app.utils import sql_trace
 # from flask_cors import CORS
 
 from app.models import user_model
+from app.models import damage_model
 from app.models import poke_model
+from app.models import stat_model
+from app.models import team_model
+from app.models import type_model
 
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
+# Route the app's logger through the shared queue instead of Flask's synchronous stderr handler
+app.logger.removeHandler(default_handler)
+configure_logger(app.logger)
+# Per-route request counts and latencies for /api/metrics
+metrics.init_app(app)
 # This bypasses standard security stuff we'll talk about later
 # If you get errors that use words like cross origin or flight,
 # uncomment this
@@ -58,6 +79,102 @@ def db_check() -> Response:
     except Exception as e:
         return make_response(jsonify({'error': str(e)}), 404)
 
+@app.route('/api/cache-stats', methods=['GET'])
+@token_required
+def cache_stats() -> Response:
+    """
+    Route to report the hit/miss/eviction counters of the PokeAPI response cache
+    and of the hydrated Pokemon cache.
+
+    Returns:
+        JSON response with the counters of the in-memory and on-disk tiers,
+        of the coalesced upstream fetches and of the Pokemon cache.
+
+    Raises:
+        401 error if the request has no valid session token.
+    """
+    return make_response(jsonify({
+        'status': 'success',
+        'pokeapi': response_cache.stats(),
+        'pokeapi_inflight': inflight.stats(),
+        'pokemon': poke_model.pokemon_cache.stats()
+    }), 200)
+
+@app.route('/api/hasher-stats', methods=['GET'])
+@token_required
+def hasher_stats() -> Response:
+    """
+    Route to report the password hashing pool: queue depth, completed and
+    rejected hashes, and a latency histogram; and the login throttle.
+
+    Returns:
+        JSON response with the counters of the password hashing pool and of
+        allowed and throttled login attempts.
+
+    Raises:
+        401 error if the request has no valid session token.
+    """
+    return make_response(jsonify({
+        'status': 'success',
+        'password_hasher': password_hasher.stats(),
+        'login_throttle': login_throttle.stats()
+    }), 200)
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_exposition() -> Response:
+    """
+    Route to expose the metrics of every worker process in the Prometheus text format.
+
+    Returns:
+        Text response with request counts and latencies per route, database
+        and PokeAPI calls, cache hits and misses, and password hashing queue times.
+    """
+    response = make_response(metrics.registry.render(), 200)
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+@app.route('/api/query-stats', methods=['GET'])
+@token_required
+def query_stats() -> Response:
+    """
+    Route to report the slowest SQL statements of this worker, with their query plans.
+    Statements are only recorded when the server runs with DB_TRACE=true.
+
+    Query Parameters:
+        - limit (int): number of statements, 10 by default.
+        - sort (str): total (default), mean, max, calls, rows or vm_steps.
+
+    Returns:
+        JSON response with, per normalized statement, its calls, total, mean and
+        max time in ms, rows, VM instructions, slow calls and EXPLAIN QUERY PLAN.
+
+    Raises:
+        400 error if input validation fails.
+        401 error if the request has no valid session token.
+        500 error if fail.
+    """
+    try:
+        limit = int(request.args.get('limit', 10))
+        statements = sql_trace.statement_stats.top(limit, request.args.get('sort', 'total'))
+    except ValueError as e:
+        app.logger.info("Invalid input: %s", e)
+        return make_response(jsonify({'error': f'Invalid input, {e}'}), 400)
+
+    try:
+        with db_utils.get_db_connection(read_only=True) as conn:
+            for statement in statements:
+                statement['plan'] = sql_trace.explain(conn, statement.pop('example'))
+        return make_response(jsonify({
+            'status': 'success',
+            'enabled': db_utils.DB_TRACE,
+            'pid': os.getpid(),
+            'slow_query_ms': sql_trace.statement_stats.slow_ms,
+            'statements': statements
+        }), 200)
+    except Exception as e:
+        app.logger.error(f"Error reporting query stats: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 @app.route('/api/create-account', methods=['POST'])
 def create_account() -> Response:
     """
@@ -71,6 +188,7 @@ def create_account() -> Response:
         JSON response indicating the success of account creation.
     Raises:
         400 error ifinput validation fails.
+        503 error if password hashing is overloaded.
         500 error if account creation fails.
     """
     app.logger.info("Creating account...")
@@ -88,6 +206,9 @@ def create_account() -> Response:
         user_model.create_account(username=username, password=password)
         app.logger.info("User created: %s ", username)
         return make_response(jsonify({'status': 'success', 'user': username}), 200)
+    except HasherBusyError as e:
+        app.logger.warning("Failed to add user: %s", str(e))
+        return make_response(jsonify({'error': str(e)}), 503)
     except Exception as e:
         app.logger.error("Failed to add user: %s", str(e))
         return make_response(jsonify({'error': str(e)}), 500)
@@ -105,6 +226,7 @@ def update_password() -> Response:
         JSON response indicating the success of password updating.
     Raises:
         400 error ifinput validation fails.
+        503 error if password hashing is overloaded.
         500 error if password fails to update.
     """
     app.logger.info("Updating password...")
@@ -122,6 +244,9 @@ def update_password() -> Response:
         app.logger.info('Updating password for user %s,', username )
         user_model.update_password(username=username, password=new)
         return make_response(jsonify({'status': 'success', 'user': username}), 200)
+    except HasherBusyError as e:
+        app.logger.warning("Failed to update password: %s", str(e))
+        return make_response(jsonify({'error': str(e)}), 503)
     except Exception as e:
         app.logger.error("Failed to update password: %s", str(e))
         return make_response(jsonify({'error': str(e)}), 500)
@@ -136,10 +261,14 @@ def login() -> Response:
         - password (str): password of the account to log in on
 
     Returns:
-        JSON response indicating the success of password updating.
+        JSON response indicating the success of the login, with a signed session
+        token (token, expires_in) to send as "Authorization: Bearer <token>".
     Raises:
         400 error ifinput validation fails.
         401 error if username or password is invalid
+        429 error if the username or client address made too many attempts,
+            with a Retry-After header; checked before any password hashing.
+        503 error if password hashing is overloaded.
         500 error if login fails.
     """
     app.logger.info("Updating password...")
@@ -153,16 +282,60 @@ def login() -> Response:
             app.logger.info("Invalid input: must have Username and password ")
             return make_response(jsonify({'error': 'Invalid input, all fields are required with valid values'}), 400)
 
+        retry_after = login_throttle.check(str(username), request.remote_addr)
+        if retry_after:
+            app.logger.warning("Throttled login for %s from %s", username, request.remote_addr)
+            response = make_response(jsonify({'error': 'Too many login attempts, try again later'}), 429)
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response
+
         if user_model.login(username, password):
-            return make_response(jsonify({'status': 'success', 'message': "User login successful"}), 200)
+            login_throttle.succeeded(str(username))
+            return make_response(jsonify({
+                'status': 'success',
+                'message': "User login successful",
+                'token': token_signer.issue(username),
+                'expires_in': token_signer.ttl
+            }), 200)
         else:
             return make_response(jsonify({'status': 'error', 'message': "Invalid username or password"}), 401)
         
 
+    except HasherBusyError as e:
+        app.logger.warning("Failed to login user: %s", str(e))
+        return make_response(jsonify({'error': str(e)}), 503)
     except Exception as e:
         app.logger.error("Failed to login user: %s", str(e))
         return make_response(jsonify({'error': str(e)}), 500)
 
+@app.route('/api/logout', methods=['POST'])
+@token_required
+def logout() -> Response:
+    """
+    Route to revoke the session token sent with the request.
+
+    Returns:
+        JSON response indicating the token was revoked.
+    Raises:
+        401 error if the token is missing, invalid, expired or already revoked.
+    """
+    token_signer.revoke(g.token_claims)
+    app.logger.info("Logged out user %s", g.username)
+    return make_response(jsonify({'status': 'success', 'user': g.username}), 200)
+
+@app.route('/api/whoami', methods=['GET'])
+@token_required
+def whoami() -> Response:
+    """
+    Route to identify the user of a session token.
+
+    Returns:
+        JSON response with the username the token was issued to.
+    Raises:
+        401 error if the token is missing, invalid, expired or revoked.
+    """
+    return make_response(jsonify({'status': 'success', 'user': g.username}), 200)
+
 @app.route('/api/clear-users', methods=['DELETE'])
 def clear_users() -> Response:
     """
@@ -201,6 +374,35 @@ def create_pokemon_by_name(name: str) -> Response:
         app.logger.error(f"Error creating pokemon: {e}")
         return make_response(jsonify({'error': str(e)}), 500)    
 
+@app.route('/api/create-pokemon-batch', methods=['POST'])
+def create_pokemon_batch() -> Response:
+    """
+    Route create many base pokemon by name in one call
+
+    Expected JSON Input:
+        - names (List[str]): names of the pokemon, repeated names create several pokemon
+
+    Returns:
+        results (List[dict]) : per name, either its pokemon_id or the error
+
+    Raises:
+        400 error if input validation fails.
+        500 error if fail.
+    """
+    try:
+        data = request.get_json()
+        names = data.get('names')
+        if not isinstance(names, list) or not names or not all(isinstance(name, str) and name for name in names):
+            app.logger.info("Invalid input: names must be a non-empty list of strings")
+            return make_response(jsonify({'error': 'Invalid input, names must be a non-empty list of strings'}), 400)
+
+        app.logger.info("Creating %d pokemon", len(names))
+        results = poke_model.create_pokemon_batch(names)
+        return make_response(jsonify({'status': 'success', 'results': results}), 200)
+    except Exception as e:
+        app.logger.error(f"Error creating pokemon: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 @app.route('/api/get-pokemon-by-id/<int:id>', methods=['GET'])
 def get_pokemond_by_id(id: int) -> Response:
     """
@@ -221,7 +423,165 @@ def get_pokemond_by_id(id: int) -> Response:
         return make_response(jsonify({'status': 'success', 'pokemon': pokemon}), 200)
     except Exception as e:
         app.logger.error(f"Error creating pokemon: {e}")
-        return make_response(jsonify({'error': str(e)}), 500)    
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/pokemon', methods=['GET'])
+def get_pokemon_by_ids() -> Response:
+    """
+    Route get many pokemon by id in one call
+
+    Query Parameters:
+        - ids (str): comma separated IDs of the pokemon, e.g. ?ids=1,2,3
+
+    Returns:
+        pokemon (List[Pokemon]) : Pokemon objects found, in the requested order
+        missing (List[int]) : requested IDs that do not exist
+
+    Raises:
+        400 error if input validation fails.
+        500 error if fail.
+    """
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        app.logger.info("Invalid input: ids must be comma separated integers")
+        return make_response(jsonify({'error': 'Invalid input, ids must be comma separated integers'}), 400)
+    if not ids:
+        return make_response(jsonify({'error': 'Invalid input, at least one id is required'}), 400)
+
+    app.logger.info("Fetching %d pokemon", len(ids))
+    try:
+        pokemons = poke_model.get_pokemon_by_ids(ids)
+        found = {pokemon.id for pokemon in pokemons}
+        missing = [i for i in ids if i not in found]
+        return make_response(jsonify({'status': 'success', 'pokemon': pokemons, 'missing': missing}), 200)
+    except Exception as e:
+        app.logger.error(f"Error fetching pokemon: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/pokemon/<int:id>/stats', methods=['GET'])
+def get_pokemon_stats(id: int) -> Response:
+    """
+    Route get the in-game stats of a pokemon
+
+    Args:
+        id (int): ID of the pokemon
+
+    Query Parameters:
+        - level (int): 1 to 100, 100 by default
+        - ivs (str): one IV for every stat or six comma separated, 31 by default
+        - nature (str): e.g. adamant, neutral by default
+
+    Returns:
+        stats (dict) : final hp, attack, defense, special_attack, special_defense and speed
+
+    Raises:
+        400 error if input validation fails or the pokemon does not exist.
+        500 error if fail.
+    """
+    try:
+        level = int(request.args.get('level', stat_model.MAX_LEVEL))
+        ivs = [int(iv) for iv in request.args.get('ivs', str(stat_model.MAX_IV)).split(',')]
+    except ValueError:
+        app.logger.info("Invalid input: level and ivs must be integers")
+        return make_response(jsonify({'error': 'Invalid input, level and ivs must be integers'}), 400)
+    if len(ivs) not in (1, 6):
+        return make_response(jsonify({'error': 'Invalid input, ivs must be one or six values'}), 400)
+
+    app.logger.info("Computing stats of %s", id)
+    try:
+        stats = stat_model.get_pokemon_stats(id, ivs, level, request.args.get('nature'))
+        return make_response(jsonify({'status': 'success', 'id': id, 'stats': stats}), 200)
+    except ValueError as e:
+        app.logger.info(f"Invalid input: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error computing stats: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/pokemon/stats', methods=['GET'])
+def get_roster_stats() -> Response:
+    """
+    Route get the in-game stats of many pokemon, or of the whole roster, in one pass
+
+    Query Parameters:
+        - ids (str): comma separated IDs of the pokemon, every pokemon if omitted
+        - level (int): 1 to 100, 100 by default
+        - ivs (str): one IV for every stat or six comma separated, 31 by default
+        - nature (str): e.g. adamant, neutral by default
+
+    Returns:
+        pokemon (List[dict]) : per pokemon found, its id and stats
+        missing (List[int]) : requested IDs that do not exist
+
+    Raises:
+        400 error if input validation fails.
+        500 error if fail.
+    """
+    try:
+        ids = [int(i) for i in request.args['ids'].split(',') if i.strip()] if 'ids' in request.args else None
+        level = int(request.args.get('level', stat_model.MAX_LEVEL))
+        ivs = [int(iv) for iv in request.args.get('ivs', str(stat_model.MAX_IV)).split(',')]
+    except ValueError:
+        app.logger.info("Invalid input: ids, level and ivs must be integers")
+        return make_response(jsonify({'error': 'Invalid input, ids, level and ivs must be integers'}), 400)
+    if len(ivs) not in (1, 6):
+        return make_response(jsonify({'error': 'Invalid input, ivs must be one or six values'}), 400)
+
+    app.logger.info("Computing stats of %s pokemon", len(ids) if ids is not None else "all")
+    try:
+        roster = stat_model.get_roster_stats(ids, ivs, level, request.args.get('nature'))
+        found = {entry['id'] for entry in roster}
+        missing = [i for i in ids if i not in found] if ids is not None else []
+        return make_response(jsonify({'status': 'success', 'pokemon': roster, 'missing': missing}), 200)
+    except ValueError as e:
+        app.logger.info(f"Invalid input: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error computing stats: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/damage-matrix', methods=['POST'])
+def get_damage_matrix() -> Response:
+    """
+    Route to get the damage range of every learned move of every attacker against every defender
+
+    Expected JSON Input:
+        - attackers (List[int]): IDs of the attacking pokemon
+        - defenders (List[int]): IDs of the defending pokemon
+        - level (int): level of every pokemon, 1 to 100, 100 by default
+
+    Returns:
+        matrix (dict) : attackers, defenders, moves, and min_damage, max_damage,
+        min_percent, max_percent and effectiveness indexed [attacker][move][defender]
+
+    Raises:
+        400 error if input validation fails or a pokemon does not exist.
+        500 error if fail.
+    """
+    try:
+        data = request.get_json()
+        attackers = data.get('attackers')
+        defenders = data.get('defenders')
+        level = data.get('level', stat_model.MAX_LEVEL)
+        # bool is an int too, but JSON true is neither an id nor a level
+        if not all(isinstance(ids, list) and ids and all(isinstance(i, int) and not isinstance(i, bool) for i in ids)
+                   for ids in (attackers, defenders)):
+            app.logger.info("Invalid input: attackers and defenders must be non-empty lists of ids")
+            return make_response(jsonify({'error': 'Invalid input, attackers and defenders must be non-empty lists of ids'}), 400)
+        if not isinstance(level, int) or isinstance(level, bool) or not 1 <= level <= stat_model.MAX_LEVEL:
+            app.logger.info("Invalid input: level must be an integer between 1 and %d", stat_model.MAX_LEVEL)
+            return make_response(jsonify({'error': f'Invalid input, level must be an integer between 1 and {stat_model.MAX_LEVEL}'}), 400)
+
+        app.logger.info("Computing damage of %d attackers against %d defenders", len(attackers), len(defenders))
+        matrix = damage_model.damage_matrix(attackers, defenders, level)
+        return make_response(jsonify({'status': 'success', 'matrix': matrix}), 200)
+    except ValueError as e:
+        app.logger.info(f"Invalid input: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error computing damage: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
 
 @app.route('/api/add-move-to-pokemon', methods=['POST'])
 def add_move_to_pokemon() -> Response:
@@ -325,6 +685,46 @@ def distribute_effort_values() -> Response:
         app.logger.error(f"Error creating pokemon: {e}")
         return make_response(jsonify({'error': str(e)}), 500) 
 
+@app.route('/api/distribute-effort-values-batch', methods=['POST'])
+def distribute_effort_values_batch() -> Response:
+    """
+    Route distribute evs for many pokemon in one transaction
+
+    Expected JSON Input:
+        - distributions (List[dict]): each with
+            - id (int): ID of the pokemon
+            - evs (List[int]): list of evs (hp, atk, def, sp atk, sp def, spd)
+
+    Returns:
+        effort_values (List[dict]) : per pokemon, its id and the evs written after the caps
+
+    Raises:
+        400 error if input validation fails or a pokemon does not exist.
+        500 error if fail.
+    """
+    try:
+        data = request.get_json()
+        distributions = data.get('distributions')
+        if not isinstance(distributions, list) or not distributions or \
+                not all(isinstance(item, dict) and isinstance(item.get('id'), int) and not isinstance(item['id'], bool)
+                        for item in distributions):
+            app.logger.info("Invalid input: distributions must be a non-empty list of {id, evs}")
+            return make_response(jsonify({'error': 'Invalid input, distributions must be a non-empty list of {id, evs}'}), 400)
+
+        app.logger.info("Distributing evs for %d pokemon", len(distributions))
+        pairs = [(item['id'], item.get('evs')) for item in distributions]
+        written = poke_model.distribute_effort_values_batch(pairs)
+        return make_response(jsonify({
+            'status': 'success',
+            'effort_values': [{'id': pokemon_id, 'evs': evs} for (pokemon_id, _), evs in zip(pairs, written)]
+        }), 200)
+    except ValueError as e:
+        app.logger.info(f"Invalid input: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error distributing evs: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 @app.route('/api/clear-poke', methods=['DELETE'])
 def clear_poke() -> Response:
     """
@@ -341,5 +741,220 @@ def clear_poke() -> Response:
         app.logger.error(f"Error clearing catalog: {e}")
         return make_response(jsonify({'error': str(e)}), 500)
 
+####################################################
+#
+# Teams
+#
+####################################################
+
+
+@app.route('/api/teams', methods=['POST'])
+@token_required
+def create_team() -> Response:
+    """
+    Route to create a team for the user of the session token
+
+    Expected JSON Input:
+        - name (str): name of the team
+        - pokemon_ids (List[int]): 1 to 6 distinct pokemon IDs, in slot order
+
+    Returns:
+        team_id (int) : ID of the new team
+
+    Raises:
+        400 error if input validation fails or a pokemon does not exist.
+        401 error if the token is missing or invalid.
+        500 error if fail.
+    """
+    try:
+        data = request.get_json()
+        app.logger.info("Creating team for %s", g.username)
+        team_id = team_model.create_team(g.username, data.get('name'), data.get('pokemon_ids'))
+        return make_response(jsonify({'status': 'success', 'team_id': team_id}), 200)
+    except ValueError as e:
+        app.logger.info(f"Invalid input: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error creating team: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/teams', methods=['GET'])
+@token_required
+def get_user_teams() -> Response:
+    """
+    Route to get the teams of the user of the session token, with their members
+
+    Returns:
+        teams (List[Team]) : the user's teams, each with its members' stats and moves
+
+    Raises:
+        401 error if the token is missing or invalid.
+        500 error if fail.
+    """
+    try:
+        app.logger.info("Fetching teams of %s", g.username)
+        teams = team_model.get_user_teams(g.username)
+        return make_response(jsonify({'status': 'success', 'teams': teams}), 200)
+    except Exception as e:
+        app.logger.error(f"Error fetching teams: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/teams/<int:team_id>', methods=['GET'])
+@token_required
+def get_team(team_id: int) -> Response:
+    """
+    Route to get a team of the user of the session token by its id
+
+    Args:
+        team_id (int): ID of the team
+
+    Returns:
+        team (Team) : the team, with its members' stats and moves in slot order
+
+    Raises:
+        400 error if the team (of that user) does not exist.
+        401 error if the token is missing or invalid.
+        500 error if fail.
+    """
+    try:
+        app.logger.info("Fetching team %s", team_id)
+        team = team_model.get_team(team_id, g.username)
+        return make_response(jsonify({'status': 'success', 'team': team}), 200)
+    except ValueError as e:
+        app.logger.info(f"Invalid input: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error fetching team: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/teams/<int:team_id>/members', methods=['PUT'])
+@token_required
+def set_team_members(team_id: int) -> Response:
+    """
+    Route to replace the members of a team of the user of the session token
+
+    Args:
+        team_id (int): ID of the team
+
+    Expected JSON Input:
+        - pokemon_ids (List[int]): 1 to 6 distinct pokemon IDs, in slot order
+
+    Returns:
+        JSON response indicating success of the operation.
+
+    Raises:
+        400 error if input validation fails, or the team (of that user) or a pokemon does not exist.
+        401 error if the token is missing or invalid.
+        500 error if fail.
+    """
+    try:
+        data = request.get_json()
+        app.logger.info("Replacing members of team %s", team_id)
+        team_model.set_team_members(team_id, g.username, data.get('pokemon_ids'))
+        return make_response(jsonify({'status': 'success'}), 200)
+    except ValueError as e:
+        app.logger.info(f"Invalid input: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error replacing team members: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/pokemon/<int:id>/teams', methods=['GET'])
+def get_teams_with_pokemon(id: int) -> Response:
+    """
+    Route to find the teams a pokemon is a member of
+
+    Args:
+        id (int): ID of the pokemon
+
+    Returns:
+        teams (List[dict]) : id, name and slot of each team containing the pokemon
+
+    Raises:
+        500 error if fail.
+    """
+    try:
+        app.logger.info("Finding teams with pokemon %s", id)
+        teams = team_model.get_teams_with_pokemon(id)
+        return make_response(jsonify({'status': 'success', 'teams': teams}), 200)
+    except Exception as e:
+        app.logger.error(f"Error finding teams: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/teams/<int:team_id>/coverage', methods=['GET'])
+@token_required
+def get_team_coverage(team_id: int) -> Response:
+    """
+    Route to get the type coverage of a team of the user of the session token
+
+    Args:
+        team_id (int): ID of the team
+
+    Returns:
+        coverage (dict) : by type, the members weak to, resisting and immune to it,
+        exposed types, and the types the team's damaging moves hit super effectively or not
+
+    Raises:
+        400 error if the team (of that user) does not exist.
+        401 error if the token is missing or invalid.
+        500 error if fail.
+    """
+    try:
+        app.logger.info("Computing coverage of team %s", team_id)
+        result = type_model.team_coverage([team_id], g.username)[0]
+        return make_response(jsonify({'status': 'success', 'coverage': result}), 200)
+    except ValueError as e:
+        app.logger.info(f"Invalid input: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error computing coverage: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
+@app.route('/api/coverage', methods=['POST'])
+@token_required
+def get_coverage() -> Response:
+    """
+    Route to get the type coverage of many teams, or of sets of pokemon, in one pass
+
+    Expected JSON Input (one of):
+        - team_ids (List[int]): IDs of stored teams of the user of the session token
+        - teams (List[List[int]]): sets of pokemon IDs, each analyzed as a team
+
+    Returns:
+        coverage (List[dict]) : the coverage of each team or set, in order
+
+    Raises:
+        400 error if input validation fails or a team (of that user) or pokemon does not exist.
+        401 error if the token is missing or invalid.
+        500 error if fail.
+    """
+    try:
+        data = request.get_json()
+        team_ids = data.get('team_ids')
+        teams = data.get('teams')
+
+        def ints(values):
+            return isinstance(values, list) and values and all(isinstance(i, int) and not isinstance(i, bool) for i in values)
+
+        if (team_ids is None) == (teams is None) or \
+                (team_ids is not None and not ints(team_ids)) or \
+                (teams is not None and not (isinstance(teams, list) and teams and all(ints(ids) for ids in teams))):
+            app.logger.info("Invalid input: team_ids or teams is required")
+            return make_response(jsonify({'error': 'Invalid input, either team_ids or teams (lists of pokemon ids) is required'}), 400)
+
+        app.logger.info("Computing coverage of %d teams", len(team_ids or teams))
+        if team_ids is not None:
+            results = type_model.team_coverage(team_ids, g.username)
+        else:
+            results = type_model.pokemon_coverage(teams)
+        return make_response(jsonify({'status': 'success', 'coverage': results}), 200)
+    except ValueError as e:
+        app.logger.info(f"Invalid input: {e}")
+        return make_response(jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        app.logger.error(f"Error computing coverage: {e}")
+        return make_response(jsonify({'error': str(e)}), 500)
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development server only; production runs wsgi:app under gunicorn (see entrypoint.sh)
+    app.run(debug=os.getenv('FLASK_DEBUG', 'false').lower() == 'true', host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,139 @@
+import logging
+
+import numpy as np
+
+from app.models import poke_model, stat_model, type_model
+from app.models.type_model import NO_TYPE, TYPE_CHART
+from app.utils.logger import configure_logger
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+# Damage rolls, in percent: every integer from 85 to 100 is equally likely
+ROLLS = np.arange(85, 101)
+
+PHYSICAL, SPECIAL, NO_DAMAGE = 0, 1, 2
+DAMAGE_CLASSES = {'physical': PHYSICAL, 'special': SPECIAL}
+
+def _chart_quarters():
+    # TYPE_CHART in quarters (4 = 1x), with neutral rows and columns for NO_TYPE
+    quarters = np.full((NO_TYPE + 1, NO_TYPE + 1), 4, dtype=np.int64)
+    quarters[:NO_TYPE, :NO_TYPE] = (TYPE_CHART * 4).astype(np.int64)
+    return quarters
+
+CHART_QUARTERS = _chart_quarters()
+
+def calculate_damage(level, power, damage_class, move_types, attacker_stats, attacker_types,
+                     defender_stats, defender_types):
+    """
+    Damage of every (attacker, move, defender) combination in one pass:
+
+        base = (2 * level / 5 + 2) * power * A / D / 50 + 2
+        damage = base * roll * STAB (1.5x) * type effectiveness
+
+    rounding down at every step, A and D being Attack and Defense for physical
+    moves and Special Attack and Special Defense for special ones. A hit that
+    is not resisted completely does at least 1. Critical hits, abilities,
+    items and weather are left out.
+
+    Args:
+        level (int): Level of the attackers.
+        power (np.ndarray): (attackers, moves) move power, 0 for none.
+        damage_class (np.ndarray): (attackers, moves) PHYSICAL, SPECIAL or NO_DAMAGE.
+        move_types (np.ndarray): (attackers, moves) type indices.
+        attacker_stats (np.ndarray): (attackers, 6) final stats.
+        attacker_types (np.ndarray): (attackers, 2) type indices, NO_TYPE for none.
+        defender_stats (np.ndarray): (defenders, 6) final stats.
+        defender_types (np.ndarray): (defenders, 2) type indices, NO_TYPE for none.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (attackers, moves, defenders)
+        lowest and highest damage, and the type effectiveness.
+    """
+    physical = (damage_class == PHYSICAL)[:, :, None]
+    attack = np.where(damage_class == PHYSICAL, attacker_stats[:, None, 1], attacker_stats[:, None, 3])[:, :, None]
+    defense = np.where(physical, defender_stats[None, None, :, 2], defender_stats[None, None, :, 4])
+
+    base = (2 * level // 5 + 2) * power[:, :, None] * attack // defense // 50 + 2
+    # One more axis for the rolls, last
+    damage = base[..., None] * ROLLS // 100
+
+    stab = (move_types[:, :, None] == attacker_types[:, None, :]).any(axis=2)
+    damage = np.where(stab[:, :, None, None], damage * 3 // 2, damage)
+
+    # Effectiveness in sixteenths: the product of two charts in quarters
+    sixteenths = (CHART_QUARTERS[move_types[:, :, None], defender_types[None, None, :, 0]] *
+                  CHART_QUARTERS[move_types[:, :, None], defender_types[None, None, :, 1]])
+    damage = damage * sixteenths[..., None] // 16
+    damage = np.where(sixteenths[..., None] > 0, np.maximum(damage, 1), 0)
+
+    damage = np.where(((damage_class != NO_DAMAGE) & (power > 0))[:, :, None, None], damage, 0)
+    return damage[..., 0], damage[..., -1], sixteenths / 16
+
+def damage_matrix(attacker_ids, defender_ids, level=stat_model.MAX_LEVEL):
+    """
+    Damage of every learned move of every attacker against every defender.
+    Stats are computed at the given level with perfect IVs and a neutral
+    nature; move and species data come from the type_model catalogs.
+
+    Args:
+        attacker_ids (List[int]): The attacking Pokemon.
+        defender_ids (List[int]): The defending Pokemon.
+        level (int): Level of every Pokemon.
+
+    Returns:
+        dict: attackers and defenders (their ids), moves (each attacker's
+        learned moves), and min_damage, max_damage, min_percent, max_percent
+        (of the defender's HP) and effectiveness indexed [attacker][move][defender].
+
+    Raises:
+        ValueError: If a Pokemon is not found or the level is out of range.
+    """
+    pokemons = {pokemon.id: pokemon for pokemon in poke_model.get_pokemon_by_ids(list(dict.fromkeys(attacker_ids + defender_ids)))}
+    for pokemon_id in attacker_ids + defender_ids:
+        if pokemon_id not in pokemons:
+            raise ValueError(f"Pokemon with ID {pokemon_id} not found")
+    attackers = [pokemons[i] for i in attacker_ids]
+    defenders = [pokemons[i] for i in defender_ids]
+
+    type_model.load_species_types([pokemon.game_id for pokemon in pokemons.values()])
+    type_model.load_move_data([move for pokemon in attackers for move in pokemon.learned_moves])
+
+    def stats_of(team):
+        base = [[getattr(pokemon.stats, name)[0] for name in stat_model.STAT_NAMES] for pokemon in team]
+        evs = [[getattr(pokemon.stats, name)[1] for name in stat_model.STAT_NAMES] for pokemon in team]
+        return stat_model.calculate_stats(np.array(base).reshape(-1, 6), np.array(evs).reshape(-1, 6), level=level)
+
+    def types_of(team):
+        return np.array([type_model.species_types[pokemon.game_id] for pokemon in team], dtype=np.intp).reshape(-1, 2)
+
+    # Moves padded to the longest learnset; unknown moves do no damage
+    width = max((len(pokemon.learned_moves) for pokemon in attackers), default=0)
+    move_rows = [[type_model.move_data.get(move, (NO_TYPE, 0, 'status')) for move in pokemon.learned_moves] +
+                 [(NO_TYPE, 0, 'status')] * (width - len(pokemon.learned_moves)) for pokemon in attackers]
+    move_types = np.array([[row[0] for row in moves] for moves in move_rows], dtype=np.intp).reshape(-1, width)
+    power = np.array([[row[1] for row in moves] for moves in move_rows], dtype=np.int64).reshape(-1, width)
+    damage_class = np.array([[DAMAGE_CLASSES.get(row[2], NO_DAMAGE) for row in moves] for moves in move_rows],
+                            dtype=np.int64).reshape(-1, width)
+
+    defender_stats = stats_of(defenders)
+    low, high, effectiveness = calculate_damage(
+        level, power, damage_class, move_types, stats_of(attackers), types_of(attackers),
+        defender_stats, types_of(defenders)
+    )
+    hp = defender_stats[:, 0]
+
+    def trimmed(values):
+        # Drop each attacker's padding moves
+        return [rows[:len(pokemon.learned_moves)] for pokemon, rows in zip(attackers, values.tolist())]
+
+    return {
+        'attackers': attacker_ids,
+        'defenders': defender_ids,
+        'moves': [pokemon.learned_moves for pokemon in attackers],
+        'min_damage': trimmed(low),
+        'max_damage': trimmed(high),
+        'min_percent': trimmed(np.round(low * 100 / hp, 1)),
+        'max_percent': trimmed(np.round(high * 100 / hp, 1)),
+        'effectiveness': trimmed(effectiveness),
+    }
@@ -1,13 +1,21 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor
+import copy
 from typing import List, Optional
 from dataclasses import dataclass
+import json
 import logging
 import sqlite3
 import os
 from typing import Any
 
+import numpy as np
+
+from app.services import pokeapi_mirror
+from app.utils.api_utils import POKEAPI_URL, fetch_json
+from app.utils.cache_utils import ObjectCache
 from app.utils.db_utils import get_db_connection
 from app.utils.logger import configure_logger
+from app.utils.metrics import registry
 
 logger = logging.getLogger(__name__)
 configure_logger(logger)
@@ -38,8 +46,31 @@ class Pokemon:
     stats: Stats
     total_effort: int
 
-BASE_POKE_URL = "https://pokeapi.co/api/v2/"
-global_id = 0
+BASE_POKE_URL = POKEAPI_URL
+
+# Upper bound on concurrent upstream fetches for create_pokemon_batch
+BATCH_FETCH_WORKERS = int(os.getenv("BATCH_FETCH_WORKERS", "8"))
+
+# Hydrated Pokemon kept in memory, bounded by their estimated size
+POKEMON_CACHE_MAX_BYTES = int(os.getenv("POKEMON_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+# Seconds a cached Pokemon is served without checking its row version.
+# 0 checks on every read, which keeps several worker processes consistent.
+POKEMON_CACHE_REVALIDATE_SECONDS = float(os.getenv("POKEMON_CACHE_REVALIDATE_SECONDS", "0"))
+
+def _pokemon_size(pokemon):
+    # Rough footprint of a hydrated Pokemon: the objects plus its strings
+    return 1200 + len(pokemon.name) + len(pokemon.ability) + sum(80 + len(move) for move in pokemon.learned_moves)
+
+pokemon_cache = ObjectCache(max_bytes=POKEMON_CACHE_MAX_BYTES, sizeof=_pokemon_size)
+
+def _collect():
+    stats = pokemon_cache.stats()
+    yield "pokemon_cache_hits", "counter", "Hydrated Pokemon served from memory.", {}, stats['hits']
+    yield "pokemon_cache_misses", "counter", "Hydrated Pokemon loaded from the database.", {}, stats['misses']
+    yield "pokemon_cache_evictions", "counter", "Hydrated Pokemon evicted for space.", {}, stats['evictions']
+    yield "pokemon_cache_entries", "gauge", "Hydrated Pokemon held in memory.", {}, stats['entries']
+
+registry.register_collector(_collect)
 
 stat_map = {
     'hp': 'hp',
@@ -50,6 +81,54 @@ stat_map = {
     'speed': 'speed'
 }
 
+def fetch_species(name):
+    """
+    Fetch the PokeAPI document of a species, from the local mirror when
+    POKEAPI_MIRROR is enabled and from PokeAPI (through the response cache) otherwise.
+
+    Args:
+        name (string): The name of the species.
+
+    Returns:
+        dict: The species document, or None if it does not exist.
+    """
+    if pokeapi_mirror.POKEAPI_MIRROR:
+        return pokeapi_mirror.get_species(name)
+    return fetch_json(BASE_POKE_URL + "/pokemon/" + name)
+
+def pokemon_from_species(data, pokemon_id=None):
+    """
+    Build a base Pokemon (no moves, no effort values) from a species document.
+
+    Args:
+        data (dict): The PokeAPI species document.
+        pokemon_id (int): DB ID to give the pokemon, None to allocate one when it is stored.
+
+    Returns:
+        Pokemon: The new Pokemon object.
+    """
+    stats = Stats(hp=[0, 0], 
+                  defense=[0, 0], 
+                  attack=[0, 0], 
+                  speed=[0, 0], 
+                  special_defense=[0, 0], 
+                  special_attack=[0, 0]
+                  )
+
+    for stat in data['stats']:
+        attr_name = stat_map.get(stat['stat']['name'])
+        if attr_name:
+            setattr(stats, attr_name, [stat['base_stat'], 0])
+
+    return Pokemon(
+        id=pokemon_id,
+        game_id=data['id'],
+        name=data['name'],
+        ability="",
+        learned_moves=[],
+        stats=stats,
+        total_effort=0)
+
 def create_pokemon_by_name(name):
     """
     Create a pokemon by its name.
@@ -64,45 +143,88 @@ def create_pokemon_by_name(name):
         ValueError: if pokemon does not exist
         sqlite3.Error: For any other database errors
     """
-    response = requests.get(BASE_POKE_URL + "/pokemon/" + name)
-    if response.status_code == 200:
-        data = response.json()
-        stats = Stats(hp=[0, 0], 
-                      defense=[0, 0], 
-                      attack=[0, 0], 
-                      speed=[0, 0], 
-                      special_defense=[0, 0], 
-                      special_attack=[0, 0]
-                      )
-
-        for stat in data['stats']:
-            attr_name = stat_map.get(stat['stat']['name'])
-            if attr_name:
-                setattr(stats, attr_name, [stat['base_stat'], 0])
-
-        global global_id
-        pokemon = Pokemon(
-            id=global_id,
-            game_id=data['id'],
-            name=data['name'],
-            ability="",
-            learned_moves=[],
-            stats=stats,
-            total_effort=0)
-        global_id += 1
-
+    data = fetch_species(name)
+    if data is not None:
+        pokemon = pokemon_from_species(data)
         create_pokemon_by_object(pokemon)
         return pokemon.id
     else:
         logger.error("Pokemon does not exist: %s", name)
         raise ValueError("This pokemon does not exist")
 
+def _fetch_species_or_error(name):
+    try:
+        data = fetch_species(name)
+    except Exception as e:
+        logger.error("Failed to fetch %s: %s", name, str(e))
+        return e
+    if data is None:
+        return ValueError("This pokemon does not exist")
+    return data
+
+def create_pokemon_batch(names):
+    """
+    Create many pokemon by name.
+    The distinct species are fetched concurrently (at most BATCH_FETCH_WORKERS at once)
+    and every pokemon is inserted in a single transaction.
+
+    Args:
+        names (List[string]): The names of the pokemon. Repeated names create several pokemon.
+
+    Returns:
+        List[dict]: One entry per name, in order: {'name', 'pokemon_id'} on success,
+            {'name', 'error'} if the species could not be fetched.
+
+    Raises:
+        sqlite3.Error: For any database errors; no pokemon is created in that case.
+    """
+    distinct = list(dict.fromkeys(names))
+    species = {}
+    if distinct:
+        with ThreadPoolExecutor(max_workers=min(BATCH_FETCH_WORKERS, len(distinct))) as pool:
+            species = dict(zip(distinct, pool.map(_fetch_species_or_error, distinct)))
+
+    results = []
+    pokemons = []
+    for name in names:
+        data = species[name]
+        if isinstance(data, Exception):
+            results.append({'name': name, 'error': str(data)})
+            continue
+        pokemon = pokemon_from_species(data)
+        pokemons.append(pokemon)
+        results.append({'name': name, 'pokemon': pokemon})
+
+    if pokemons:
+        create_pokemon_by_objects(pokemons)
+    for result in results:
+        if 'pokemon' in result:
+            result['pokemon_id'] = result.pop('pokemon').id
+    return results
+
+def _allocate_ids(cursor, count):
+    """
+    Reserves count consecutive pokemon ids for the caller's transaction.
+
+    The write lock is taken before reading the sequence, so no other thread or
+    worker process can allocate the same ids until the caller commits or rolls
+    back. The sequence survives clear_poke, so an id is never reused.
+
+    Returns:
+        range: The reserved ids.
+    """
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute("SELECT value FROM pokemon_sequence WHERE name = 'next_id'")
+    first = cursor.fetchone()[0]
+    return range(first, first + count)
+
 def create_pokemon_by_object(pokemon):
     """
     Create a pokemon with an object.
     
     Args:
-        pokemon (Pokemon): The Pokemon object.
+        pokemon (Pokemon): The Pokemon object. If its id is None, the next free id
+            is allocated and set on the object.
 
     Raises:
         sqlite3.Error: For any other database errors
@@ -110,6 +232,8 @@ def create_pokemon_by_object(pokemon):
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            if pokemon.id is None:
+                pokemon.id = _allocate_ids(cursor, 1)[0]
             cursor.execute("""
                 INSERT INTO pokemon (id, game_id, name, ability, total_effort)
                 VALUES (?, ?, ?, ?, ?)
@@ -140,6 +264,7 @@ def create_pokemon_by_object(pokemon):
                 pokemon.stats.speed[0], pokemon.stats.speed[1]
             ))
             conn.commit()
+            pokemon_cache.invalidate(pokemon.id)
 
             logger.info("Pokemon successfully added to the database: %s", pokemon.name)
 
@@ -147,81 +272,213 @@ def create_pokemon_by_object(pokemon):
         logger.error("Database error: %s", str(e))
         raise e
 
-def get_pokemon_by_id(pokemon_id):
+def create_pokemon_by_objects(pokemons):
     """
-    Retrieves a Pokemon from the catalog by its pokemon_id
-
+    Create many pokemon from objects in a single transaction.
+    
     Args:
-        pokemon_id (int): The ID of the Pokemon to retrieve
-
-    Returns:
-        Pokemon: The Pokemon object corresponding to the pokemon_id
+        pokemons (List[Pokemon]): The Pokemon objects. Those whose id is None get
+            the next free ids, in order, set on the objects.
 
     Raises:
-        ValueError: If the Pokemon is not found
+        sqlite3.Error: For any database errors; nothing is written in that case.
     """
+    unassigned = [pokemon for pokemon in pokemons if pokemon.id is None]
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, game_id, name, ability, total_effort
-                FROM pokemon WHERE id = ?
-            """, (pokemon_id,))
-            pokemon_data = cursor.fetchone()
-            if not pokemon_data:
-                logger.info("Pokemon with ID %s not found", pokemon_id)
-                raise ValueError(f"Pokemon with ID {pokemon_id} not found")
-            
-            # Map to fields
-            (
-                id, game_id, name, 
-                ability, total_effort
-            ) = pokemon_data
-
-            # Retrieve learned moves
-            cursor.execute("""
-                SELECT move FROM learned_moves WHERE pokemon_id = ?
-            """, (pokemon_id,))
-            learned_moves = [row[0] for row in cursor.fetchall()]
+            if unassigned:
+                for pokemon, pokemon_id in zip(unassigned, _allocate_ids(cursor, len(unassigned))):
+                    pokemon.id = pokemon_id
+            cursor.executemany("""
+                INSERT INTO pokemon (id, game_id, name, ability, total_effort)
+                VALUES (?, ?, ?, ?, ?)
+            """, [
+                (pokemon.id, pokemon.game_id, pokemon.name, pokemon.ability, pokemon.total_effort)
+                for pokemon in pokemons
+            ])
 
-            # Retrieve stats
-            cursor.execute("""
-                SELECT 
-                    hp_base, hp_effort,
+            cursor.executemany("INSERT INTO learned_moves (pokemon_id, move) VALUES (?, ?)", [
+                (pokemon.id, move) for pokemon in pokemons for move in pokemon.learned_moves
+            ])
+
+            cursor.executemany("""
+                INSERT INTO stats (
+                    pokemon_id, hp_base, hp_effort,
                     attack_base, attack_effort,
                     defense_base, defense_effort,
                     special_attack_base, special_attack_effort,
                     special_defense_base, special_defense_effort,
                     speed_base, speed_effort
-                FROM stats WHERE pokemon_id = ?
-            """, (pokemon_id,))
-            stats_data = cursor.fetchone()
-
-            stats = Stats(
-                hp=[stats_data[0], stats_data[1]],
-                attack=[stats_data[2], stats_data[3]],
-                defense=[stats_data[4], stats_data[5]],
-                special_attack=[stats_data[6], stats_data[7]],
-                special_defense=[stats_data[8], stats_data[9]],
-                speed=[stats_data[10], stats_data[11]],
-            )
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    pokemon.id,
+                    *pokemon.stats.hp, *pokemon.stats.attack, *pokemon.stats.defense,
+                    *pokemon.stats.special_attack, *pokemon.stats.special_defense, *pokemon.stats.speed
+                )
+                for pokemon in pokemons
+            ])
+            conn.commit()
+            for pokemon in pokemons:
+                pokemon_cache.invalidate(pokemon.id)
+
+            logger.info("%d pokemon successfully added to the database", len(pokemons))
 
-            # Reconstruct the Pokemon object
-            pokemon = Pokemon(
-                id=id,
-                game_id=game_id,
-                name=name,
-                ability=ability,
-                learned_moves=learned_moves,
-                stats=stats,
-                total_effort=total_effort,
+    except sqlite3.Error as e:
+        for pokemon in unassigned:
+            pokemon.id = None
+        logger.error("Database error: %s", str(e))
+        raise e
+
+HYDRATE_QUERY = """
+    SELECT
+        p.id, p.game_id, p.name, p.ability, p.total_effort,
+        s.hp_base, s.hp_effort,
+        s.attack_base, s.attack_effort,
+        s.defense_base, s.defense_effort,
+        s.special_attack_base, s.special_attack_effort,
+        s.special_defense_base, s.special_defense_effort,
+        s.speed_base, s.speed_effort,
+        (
+            SELECT json_group_array(move) FROM (
+                SELECT move FROM learned_moves WHERE pokemon_id = p.id ORDER BY rowid
             )
-            return pokemon
+        ) AS learned_moves,
+        p.version
+    FROM pokemon p
+    JOIN stats s ON s.pokemon_id = p.id
+    WHERE p.id IN (SELECT value FROM json_each(?))
+"""
+
+def _pokemon_from_row(row):
+    stats = Stats(
+        hp=[row[5], row[6]],
+        attack=[row[7], row[8]],
+        defense=[row[9], row[10]],
+        special_attack=[row[11], row[12]],
+        special_defense=[row[13], row[14]],
+        speed=[row[15], row[16]],
+    )
+    return Pokemon(
+        id=row[0],
+        game_id=row[1],
+        name=row[2],
+        ability=row[3],
+        learned_moves=json.loads(row[17]),
+        stats=stats,
+        total_effort=row[4],
+    )
+
+def _load_pokemon(pokemon_ids):
+    """
+    Loads Pokemon and their row versions in a single query, whatever their number.
+    The ids are passed as one JSON array parameter, so the statement text
+    (and its prepared plan) is the same for every batch size.
+
+    Returns:
+        dict: id -> (Pokemon, version) for the ids that exist.
+    """
+    try:
+        with get_db_connection(read_only=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(HYDRATE_QUERY, (json.dumps(pokemon_ids),))
+            return {row[0]: (_pokemon_from_row(row), row[18]) for row in cursor.fetchall()}
 
     except sqlite3.Error as e:
         logger.error("Database error: %s", str(e))
         raise e
 
+def get_pokemon_by_ids(pokemon_ids):
+    """
+    Retrieves many Pokemon in a single query, whatever their number.
+
+    Args:
+        pokemon_ids (List[int]): The IDs of the Pokemon to retrieve
+
+    Returns:
+        List[Pokemon]: The Pokemon found, in the order of pokemon_ids. Unknown IDs are skipped.
+
+    Raises:
+        sqlite3.Error: For any database errors
+    """
+    pokemon_ids = [int(i) for i in pokemon_ids]
+    found = _load_pokemon(pokemon_ids)
+    return [found[i][0] for i in pokemon_ids if i in found]
+
+def _row_version(pokemon_id):
+    try:
+        with get_db_connection(read_only=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM pokemon WHERE id = ?", (pokemon_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+def get_pokemon_by_id(pokemon_id):
+    """
+    Retrieves a Pokemon from the catalog by its pokemon_id.
+    Served from the Pokemon cache when its row version is unchanged.
+
+    Args:
+        pokemon_id (int): The ID of the Pokemon to retrieve
+
+    Returns:
+        Pokemon: The Pokemon object corresponding to the pokemon_id
+
+    Raises:
+        ValueError: If the Pokemon is not found
+    """
+    max_age = POKEMON_CACHE_REVALIDATE_SECONDS if POKEMON_CACHE_REVALIDATE_SECONDS > 0 else None
+    cached = pokemon_cache.get(pokemon_id, max_age)
+    if cached is not None:
+        pokemon, version, age = cached
+        if max_age is not None and age <= max_age:
+            return copy.deepcopy(pokemon)
+        # Counted as a hit only if the row is unchanged, a stale copy is a miss
+        if pokemon_cache.confirm(pokemon_id, _row_version(pokemon_id)):
+            return copy.deepcopy(pokemon)
+        pokemon_cache.invalidate(pokemon_id)
+
+    token = pokemon_cache.token()
+    found = _load_pokemon([pokemon_id])
+    if pokemon_id not in found:
+        logger.info("Pokemon with ID %s not found", pokemon_id)
+        raise ValueError(f"Pokemon with ID {pokemon_id} not found")
+    pokemon, version = found[pokemon_id]
+    pokemon_cache.put(pokemon_id, copy.deepcopy(pokemon), version, token)
+    return pokemon
+
+def warm_pokemon_cache(limit):
+    """
+    Loads the most recently created Pokemon into the Pokemon cache.
+
+    Args:
+        limit (int): Maximum number of Pokemon to load.
+
+    Returns:
+        int: The number of Pokemon cached.
+
+    Raises:
+        sqlite3.Error: For any database errors
+    """
+    try:
+        with get_db_connection(read_only=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM pokemon ORDER BY id DESC LIMIT ?", (limit,))
+            ids = [row[0] for row in cursor.fetchall()]
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+    token = pokemon_cache.token()
+    found = _load_pokemon(ids)
+    return sum(pokemon_cache.put(i, pokemon, version, token) for i, (pokemon, version) in found.items())
+
 def add_move_to_pokemon(pokemon_id, move_name):
     """
     Add a move to a Pokemon.
@@ -235,8 +492,9 @@ def add_move_to_pokemon(pokemon_id, move_name):
         see get_pokemon_by_id
     """
     pokemon = get_pokemon_by_id(pokemon_id)
-    response = requests.get(BASE_POKE_URL + "/pokemon/" + pokemon.name)
-    data = response.json()
+    data = fetch_species(pokemon.name)
+    if data is None:
+        raise ValueError("This pokemon does not exist")
     moves = [move['move']['name'] for move in data['moves']]
     if move_name in pokemon.learned_moves:
         raise ValueError("This pokemon already knows that move")
@@ -250,6 +508,7 @@ def add_move_to_pokemon(pokemon_id, move_name):
                         VALUES (?, ?)
                     """, (pokemon_id, move_name))
                     conn.commit()
+                pokemon_cache.invalidate(pokemon_id)
             except sqlite3.Error as e:
                 logger.error("Database error: %s", str(e))
                 raise e
@@ -281,6 +540,7 @@ def remove_move_from_pokemon(pokemon_id, move_name):
                     WHERE pokemon_id = ? AND move = ?
                 """, (pokemon_id, move_name))
                 conn.commit()
+            pokemon_cache.invalidate(pokemon_id)
         except sqlite3.Error as e:
             logger.error("Database error: %s", str(e))
             raise e
@@ -346,13 +606,102 @@ def distribute_effort_values(pokemon_id, evs):
             """, (*effort_values, pokemon_id))
 
             conn.commit()
+        pokemon_cache.invalidate(pokemon_id)
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+# Effort value caps: per stat, and over the six stats of a Pokemon
+EV_STAT_CAP = 255
+EV_TOTAL_CAP = 510
+
+def clamp_effort_values(evs):
+    """
+    Applies the effort value caps to many spreads at once, as
+    distribute_effort_values does for one: each stat is capped at 255, and the
+    stat that would take the total past 510 gets what is left, the following
+    ones nothing.
+
+    Args:
+        evs (array-like): (n, 6) non-negative effort values, in stat order.
+
+    Returns:
+        np.ndarray: (n, 6) capped effort values.
+    """
+    capped = np.minimum(np.asarray(evs, dtype=np.int64), EV_STAT_CAP)
+    totals = np.cumsum(capped, axis=1)
+    over = totals > EV_TOTAL_CAP
+    # 0 before the first stat over the cap, 1 on it, more after it
+    seen = np.cumsum(over, axis=1)
+    clamped = np.where(seen == 0, capped, 0)
+    return np.where(over & (seen == 1), EV_TOTAL_CAP - (totals - capped), clamped)
+
+def distribute_effort_values_batch(distributions):
+    """
+    Redistributes the effort values of many Pokemon in one transaction.
+    Each spread is capped as by distribute_effort_values, all of them at once,
+    and every row is written by a single executemany. Nothing is written if
+    any Pokemon is missing. When an id is given twice, its last spread wins.
+
+    Args:
+        distributions (List[Tuple[int, List[int]]]): (pokemon_id, evs) pairs, evs
+            being up to six non-negative integers (hp, atk, def, sp atk, sp def, spd).
+
+    Returns:
+        List[List[int]]: The effort values written, in the order of distributions.
+
+    Raises:
+        ValueError: If a spread is invalid or a Pokemon is not found.
+        sqlite3.Error: For any database errors
+    """
+    ids = []
+    spreads = np.zeros((len(distributions), 6), dtype=np.int64)
+    for row, (pokemon_id, evs) in enumerate(distributions):
+        if not isinstance(evs, list) or len(evs) > 6 or \
+                not all(isinstance(ev, int) and not isinstance(ev, bool) and ev >= 0 for ev in evs):
+            raise ValueError(f"Effort values of {pokemon_id} must be up to six non-negative integers")
+        ids.append(int(pokemon_id))
+        spreads[row, :len(evs)] = evs
+    effort_values = clamp_effort_values(spreads).tolist()
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT p.id FROM pokemon p
+                JOIN stats s ON s.pokemon_id = p.id
+                WHERE p.id IN (SELECT value FROM json_each(?))
+            """, (json.dumps(ids),))
+            found = {row[0] for row in cursor.fetchall()}
+            missing = [pokemon_id for pokemon_id in ids if pokemon_id not in found]
+            if missing:
+                logger.info("Pokemon with ID %s not found", missing[0])
+                raise ValueError(f"Pokemon with ID {missing[0]} not found")
+
+            cursor.executemany("""
+                UPDATE stats
+                SET
+                    hp_effort = ?,
+                    attack_effort = ?,
+                    defense_effort = ?,
+                    special_attack_effort = ?,
+                    special_defense_effort = ?,
+                    speed_effort = ?
+                WHERE pokemon_id = ?
+            """, [(*values, pokemon_id) for pokemon_id, values in zip(ids, effort_values)])
+            conn.commit()
+        for pokemon_id in set(ids):
+            pokemon_cache.invalidate(pokemon_id)
+        return effort_values
+
     except sqlite3.Error as e:
         logger.error("Database error: %s", str(e))
         raise e
 
 def clear_poke() -> None:
     """
-    Recreates the pokemon table, effectively deleting all pokemon.
+    Recreates the pokemon table, effectively deleting all pokemon, and empties
+    the teams they were members of. Ids keep counting from where they were.
 
     Raises:
         sqlite3.Error: If any database error occurs.
@@ -363,10 +712,10 @@ def clear_poke() -> None:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.executescript(create_table_script)
+            cursor.execute("DELETE FROM team_members")
             conn.commit()
 
-            global global_id
-            global_id = 0
+            pokemon_cache.clear()
             logger.info("Pokemon cleared successfully.")
 
     except sqlite3.Error as e:
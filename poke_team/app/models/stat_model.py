@@ -0,0 +1,189 @@
+import json
+import logging
+import sqlite3
+
+import numpy as np
+
+from app.utils.db_utils import get_db_connection
+from app.utils.logger import configure_logger
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+# Column order of every (n, 6) stat array, as in Stats
+STAT_NAMES = ('hp', 'attack', 'defense', 'special_attack', 'special_defense', 'speed')
+
+MAX_LEVEL = 100
+MAX_IV = 31
+
+# nature -> (raised stat, lowered stat); the five where both are the same are neutral
+NATURES = {
+    'hardy': (1, 1), 'lonely': (1, 2), 'brave': (1, 5), 'adamant': (1, 3), 'naughty': (1, 4),
+    'bold': (2, 1), 'docile': (2, 2), 'relaxed': (2, 5), 'impish': (2, 3), 'lax': (2, 4),
+    'timid': (5, 1), 'hasty': (5, 2), 'serious': (5, 5), 'jolly': (5, 3), 'naive': (5, 4),
+    'modest': (3, 1), 'mild': (3, 2), 'quiet': (3, 5), 'bashful': (3, 3), 'rash': (3, 4),
+    'calm': (4, 1), 'gentle': (4, 2), 'sassy': (4, 5), 'careful': (4, 3), 'quirky': (4, 4),
+}
+NATURE_INDEX = {name: i for i, name in enumerate(NATURES)}
+
+def _nature_tenths():
+    # Multipliers in tenths (11 = 1.1x), so the nature step stays in integer math
+    tenths = np.full((len(NATURES), 6), 10, dtype=np.int64)
+    for i, (raised, lowered) in enumerate(NATURES.values()):
+        if raised != lowered:
+            tenths[i, raised] = 11
+            tenths[i, lowered] = 9
+    return tenths
+
+NATURE_TENTHS = _nature_tenths()
+
+STAT_COLUMNS_QUERY = """
+    SELECT
+        pokemon_id,
+        hp_base, attack_base, defense_base, special_attack_base, special_defense_base, speed_base,
+        hp_effort, attack_effort, defense_effort, special_attack_effort, special_defense_effort, speed_effort
+    FROM stats
+"""
+
+def nature_tenths(natures):
+    """
+    Nature multipliers, in tenths, of one nature or one per Pokemon.
+
+    Args:
+        natures (str or List[str]): Nature names; None is a neutral nature.
+
+    Returns:
+        np.ndarray: (6,) or (n, 6) multipliers, 9, 10 or 11.
+
+    Raises:
+        ValueError: If a nature does not exist.
+    """
+    if natures is None or isinstance(natures, str):
+        natures = [natures or 'hardy']
+        single = True
+    else:
+        single = False
+    try:
+        rows = [NATURE_INDEX[nature.lower()] for nature in natures]
+    except (KeyError, AttributeError):
+        raise ValueError(f"Unknown nature, expected one of {', '.join(NATURES)}")
+    tenths = NATURE_TENTHS[rows]
+    return tenths[0] if single else tenths
+
+def calculate_stats(base, evs, ivs=MAX_IV, level=MAX_LEVEL, natures=None):
+    """
+    Computes the in-game stats of many Pokemon in one vectorized pass:
+
+        hp    = (2 * base + iv + ev // 4) * level // 100 + level + 10
+        other = ((2 * base + iv + ev // 4) * level // 100 + 5) * nature
+
+    rounding down at every step as the games do. A base HP of 1 (Shedinja)
+    always gives 1 HP.
+
+    Args:
+        base (array-like): (n, 6) base stats, in STAT_NAMES order.
+        evs (array-like): (n, 6) effort values.
+        ivs (int or array-like): Individual values, one for all, per stat (6,) or per Pokemon (n, 6).
+        level (int or array-like): Level, one for all or per Pokemon (n,).
+        natures (str or List[str]): Nature, one for all or per Pokemon; None is neutral.
+
+    Returns:
+        np.ndarray: (n, 6) final stats.
+
+    Raises:
+        ValueError: If a level, IV or nature is out of range.
+    """
+    base = np.asarray(base, dtype=np.int64)
+    evs = np.asarray(evs, dtype=np.int64)
+    ivs = np.asarray(ivs, dtype=np.int64)
+    level = np.asarray(level, dtype=np.int64).reshape(-1, 1)
+    if ((level < 1) | (level > MAX_LEVEL)).any():
+        raise ValueError(f"Level must be between 1 and {MAX_LEVEL}")
+    if ((ivs < 0) | (ivs > MAX_IV)).any():
+        raise ValueError(f"IVs must be between 0 and {MAX_IV}")
+
+    core = (2 * base + ivs + evs // 4) * level // 100
+    stats = (core + 5) * nature_tenths(natures) // 10
+    stats[:, 0] = np.where(base[:, 0] == 1, 1, core[:, 0] + level[:, 0] + 10)
+    return stats
+
+def load_stat_columns(pokemon_ids=None):
+    """
+    Loads the base stats and effort values of many Pokemon as arrays, in one query.
+
+    Args:
+        pokemon_ids (List[int]): The Pokemon to load, None for the whole roster.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: ids (n,), base (n, 6) and evs (n, 6),
+        in the order of pokemon_ids (unknown ids are skipped) or by id for the roster.
+
+    Raises:
+        sqlite3.Error: For any database errors
+    """
+    try:
+        with get_db_connection(read_only=True) as conn:
+            cursor = conn.cursor()
+            if pokemon_ids is None:
+                cursor.execute(STAT_COLUMNS_QUERY + " ORDER BY pokemon_id")
+            else:
+                cursor.execute(STAT_COLUMNS_QUERY + " WHERE pokemon_id IN (SELECT value FROM json_each(?)) ORDER BY pokemon_id",
+                               (json.dumps([int(i) for i in pokemon_ids]),))
+            rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 13)
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+    if pokemon_ids is not None:
+        # Back to the requested order, dropping the ids that were not found
+        wanted = np.asarray(pokemon_ids, dtype=np.int64).reshape(-1)
+        positions = np.searchsorted(rows[:, 0], wanted).clip(max=max(len(rows) - 1, 0))
+        found = rows[positions, 0] == wanted if len(rows) else np.zeros(len(wanted), dtype=bool)
+        rows = rows[positions[found]]
+    return rows[:, 0], rows[:, 1:7], rows[:, 7:13]
+
+def get_roster_stats(pokemon_ids=None, ivs=MAX_IV, level=MAX_LEVEL, nature=None):
+    """
+    Computes the final stats of many Pokemon.
+
+    Args:
+        pokemon_ids (List[int]): The Pokemon, None for the whole roster.
+        ivs (int or List[int]): Individual values, one for every stat or six.
+        level (int): Level of every Pokemon.
+        nature (str): Nature of every Pokemon, None for a neutral one.
+
+    Returns:
+        List[dict]: Per Pokemon found, its id and its stats by name.
+
+    Raises:
+        ValueError: If a level, IV or nature is out of range.
+        sqlite3.Error: For any database errors
+    """
+    ids, base, evs = load_stat_columns(pokemon_ids)
+    stats = calculate_stats(base, evs, ivs, level, nature)
+    return [{'id': pokemon_id, 'stats': dict(zip(STAT_NAMES, row))}
+            for pokemon_id, row in zip(ids.tolist(), stats.tolist())]
+
+def get_pokemon_stats(pokemon_id, ivs=MAX_IV, level=MAX_LEVEL, nature=None):
+    """
+    Computes the final stats of one Pokemon.
+
+    Args:
+        pokemon_id (int): The ID of the Pokemon.
+        ivs (int or List[int]): Individual values, one for every stat or six.
+        level (int): Its level.
+        nature (str): Its nature, None for a neutral one.
+
+    Returns:
+        dict: Its stats by name.
+
+    Raises:
+        ValueError: If the Pokemon is not found, or a level, IV or nature is out of range.
+        sqlite3.Error: For any database errors
+    """
+    roster = get_roster_stats([pokemon_id], ivs, level, nature)
+    if not roster:
+        logger.info("Pokemon with ID %s not found", pokemon_id)
+        raise ValueError(f"Pokemon with ID {pokemon_id} not found")
+    return roster[0]['stats']
@@ -1,7 +1,242 @@
-from app import db
+from dataclasses import dataclass
+import json
+import logging
+import sqlite3
+from typing import List
 
-class Team(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    name = db.Column(db.String(80), nullable=False)
-    pokemon_ids = db.Column(db.JSON, nullable=False) 
+from app.models.poke_model import Pokemon, get_pokemon_by_ids
+from app.utils.db_utils import get_db_connection
+from app.utils.logger import configure_logger
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+TEAM_SIZE = 6
+
+@dataclass
+class Team:
+    id: int
+    user_id: int
+    name: str
+    members: List[Pokemon]
+
+# Teams with their member ids in slot order; the WHERE clause is added per use
+TEAM_QUERY = """
+    SELECT
+        t.id, t.user_id, t.name,
+        (
+            SELECT json_group_array(pokemon_id) FROM (
+                SELECT pokemon_id FROM team_members WHERE team_id = t.id ORDER BY slot
+            )
+        ) AS pokemon_ids
+    FROM teams t
+"""
+
+def _validate_members(pokemon_ids):
+    if not isinstance(pokemon_ids, list) or not 1 <= len(pokemon_ids) <= TEAM_SIZE or \
+            not all(isinstance(i, int) and not isinstance(i, bool) for i in pokemon_ids):
+        raise ValueError(f"A team must have 1 to {TEAM_SIZE} pokemon ids")
+    if len(set(pokemon_ids)) != len(pokemon_ids):
+        raise ValueError("A pokemon can only be in a team once")
+
+def _check_pokemon_exist(cursor, pokemon_ids):
+    cursor.execute("SELECT id FROM pokemon WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(pokemon_ids),))
+    found = {row[0] for row in cursor.fetchall()}
+    for pokemon_id in pokemon_ids:
+        if pokemon_id not in found:
+            logger.info("Pokemon with ID %s not found", pokemon_id)
+            raise ValueError(f"Pokemon with ID {pokemon_id} not found")
+
+def _owned_team(cursor, team_id, username):
+    cursor.execute("""
+        SELECT t.id FROM teams t
+        JOIN users u ON u.id = t.user_id
+        WHERE t.id = ? AND u.username = ?
+    """, (team_id, username))
+    if cursor.fetchone() is None:
+        logger.info("Team with ID %s not found for %s", team_id, username)
+        raise ValueError(f"Team with ID {team_id} not found")
+
+def create_team(username, name, pokemon_ids):
+    """
+    Creates a team of existing Pokemon for a user.
+
+    Args:
+        username (str): The owner of the team.
+        name (str): The name of the team.
+        pokemon_ids (List[int]): 1 to 6 distinct Pokemon ids, in slot order.
+
+    Returns:
+        int: The id of the new team.
+
+    Raises:
+        ValueError: If the name or the members are invalid, or the user or a Pokemon is not found.
+        sqlite3.Error: For any database errors
+    """
+    if not isinstance(name, str) or not name:
+        raise ValueError("A team name must be a non-empty string")
+    _validate_members(pokemon_ids)
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+            user = cursor.fetchone()
+            if user is None:
+                raise ValueError(f"User {username} not found")
+            _check_pokemon_exist(cursor, pokemon_ids)
+
+            cursor.execute("INSERT INTO teams (user_id, name) VALUES (?, ?)", (user[0], name))
+            team_id = cursor.lastrowid
+            cursor.executemany("INSERT INTO team_members (team_id, slot, pokemon_id) VALUES (?, ?, ?)",
+                               [(team_id, slot, pokemon_id) for slot, pokemon_id in enumerate(pokemon_ids)])
+            conn.commit()
+
+            logger.info("Team %s created for %s", team_id, username)
+            return team_id
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+def set_team_members(team_id, username, pokemon_ids):
+    """
+    Replaces the members of a user's team.
+
+    Args:
+        team_id (int): The team.
+        username (str): Its owner.
+        pokemon_ids (List[int]): 1 to 6 distinct Pokemon ids, in slot order.
+
+    Raises:
+        ValueError: If the members are invalid, or the team (of that user) or a Pokemon is not found.
+        sqlite3.Error: For any database errors
+    """
+    _validate_members(pokemon_ids)
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            _owned_team(cursor, team_id, username)
+            _check_pokemon_exist(cursor, pokemon_ids)
+
+            cursor.execute("DELETE FROM team_members WHERE team_id = ?", (team_id,))
+            cursor.executemany("INSERT INTO team_members (team_id, slot, pokemon_id) VALUES (?, ?, ?)",
+                               [(team_id, slot, pokemon_id) for slot, pokemon_id in enumerate(pokemon_ids)])
+            conn.commit()
+
+            logger.info("Members of team %s replaced", team_id)
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+def _load_teams(where, params):
+    """
+    Loads teams with their members in two queries, whatever the number of
+    teams and members: one for the teams and their member ids, one for the
+    members with their stats and moves.
+    """
+    try:
+        with get_db_connection(read_only=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(TEAM_QUERY + where, params)
+            rows = [(row[0], row[1], row[2], json.loads(row[3])) for row in cursor.fetchall()]
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+    member_ids = list(dict.fromkeys(pokemon_id for row in rows for pokemon_id in row[3]))
+    members = {pokemon.id: pokemon for pokemon in get_pokemon_by_ids(member_ids)} if member_ids else {}
+    return [
+        Team(id=team_id, user_id=user_id, name=name,
+             members=[members[pokemon_id] for pokemon_id in pokemon_ids if pokemon_id in members])
+        for team_id, user_id, name, pokemon_ids in rows
+    ]
+
+def get_teams(team_ids, username=None):
+    """
+    Retrieves many teams with their members' stats and moves.
+
+    Args:
+        team_ids (List[int]): The teams.
+        username (str): If given, only the teams of this user are found.
+
+    Returns:
+        List[Team]: The teams found, in the order of team_ids. Unknown ids are skipped.
+
+    Raises:
+        sqlite3.Error: For any database errors
+    """
+    team_ids = [int(i) for i in team_ids]
+    where, params = "WHERE t.id IN (SELECT value FROM json_each(?))", (json.dumps(team_ids),)
+    if username is not None:
+        where, params = where + " AND t.user_id = (SELECT id FROM users WHERE username = ?)", params + (username,)
+    found = {team.id: team for team in _load_teams(where, params)}
+    return [found[i] for i in team_ids if i in found]
+
+def get_team(team_id, username=None):
+    """
+    Retrieves a team with its members' stats and moves.
+
+    Args:
+        team_id (int): The team.
+        username (str): If given, the team must belong to this user.
+
+    Returns:
+        Team: The team, its members in slot order.
+
+    Raises:
+        ValueError: If the team (of that user) is not found.
+        sqlite3.Error: For any database errors
+    """
+    teams = get_teams([team_id], username)
+    if not teams:
+        logger.info("Team with ID %s not found", team_id)
+        raise ValueError(f"Team with ID {team_id} not found")
+    return teams[0]
+
+def get_user_teams(username):
+    """
+    Retrieves every team of a user with their members' stats and moves.
+
+    Args:
+        username (str): The owner.
+
+    Returns:
+        List[Team]: The user's teams, oldest first.
+
+    Raises:
+        sqlite3.Error: For any database errors
+    """
+    return _load_teams("WHERE t.user_id = (SELECT id FROM users WHERE username = ?) ORDER BY t.id", (username,))
+
+def get_teams_with_pokemon(pokemon_id):
+    """
+    Finds the teams a Pokemon is a member of, through the team_members index.
+
+    Args:
+        pokemon_id (int): The Pokemon.
+
+    Returns:
+        List[dict]: id, name and slot of each team, by team id.
+
+    Raises:
+        sqlite3.Error: For any database errors
+    """
+    try:
+        with get_db_connection(read_only=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.id, t.name, m.slot
+                FROM team_members m
+                JOIN teams t ON t.id = m.team_id
+                WHERE m.pokemon_id = ?
+                ORDER BY t.id
+            """, (pokemon_id,))
+            return [{'id': row[0], 'name': row[1], 'slot': row[2]} for row in cursor.fetchall()]
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
@@ -0,0 +1,240 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+import numpy as np
+
+from app.models import poke_model, team_model
+from app.services import pokeapi_mirror
+from app.utils.api_utils import fetch_json
+from app.utils.logger import configure_logger
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+TYPES = (
+    'normal', 'fire', 'water', 'electric', 'grass', 'ice', 'fighting', 'poison', 'ground',
+    'flying', 'psychic', 'bug', 'rock', 'ghost', 'dragon', 'dark', 'steel', 'fairy',
+)
+TYPE_INDEX = {name: i for i, name in enumerate(TYPES)}
+# Index of "no type": the missing second type of a single-type Pokemon, an empty team slot
+NO_TYPE = len(TYPES)
+
+# attacking type -> defending types it does not hit for 1x (generation 6 onwards)
+_NOT_NEUTRAL = {
+    'normal': {'rock': 0.5, 'ghost': 0, 'steel': 0.5},
+    'fire': {'fire': 0.5, 'water': 0.5, 'grass': 2, 'ice': 2, 'bug': 2, 'rock': 0.5, 'dragon': 0.5, 'steel': 2},
+    'water': {'fire': 2, 'water': 0.5, 'grass': 0.5, 'ground': 2, 'rock': 2, 'dragon': 0.5},
+    'electric': {'water': 2, 'electric': 0.5, 'grass': 0.5, 'ground': 0, 'flying': 2, 'dragon': 0.5},
+    'grass': {'fire': 0.5, 'water': 2, 'grass': 0.5, 'poison': 0.5, 'ground': 2, 'flying': 0.5, 'bug': 0.5,
+              'rock': 2, 'dragon': 0.5, 'steel': 0.5},
+    'ice': {'fire': 0.5, 'water': 0.5, 'grass': 2, 'ice': 0.5, 'ground': 2, 'flying': 2, 'dragon': 2, 'steel': 0.5},
+    'fighting': {'normal': 2, 'ice': 2, 'poison': 0.5, 'flying': 0.5, 'psychic': 0.5, 'bug': 0.5, 'rock': 2,
+                 'ghost': 0, 'dark': 2, 'steel': 2, 'fairy': 0.5},
+    'poison': {'grass': 2, 'poison': 0.5, 'ground': 0.5, 'rock': 0.5, 'ghost': 0.5, 'steel': 0, 'fairy': 2},
+    'ground': {'fire': 2, 'electric': 2, 'grass': 0.5, 'poison': 2, 'flying': 0, 'bug': 0.5, 'rock': 2, 'steel': 2},
+    'flying': {'electric': 0.5, 'grass': 2, 'fighting': 2, 'bug': 2, 'rock': 0.5, 'steel': 0.5},
+    'psychic': {'fighting': 2, 'poison': 2, 'psychic': 0.5, 'dark': 0, 'steel': 0.5},
+    'bug': {'fire': 0.5, 'grass': 2, 'fighting': 0.5, 'poison': 0.5, 'flying': 0.5, 'psychic': 2, 'ghost': 0.5,
+            'dark': 2, 'steel': 0.5, 'fairy': 0.5},
+    'rock': {'fire': 2, 'ice': 2, 'fighting': 0.5, 'ground': 0.5, 'flying': 2, 'bug': 2, 'steel': 0.5},
+    'ghost': {'normal': 0, 'psychic': 2, 'ghost': 2, 'dark': 0.5},
+    'dragon': {'dragon': 2, 'steel': 0.5, 'fairy': 0},
+    'dark': {'fighting': 0.5, 'psychic': 2, 'ghost': 2, 'dark': 0.5, 'fairy': 0.5},
+    'steel': {'fire': 0.5, 'water': 0.5, 'electric': 0.5, 'ice': 2, 'rock': 2, 'steel': 0.5, 'fairy': 2},
+    'fairy': {'fire': 0.5, 'fighting': 2, 'poison': 0.5, 'dragon': 2, 'dark': 2, 'steel': 0.5},
+}
+
+def _type_chart():
+    chart = np.ones((len(TYPES), len(TYPES)))
+    for attacking, row in _NOT_NEUTRAL.items():
+        for defending, multiplier in row.items():
+            chart[TYPE_INDEX[attacking], TYPE_INDEX[defending]] = multiplier
+    return chart
+
+# TYPE_CHART[attacking, defending]
+TYPE_CHART = _type_chart()
+# DEFENSE_CHART[defending, attacking], with a neutral row for NO_TYPE, so a
+# dual type's multipliers are the product of two rows
+DEFENSE_CHART = np.vstack([TYPE_CHART.T, np.ones(len(TYPES))])
+
+# Species and move data never change, so they are kept for the life of the process.
+# game_id -> (type index, type index or NO_TYPE)
+species_types = {}
+# move name -> (type index, power, damage class)
+move_data = {}
+
+def fetch_move(name):
+    """
+    Fetch the PokeAPI document of a move, from the local mirror when
+    POKEAPI_MIRROR is enabled and from PokeAPI (through the response cache) otherwise.
+
+    Args:
+        name (string): The name of the move.
+
+    Returns:
+        dict: The move document, or None if it does not exist.
+    """
+    if pokeapi_mirror.POKEAPI_MIRROR:
+        return pokeapi_mirror.get_move(name)
+    return fetch_json(poke_model.BASE_POKE_URL + "/move/" + name)
+
+def _fetch_missing(catalog, keys, fetch):
+    """The documents of the keys not in catalog yet, fetched concurrently."""
+    missing = [key for key in dict.fromkeys(keys) if key not in catalog]
+    if not missing:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(poke_model.BATCH_FETCH_WORKERS, len(missing))) as pool:
+        return dict(zip(missing, pool.map(fetch, missing)))
+
+def load_species_types(game_ids):
+    """
+    Makes sure the types of the given species are in species_types.
+
+    Raises:
+        ValueError: If a species does not exist.
+    """
+    for game_id, doc in _fetch_missing(species_types, game_ids, lambda i: poke_model.fetch_species(str(i))).items():
+        if doc is None:
+            raise ValueError(f"Species {game_id} does not exist")
+        indices = [TYPE_INDEX.get(t['type']['name'], NO_TYPE) for t in sorted(doc['types'], key=lambda t: t['slot'])]
+        species_types[game_id] = tuple((indices + [NO_TYPE, NO_TYPE])[:2])
+
+def load_move_data(names):
+    """Makes sure the given moves are in move_data; unknown moves are left out."""
+    for name, doc in _fetch_missing(move_data, names, fetch_move).items():
+        if doc is None:
+            logger.info("Move %s does not exist", name)
+            continue
+        move_data[name] = (TYPE_INDEX.get(doc['type']['name'], NO_TYPE), doc.get('power') or 0,
+                           doc['damage_class']['name'])
+
+def team_arrays(teams):
+    """
+    Lays teams out as arrays for coverage.
+
+    Args:
+        teams (List[List[Pokemon]]): The members of each team.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: member types (teams, members, 2), padded
+        with NO_TYPE, and the attacking types of the members' damaging moves (teams, 18).
+    """
+    load_species_types([pokemon.game_id for team in teams for pokemon in team])
+    load_move_data([move for team in teams for pokemon in team for move in pokemon.learned_moves])
+
+    size = max((len(team) for team in teams), default=0)
+    member_types = np.full((len(teams), size, 2), NO_TYPE, dtype=np.intp)
+    attacks = np.zeros((len(teams), len(TYPES) + 1), dtype=bool)
+    team_rows, move_types = [], []
+    for t, team in enumerate(teams):
+        for m, pokemon in enumerate(team):
+            member_types[t, m] = species_types[pokemon.game_id]
+            for move in pokemon.learned_moves:
+                data = move_data.get(move)
+                if data is not None and data[2] != 'status':
+                    team_rows.append(t)
+                    move_types.append(data[0])
+    attacks[team_rows, move_types] = True
+    return member_types, attacks[:, :len(TYPES)]
+
+def coverage(member_types, attacks):
+    """
+    Type coverage of many teams in one pass.
+
+    Args:
+        member_types (np.ndarray): (teams, members, 2) type indices, NO_TYPE for none.
+        attacks (np.ndarray): (teams, 18) whether a team has a damaging move of each type.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: per team and type,
+        the members weak to, resisting and immune to attacks of that type, and
+        the best multiplier the team's moves get against a Pokemon of that type.
+    """
+    defense = DEFENSE_CHART[member_types[..., 0]] * DEFENSE_CHART[member_types[..., 1]]
+    weak = (defense > 1).sum(axis=1)
+    resist = ((defense < 1) & (defense > 0)).sum(axis=1)
+    immune = (defense == 0).sum(axis=1)
+    offense = (attacks[:, :, None] * TYPE_CHART).max(axis=1)
+    return weak, resist, immune, offense
+
+def analyze_teams(teams):
+    """
+    Weaknesses, resistances and offensive coverage of many teams.
+
+    Args:
+        teams (List[List[Pokemon]]): The members of each team.
+
+    Returns:
+        List[dict]: Per team, by type: weaknesses, resistances and immunities
+        (how many members), exposed (types more members are weak to than resist
+        or are immune to), super_effective (types a damaging move hits for 2x or
+        more) and uncovered (the other types).
+
+    Raises:
+        ValueError: If the species of a member does not exist.
+    """
+    weak, resist, immune, offense = coverage(*team_arrays(teams))
+    exposed = weak > resist + immune
+    super_effective = offense >= 2
+
+    def by_type(counts):
+        return {name: count for name, count in zip(TYPES, counts) if count}
+
+    def types_where(mask):
+        return [name for name, flag in zip(TYPES, mask) if flag]
+
+    return [
+        {
+            'weaknesses': by_type(weak_row),
+            'resistances': by_type(resist_row),
+            'immunities': by_type(immune_row),
+            'exposed': types_where(exposed_row),
+            'super_effective': types_where(super_row),
+            'uncovered': types_where([not flag for flag in super_row]),
+        }
+        for weak_row, resist_row, immune_row, exposed_row, super_row in zip(
+            weak.tolist(), resist.tolist(), immune.tolist(), exposed.tolist(), super_effective.tolist())
+    ]
+
+def team_coverage(team_ids, username=None):
+    """
+    Coverage of stored teams.
+
+    Args:
+        team_ids (List[int]): The teams.
+        username (str): If given, the teams must belong to this user.
+
+    Returns:
+        List[dict]: The coverage of each team, with its team_id, in the order of team_ids.
+
+    Raises:
+        ValueError: If a team (of that user) is not found.
+    """
+    teams = team_model.get_teams(team_ids, username)
+    found = {team.id for team in teams}
+    for team_id in team_ids:
+        if team_id not in found:
+            raise ValueError(f"Team with ID {team_id} not found")
+    return [dict(team_id=team.id, **result) for team, result in zip(teams, analyze_teams([team.members for team in teams]))]
+
+def pokemon_coverage(id_lists):
+    """
+    Coverage of sets of Pokemon, each analyzed as a team.
+
+    Args:
+        id_lists (List[List[int]]): The Pokemon ids of each set.
+
+    Returns:
+        List[dict]: The coverage of each set, with its pokemon_ids, in order.
+
+    Raises:
+        ValueError: If a Pokemon is not found.
+    """
+    pokemons = {pokemon.id: pokemon for pokemon in poke_model.get_pokemon_by_ids(
+        list(dict.fromkeys(i for ids in id_lists for i in ids)))}
+    for ids in id_lists:
+        for pokemon_id in ids:
+            if pokemon_id not in pokemons:
+                raise ValueError(f"Pokemon with ID {pokemon_id} not found")
+    results = analyze_teams([[pokemons[i] for i in ids] for ids in id_lists])
+    return [dict(pokemon_ids=ids, **result) for ids, result in zip(id_lists, results)]
@@ -2,15 +2,18 @@ from dataclasses import dataclass
 import logging
 import os
 import sqlite3
-import bcrypt
 from typing import Any
 
+from app.utils.auth_tokens import token_signer
 from app.utils.db_utils import get_db_connection
-from app.utils.logger import configure_logger
+from app.utils.logger import RateLimitedLog, configure_logger
+from app.utils.password_hasher import HasherBusyError, password_hasher
 
 
 logger = logging.getLogger(__name__)
 configure_logger(logger)
+# Logged on every login attempt: sampled so a flood cannot flood the log too
+attempt_log = RateLimitedLog(logger)
 
 @dataclass
 class User:
@@ -31,6 +34,7 @@ def create_account(username: str, password: str) -> None:
                             OR if either the username or password is empty
                                 OR a user with the same username already exists
 
+            HasherBusyError: If the password hashing queue is full.
             sqlite3.Error: If any database error occurs.
         """
     
@@ -38,8 +42,8 @@ def create_account(username: str, password: str) -> None:
         raise ValueError(f"Invalid username or passrowd: {username}, {password}. Both must be a string.")
    
     try:
-        salt = bcrypt.gensalt()
-        hashed_passwd = bcrypt.hashpw(password.encode('utf-8'), salt)
+        hashed_passwd = password_hasher.hash(password)
+        salt = hashed_passwd[:29]
 
 
         with get_db_connection() as conn:
@@ -65,7 +69,7 @@ def update_password(username:str, password: str) -> None:
 
     """
         Updates the password of the user with the specified name to the 
-            given password (after hashing)
+            given password (after hashing), and revokes the user's session tokens
         Args:
             username (str): The username of the account to be updated
             password (str): The new password to be hashed and placed back into the users table
@@ -74,6 +78,7 @@ def update_password(username:str, password: str) -> None:
                             OR if either the username or password is empty
                                 OR a user with the given username does not exist
                                 
+            HasherBusyError: If the password hashing queue is full.
             sqlite3.Error: If any database error occurs.
         """
     
@@ -81,9 +86,9 @@ def update_password(username:str, password: str) -> None:
         raise ValueError(f"Invalid username or passrowd: {username}, {password}. Both must be a string.")
    
     try:
+        hashed_passwd = password_hasher.hash(password)
+        salt = hashed_passwd[:29]
         with get_db_connection() as conn:
-            salt = bcrypt.gensalt()
-            hashed_passwd = bcrypt.hashpw(password.encode('utf-8'), salt)
             cursor = conn.cursor()
             
             cursor.execute("SELECT username FROM users WHERE username = ?", (username, ))
@@ -100,6 +105,7 @@ def update_password(username:str, password: str) -> None:
             
             cursor.execute("UPDATE users SET hashed_passwd = ?, salt = ? WHERE username = ?", (hashed_passwd, salt, username, ) )
             conn.commit()
+        token_signer.revoke_user(username)
 
     except sqlite3.Error as e:
         logger.error("Database error: %s", str(e))
@@ -109,13 +115,17 @@ def login(username:str, password:str)->None:
 
     """
         Attempts to log in by matching the given username and password with 
-                the correlating username and password in the users table
+                the correlating username and password in the users table.
+        A password stored with another bcrypt work factor than BCRYPT_ROUNDS
+                is rehashed with the configured one on a successful login, if the
+                hasher and the database allow; a failed rehash does not fail the login.
         Args:
             username (str): The username of the account that's trying to be logged in
             password (str): The password of the account to be compared with the stored password
         Raises:
             ValueError: If either the username or password is not a string
                             OR if either the username or password is empty
+            HasherBusyError: If the password hashing queue is full.
             sqlite3.Error: If any database error occurs.
         """
     
@@ -123,31 +133,47 @@ def login(username:str, password:str)->None:
         raise ValueError(f"Invalid username or passrowd: {username}, {password}. Both must be a string.")
    
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(read_only=True) as conn:
             cursor = conn.cursor()
             cursor.execute("""SELECT hashed_passwd, salt FROM users WHERE username = ?""" , (username, ))
             passwd = cursor.fetchone()
 
-            if passwd:
-
-                correct = bcrypt.checkpw(password.encode('utf-8'), passwd[0])
-                if correct:
-                    logger.info("successfully logged in :3")
-                    return True
-                else:
-                    logger.info("wrong password :(")
-                    return False
-                                       
-
+        if passwd:
+
+            correct = password_hasher.check(password, passwd[0])
+            if correct:
+                attempt_log.info("successfully logged in :3")
+                if password_hasher.needs_rehash(passwd[0]):
+                    try:
+                        _rehash(username, password, passwd[0])
+                    except (HasherBusyError, sqlite3.Error) as e:
+                        # Best effort: the old hash still works, the next login tries again
+                        logger.warning("Could not rehash password of user %s: %s", username, str(e))
+                return True
             else:
-                logger.info("User %s not found", username)
+                attempt_log.info("wrong password :(")
                 return False
-           
-                
+                                   
+
+        else:
+            attempt_log.info("User %s not found", username)
+            return False
 
     except sqlite3.Error as e:
         logger.error("Database error: %s", str(e))
         raise e
+
+def _rehash(username: str, password: str, old_hash: bytes) -> None:
+    # Only replaces the hash that was just verified, never a password changed in the meantime
+    hashed_passwd = password_hasher.hash(password)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE users SET hashed_passwd = ?, salt = ? WHERE username = ? AND hashed_passwd = ?",
+            (hashed_passwd, hashed_passwd[:29], username, old_hash)
+        )
+        conn.commit()
+    logger.info("Rehashed password of user %s with %d rounds", username, password_hasher.rounds)
     
 def clear_user() -> None:
     """
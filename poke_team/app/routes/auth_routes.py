@@ -1,6 +1,7 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, g, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.models import User, db
+from app.utils.auth_tokens import token_required
 
 bp = Blueprint("auth", __name__)
 
@@ -17,3 +18,8 @@ def signup():
     db.session.add(user)
     db.session.commit()
     return jsonify({"message": "Signup successful"}), 201
+
+@bp.route("/me", methods=["GET"])
+@token_required
+def me():
+    return jsonify({"username": g.username}), 200
@@ -0,0 +1,329 @@
+"""
+Local mirror of the PokeAPI species data used by poke_model.
+
+Species, base stats, abilities, types and learnsets are imported into tables
+next to the pokemon/stats/learned_moves schema (see sql/create_mirror_tables.sql)
+so that the write paths can run with no outbound HTTP. Moves (type, power and
+damage class) are imported alongside for the type and damage calculations.
+
+Usage:
+    python -m app.services.pokeapi_mirror --dump-dir /path/to/api-data/data
+    python -m app.services.pokeapi_mirror --base-url http://localhost:8000/api/v2 [--resource move] [names or ids...]
+
+Re-running the importer is incremental: a record is only rewritten when the
+hash of its mirrored content changed.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from typing import Iterable, Iterator, List, Optional
+
+from app.utils import db_utils, http_client
+from app.utils.db_utils import get_db_connection
+from app.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+POKEAPI_MIRROR = os.getenv("POKEAPI_MIRROR", "false").lower() == "true"
+
+
+def normalize_species(doc: dict) -> dict:
+    """
+    Extracts the mirrored subset of a PokeAPI /pokemon document.
+
+    Args:
+        doc (dict): The document as served by PokeAPI.
+
+    Returns:
+        dict: id, name, stats, abilities, types and moves in a stable order.
+    """
+    return {
+        'id': doc['id'],
+        'name': doc['name'],
+        'stats': sorted((s['stat']['name'], s['base_stat']) for s in doc.get('stats', [])),
+        'abilities': sorted(
+            (a['slot'], a['ability']['name'], bool(a.get('is_hidden', False))) for a in doc.get('abilities', [])
+        ),
+        'types': sorted((t['slot'], t['type']['name']) for t in doc.get('types', [])),
+        'moves': sorted({m['move']['name'] for m in doc.get('moves', [])}),
+    }
+
+
+def content_hash(species: dict) -> str:
+    return hashlib.sha256(json.dumps(species, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def import_species(cursor: sqlite3.Cursor, doc: dict) -> str:
+    """
+    Upserts one species into the mirror tables.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of the open import transaction.
+        doc (dict): The PokeAPI /pokemon document.
+
+    Returns:
+        str: 'inserted', 'updated' or 'unchanged'.
+    """
+    species = normalize_species(doc)
+    digest = content_hash(species)
+    species_id = species['id']
+
+    cursor.execute("SELECT content_hash FROM species WHERE id = ?", (species_id,))
+    row = cursor.fetchone()
+    if row and row[0] == digest:
+        return 'unchanged'
+
+    for table in ("species_stats", "species_abilities", "species_types", "species_moves"):
+        cursor.execute(f"DELETE FROM {table} WHERE species_id = ?", (species_id,))
+    cursor.execute("""
+        INSERT OR REPLACE INTO species (id, name, content_hash, synced_at)
+        VALUES (?, ?, ?, ?)
+    """, (species_id, species['name'], digest, time.time()))
+
+    cursor.executemany(
+        "INSERT INTO species_stats (species_id, stat, base_stat) VALUES (?, ?, ?)",
+        [(species_id, stat, base) for stat, base in species['stats']]
+    )
+    cursor.executemany(
+        "INSERT INTO species_abilities (species_id, slot, ability, is_hidden) VALUES (?, ?, ?, ?)",
+        [(species_id, slot, ability, int(hidden)) for slot, ability, hidden in species['abilities']]
+    )
+    cursor.executemany(
+        "INSERT INTO species_types (species_id, slot, type) VALUES (?, ?, ?)",
+        [(species_id, slot, type_name) for slot, type_name in species['types']]
+    )
+    cursor.executemany(
+        "INSERT INTO species_moves (species_id, move) VALUES (?, ?)",
+        [(species_id, move) for move in species['moves']]
+    )
+    return 'updated' if row else 'inserted'
+
+
+def normalize_move(doc: dict) -> dict:
+    """
+    Extracts the mirrored subset of a PokeAPI /move document.
+
+    Returns:
+        dict: id, name, type, power (None for status moves) and damage class.
+    """
+    return {
+        'id': doc['id'],
+        'name': doc['name'],
+        'type': doc['type']['name'],
+        'power': doc.get('power'),
+        'damage_class': doc['damage_class']['name'],
+    }
+
+
+def is_move(doc: dict) -> bool:
+    return 'damage_class' in doc and 'type' in doc
+
+
+def import_move(cursor: sqlite3.Cursor, doc: dict) -> str:
+    """
+    Upserts one move into the mirror.
+
+    Returns:
+        str: 'inserted', 'updated' or 'unchanged'.
+    """
+    move = normalize_move(doc)
+    digest = content_hash(move)
+
+    cursor.execute("SELECT content_hash FROM moves WHERE id = ?", (move['id'],))
+    row = cursor.fetchone()
+    if row and row[0] == digest:
+        return 'unchanged'
+
+    cursor.execute("""
+        INSERT OR REPLACE INTO moves (id, name, type, power, damage_class, content_hash, synced_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (move['id'], move['name'], move['type'], move['power'], move['damage_class'], digest, time.time()))
+    return 'updated' if row else 'inserted'
+
+
+def iter_dump(dump_dir: str) -> Iterator[dict]:
+    """
+    Yields the /pokemon and /move documents of a PokeAPI JSON dump.
+
+    Both the api-data layout (pokemon/<id>/index.json, optionally under
+    api/v2/) and a flat pokemon/<name>.json directory are accepted.
+    """
+    for resource, wanted in (("pokemon", lambda doc: 'stats' in doc and 'moves' in doc), ("move", is_move)):
+        patterns = []
+        for prefix in ("", "api/v2", "data/api/v2"):
+            root = os.path.join(dump_dir, prefix, resource)
+            patterns += [os.path.join(root, "*", "index.json"), os.path.join(root, "*.json")]
+        for pattern in patterns:
+            for path in sorted(glob.glob(pattern)):
+                with open(path, "r") as fh:
+                    doc = json.load(fh)
+                if wanted(doc):
+                    yield doc
+
+
+def iter_server(base_url: str, identifiers: Optional[List[str]] = None, limit: int = 100000,
+                resource: str = "pokemon") -> Iterator[dict]:
+    """
+    Yields /pokemon (or /move) documents from a PokeAPI-compatible server.
+
+    Args:
+        base_url (str): Base url of the API, e.g. http://localhost:8000/api/v2
+        identifiers (List[str]): Names or ids to fetch. Defaults to every species
+            (or move) listed by the server.
+        resource (str): "pokemon" or "move".
+    """
+    base_url = base_url.rstrip('/')
+    if not identifiers:
+        response = http_client.get(f"{base_url}/{resource}", params={'limit': limit})
+        response.raise_for_status()
+        identifiers = [entry['name'] for entry in response.json()['results']]
+    for identifier in identifiers:
+        response = http_client.get(f"{base_url}/{resource}/{identifier}")
+        if response.status_code != 200:
+            logger.warning("Skipping %s: upstream returned %s", identifier, response.status_code)
+            continue
+        yield response.json()
+
+
+def sync(docs: Iterable[dict], db_path: Optional[str] = None, batch_size: int = 200) -> dict:
+    """
+    Imports species and move documents into the mirror, committing every batch_size records.
+
+    Returns:
+        dict: Number of inserted, updated and unchanged records.
+    """
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    conn = sqlite3.connect(db_path or db_utils.DB_PATH)
+    try:
+        with open(os.getenv("SQL_CREATE_MIRROR_TABLE_PATH", "/app/sql/create_mirror_tables.sql"), "r") as fh:
+            conn.executescript(fh.read())
+        cursor = conn.cursor()
+        for i, doc in enumerate(docs, start=1):
+            counts[(import_move if is_move(doc) else import_species)(cursor, doc)] += 1
+            if i % batch_size == 0:
+                conn.commit()
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error("Database error during mirror sync: %s", str(e))
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+    logger.info("Mirror sync finished: %s", counts)
+    return counts
+
+
+def get_species(identifier) -> Optional[dict]:
+    """
+    Reads a species from the mirror in the shape of a PokeAPI /pokemon document.
+
+    Args:
+        identifier (str | int): Species name or PokeAPI id.
+
+    Returns:
+        dict: The document, or None if the species is not mirrored.
+    """
+    identifier = str(identifier).lower()
+    try:
+        with get_db_connection(read_only=True) as conn:
+            cursor = conn.cursor()
+            if identifier.isdigit():
+                cursor.execute("SELECT id, name FROM species WHERE id = ?", (int(identifier),))
+            else:
+                cursor.execute("SELECT id, name FROM species WHERE name = ?", (identifier,))
+            row = cursor.fetchone()
+            if not row:
+                logger.info("Species %s not in mirror", identifier)
+                return None
+            species_id, name = row
+
+            cursor.execute("SELECT stat, base_stat FROM species_stats WHERE species_id = ?", (species_id,))
+            stats = cursor.fetchall()
+            cursor.execute("""
+                SELECT slot, ability, is_hidden FROM species_abilities
+                WHERE species_id = ? ORDER BY slot
+            """, (species_id,))
+            abilities = cursor.fetchall()
+            cursor.execute("SELECT slot, type FROM species_types WHERE species_id = ? ORDER BY slot", (species_id,))
+            types = cursor.fetchall()
+            cursor.execute("SELECT move FROM species_moves WHERE species_id = ?", (species_id,))
+            moves = cursor.fetchall()
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+    return {
+        'id': species_id,
+        'name': name,
+        'stats': [{'base_stat': base, 'stat': {'name': stat}} for stat, base in stats],
+        'abilities': [
+            {'slot': slot, 'ability': {'name': ability}, 'is_hidden': bool(hidden)}
+            for slot, ability, hidden in abilities
+        ],
+        'types': [{'slot': slot, 'type': {'name': type_name}} for slot, type_name in types],
+        'moves': [{'move': {'name': move}} for (move,) in moves],
+    }
+
+
+def get_move(identifier) -> Optional[dict]:
+    """
+    Reads a move from the mirror in the shape of a PokeAPI /move document.
+
+    Args:
+        identifier (str | int): Move name or PokeAPI id.
+
+    Returns:
+        dict: id, name, type, power and damage_class, or None if the move is not mirrored.
+    """
+    identifier = str(identifier).lower()
+    try:
+        with get_db_connection(read_only=True) as conn:
+            cursor = conn.cursor()
+            column = "id" if identifier.isdigit() else "name"
+            cursor.execute(f"SELECT id, name, type, power, damage_class FROM moves WHERE {column} = ?",
+                           (int(identifier) if identifier.isdigit() else identifier,))
+            row = cursor.fetchone()
+
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", str(e))
+        raise e
+
+    if not row:
+        logger.info("Move %s not in mirror", identifier)
+        return None
+    return {'id': row[0], 'name': row[1], 'type': {'name': row[2]}, 'power': row[3], 'damage_class': {'name': row[4]}}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import PokeAPI species data into the local mirror.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dump-dir", help="Directory of a PokeAPI JSON dump")
+    source.add_argument("--base-url", help="Base url of a PokeAPI-compatible server, e.g. http://localhost:8000/api/v2")
+    parser.add_argument("--db-path", default=None, help="SQLite database to import into (defaults to DB_PATH)")
+    parser.add_argument("--resource", choices=("pokemon", "move"), default="pokemon", help="What to fetch from --base-url")
+    parser.add_argument("identifiers", nargs="*", help="Species (or move) names or ids to fetch from --base-url (default: all)")
+    args = parser.parse_args(argv)
+
+    if args.dump_dir:
+        docs = iter_dump(args.dump_dir)
+    else:
+        docs = iter_server(args.base_url, args.identifiers, resource=args.resource)
+
+    counts = sync(docs, db_path=args.db_path)
+    print(json.dumps(counts))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,9 @@
-import requests
+from app.services import pokeapi_mirror
+from app.utils.api_utils import POKEAPI_URL, fetch_json
 
-POKEAPI_BASE_URL = "https://pokeapi.co/api/v2/pokemon"
+POKEAPI_BASE_URL = POKEAPI_URL.rstrip("/") + "/pokemon"
 
 def fetch_pokemon(pokemon_id):
-    response = requests.get(f"{POKEAPI_BASE_URL}/{pokemon_id}")
-    if response.status_code != 200:
-        return None
-    return response.json()
+    if pokeapi_mirror.POKEAPI_MIRROR:
+        return pokeapi_mirror.get_species(pokemon_id)
+    return fetch_json(f"{POKEAPI_BASE_URL}/{pokemon_id}")
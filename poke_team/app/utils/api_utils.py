@@ -0,0 +1,89 @@
+import logging
+import os
+import re
+from typing import Optional
+
+from app.utils import http_client
+from app.utils.cache_utils import DiskCache, LRUCache, TwoTierCache
+from app.utils.db_utils import DB_PATH
+from app.utils.logger import configure_logger
+from app.utils.metrics import registry
+from app.utils.singleflight import SingleFlight
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Root of the PokeAPI, or of a compatible stand-in such as python -m tools.fake_pokeapi
+POKEAPI_URL = os.getenv("POKEAPI_URL", "https://pokeapi.co/api/v2/")
+
+# PokeAPI documents are effectively static, so entries can live for a long time.
+POKEAPI_CACHE_SIZE = int(os.getenv("POKEAPI_CACHE_SIZE", "256"))
+POKEAPI_CACHE_TTL = float(os.getenv("POKEAPI_CACHE_TTL", "86400"))
+# Set to an empty string to keep the cache in memory only.
+POKEAPI_CACHE_PATH = os.getenv(
+    "POKEAPI_CACHE_PATH",
+    os.path.join(os.path.dirname(DB_PATH), "pokeapi_cache.db")
+)
+
+
+response_cache = TwoTierCache(
+    LRUCache(max_entries=POKEAPI_CACHE_SIZE, ttl=POKEAPI_CACHE_TTL),
+    DiskCache(POKEAPI_CACHE_PATH, ttl=POKEAPI_CACHE_TTL) if POKEAPI_CACHE_PATH else None
+)
+
+# One in-flight upstream fetch per resource; concurrent misses wait for it.
+inflight = SingleFlight()
+
+
+def _collect():
+    stats = response_cache.stats()
+    tiers = [('memory', stats['memory'])] + ([('disk', stats['disk'])] if stats['disk'] is not None else [])
+    for tier, tier_stats in tiers:
+        yield "pokeapi_cache_hits", "counter", "PokeAPI response cache hits by tier.", {'tier': tier}, tier_stats['hits']
+        yield "pokeapi_cache_misses", "counter", "PokeAPI response cache misses by tier.", {'tier': tier}, tier_stats['misses']
+    yield "pokeapi_cache_entries", "gauge", "PokeAPI responses cached in memory.", {}, stats['memory']['entries']
+
+
+registry.register_collector(_collect)
+
+
+def cache_key(url: str) -> str:
+    """
+    Normalizes a PokeAPI url so that equivalent urls share one cache entry.
+    """
+    scheme, sep, rest = url.strip().partition("://")
+    rest = re.sub(r'/+', '/', rest).rstrip('/')
+    return (scheme + sep + rest).lower()
+
+
+def fetch_json(url: str) -> Optional[dict]:
+    """
+    GETs a PokeAPI resource, serving it from the response cache when possible.
+
+    Concurrent cache misses for the same resource (the same species name or id)
+    share a single upstream request and its result or error.
+
+    Args:
+        url (str): Full url of the resource.
+
+    Returns:
+        dict: The decoded JSON document, or None if upstream did not answer 200.
+    """
+    key = cache_key(url)
+    data = response_cache.get(key)
+    if data is not None:
+        return data
+    return inflight.do(key, lambda: _fetch_and_store(url, key))
+
+
+def _fetch_and_store(url: str, key: str) -> Optional[dict]:
+    response = http_client.get(url)
+    if response.status_code != 200:
+        logger.info("PokeAPI returned %s for %s", response.status_code, url)
+        return None
+
+    data = response.json()
+    response_cache.put(key, data)
+    return data
@@ -0,0 +1,172 @@
+from collections import OrderedDict
+import base64
+from functools import wraps
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Callable, Optional
+
+from flask import g, jsonify, make_response, request
+
+from app.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Seconds a token issued by login stays valid
+TOKEN_TTL = int(os.getenv("TOKEN_TTL", "3600"))
+
+
+class InvalidTokenError(Exception):
+    """Raised when a token is malformed, forged, expired or revoked."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class TokenSigner:
+    """
+    Issues and verifies compact HMAC-SHA256 signed, expiring session tokens.
+
+    A token is base64url(claims).base64url(signature), the claims being the
+    username, issue and expiry times (milliseconds) and a random id. Verifying
+    one is a single HMAC, with no database or bcrypt work.
+
+    Revocations are kept in memory: single tokens (logout) until they expire, and
+    per user a cut-off before which every token is rejected (password change);
+    tokens issued after it are stamped no earlier than the cut-off.
+    Both are forgotten once every token they could match has expired, so memory
+    stays bounded. They are per process: with several server workers a token
+    revoked in one worker stays valid in the others until it expires.
+
+    Args:
+        secret (bytes): HMAC key. Every worker must share it.
+        ttl (int): Seconds a token stays valid.
+        clock (Callable): Time source in seconds, injectable for tests.
+    """
+
+    def __init__(self, secret: bytes, ttl: int = TOKEN_TTL, clock: Callable[[], float] = time.time):
+        self._secret = secret
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._revoked_ids = OrderedDict()
+        self._revoked_users = OrderedDict()
+
+    def _now_ms(self) -> int:
+        return int(self._clock() * 1000)
+
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self._secret, payload.encode("ascii"), hashlib.sha256).digest())
+
+    def issue(self, username: str) -> str:
+        with self._lock:
+            # Never before the user's cut-off, even in the millisecond of a revocation
+            now = max(self._now_ms(), self._revoked_users.get(username, 0))
+        claims = {'sub': username, 'iat': now, 'exp': now + self.ttl * 1000, 'jti': _b64encode(secrets.token_bytes(9))}
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token: str) -> dict:
+        """
+        Returns the claims of a valid token.
+
+        Raises:
+            InvalidTokenError: If the token is malformed, forged, expired or revoked.
+        """
+        payload, _, signature = token.partition(".")
+        try:
+            if not payload or not signature or not hmac.compare_digest(signature, self._sign(payload)):
+                raise InvalidTokenError("Invalid token")
+            claims = json.loads(_b64decode(payload))
+            expired = claims['exp'] <= self._now_ms()
+            revoked = claims['jti'] in self._revoked_ids or claims['iat'] < self._revoked_users.get(claims['sub'], 0)
+        except (UnicodeError, KeyError, TypeError, ValueError):
+            # Non-ASCII text, bad base64 or JSON, or claims that are not the ones issue() signs
+            raise InvalidTokenError("Invalid token")
+        if expired:
+            raise InvalidTokenError("Token expired")
+        if revoked:
+            raise InvalidTokenError("Token revoked")
+        return claims
+
+    def revoke(self, claims: dict) -> None:
+        """Rejects one token (from its verified claims) until it expires."""
+        with self._lock:
+            self._prune()
+            self._revoked_ids[claims['jti']] = claims['exp']
+
+    def revoke_user(self, username: str) -> None:
+        """Rejects every token issued to username so far."""
+        with self._lock:
+            self._prune()
+            self._revoked_users.pop(username, None)
+            # Tokens issued up to this millisecond are revoked, later ones (issue() waits
+            # for the cut-off) are not
+            self._revoked_users[username] = self._now_ms() + 1
+
+    def _prune(self) -> None:
+        # Single tokens are in revocation order, not expiry order (an older token can be
+        # revoked later), so an expired one may wait behind a live one, at most ttl.
+        # User cut-offs are re-inserted on every revocation, so they are in time order.
+        now = self._now_ms()
+        while self._revoked_ids and next(iter(self._revoked_ids.values())) <= now:
+            self._revoked_ids.popitem(last=False)
+        while self._revoked_users and next(iter(self._revoked_users.values())) + self.ttl * 1000 <= now:
+            self._revoked_users.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            'ttl': self.ttl,
+            'revoked_tokens': len(self._revoked_ids),
+            'revoked_users': len(self._revoked_users),
+        }
+
+
+def _load_secret() -> bytes:
+    secret = os.getenv("TOKEN_SECRET")
+    if secret:
+        return secret.encode("utf-8")
+    # Shared by the workers only if they are forked after this import (WEB_PRELOAD=true)
+    logger.warning("TOKEN_SECRET is not set, using a random key: tokens will not survive a restart")
+    return secrets.token_bytes(32)
+
+
+token_signer = TokenSigner(_load_secret())
+
+
+def bearer_token() -> Optional[str]:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+
+def token_required(view):
+    """
+    Rejects requests without a valid "Authorization: Bearer <token>" header with a 401.
+    The view finds the username in flask.g.username and the claims in flask.g.token_claims.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = bearer_token()
+        if token is None:
+            return make_response(jsonify({'error': 'Missing bearer token'}), 401)
+        try:
+            claims = token_signer.verify(token)
+        except InvalidTokenError as e:
+            return make_response(jsonify({'error': str(e)}), 401)
+        g.username = claims['sub']
+        g.token_claims = claims
+        return view(*args, **kwargs)
+    return wrapper
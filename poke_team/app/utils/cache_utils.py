@@ -0,0 +1,361 @@
+from collections import OrderedDict
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from app.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe in-memory LRU cache with a per-entry TTL.
+
+    Args:
+        max_entries (int): Maximum number of entries kept before the least
+            recently used one is evicted.
+        ttl (float): Seconds an entry stays valid. 0 or less disables expiry.
+        clock (Callable): Time source, injectable for tests.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self._clock() + ttl if ttl > 0 else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class DiskCache:
+    """
+    JSON document store in a SQLite file shared by every worker process.
+
+    The file is opened lazily so that importing this module never touches the
+    filesystem, and each process gets its own connection. If the file cannot be
+    opened the store disables itself and the cache keeps working memory-only.
+
+    Args:
+        path (str): Path of the SQLite file.
+        ttl (float): Seconds a stored document stays valid. 0 or less disables expiry.
+    """
+
+    def __init__(self, path: str, ttl: float = 0, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl = ttl
+        self._clock = clock
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.disabled = False
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self.disabled:
+            return None
+        if self._conn is None or self._pid != os.getpid():
+            try:
+                conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        body TEXT NOT NULL,
+                        stored_at REAL NOT NULL
+                    )
+                """)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning("Disabling on-disk cache at %s: %s", self.path, str(e))
+                self.disabled = True
+                return None
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT body, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning("On-disk cache read failed: %s", str(e))
+                return None
+        if row is None or (self.ttl > 0 and row[1] + self.ttl <= self._clock()):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, body, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), self._clock())
+                )
+                conn.commit()
+                self.writes += 1
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning("On-disk cache write failed: %s", str(e))
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            if conn is not None:
+                conn.execute("DELETE FROM responses")
+                conn.commit()
+
+    def stats(self) -> dict:
+        return {
+            'path': self.path,
+            'enabled': not self.disabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'errors': self.errors,
+        }
+
+
+class TwoTierCache:
+    """
+    In-process LRU in front of an optional shared on-disk store.
+
+    Lookups try memory first, then disk (promoting disk hits into memory).
+    Stores write through to both tiers.
+    """
+
+    def __init__(self, memory: LRUCache, disk: Optional[DiskCache] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        value = self.disk.get(key)
+        if value is not None:
+            self.memory.put(key, value)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        return {
+            'memory': self.memory.stats(),
+            'disk': self.disk.stats() if self.disk is not None else None,
+        }
+
+
+class ObjectCache:
+    """
+    Size-bounded, thread-safe LRU of hydrated objects with guarded fills.
+
+    Each entry carries the version of the row it was loaded from and when that
+    version was last confirmed, so callers can revalidate against the database.
+
+    A reader takes a token() before loading from the database and hands it to
+    put(); if the key was invalidated in the meantime the fill is refused, so a
+    slow reader can never put back a copy older than a concurrent write.
+
+    Args:
+        max_bytes (int): Budget for the summed sizeof() of the cached values.
+        sizeof (Callable): Estimated size in bytes of one value.
+        max_tombstones (int): Recent invalidations remembered to guard fills.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int],
+                 max_tombstones: int = 4096, clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._tombstones = OrderedDict()
+        self._max_tombstones = max_tombstones
+        self._floor = 0
+        self._counter = 0
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.rejected_fills = 0
+
+    def token(self) -> int:
+        with self._lock:
+            return self._counter
+
+    def get(self, key, max_age: Optional[float] = None) -> Optional[tuple]:
+        """
+        Returns (value, version, seconds since the version was confirmed), or None.
+
+        An entry confirmed at most max_age seconds ago counts as a hit. An older
+        one (or any, without max_age) is not counted until confirm() tells
+        whether it was still current.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            value, version, checked_at, _ = entry
+            age = self._clock() - checked_at
+            if max_age is not None and age <= max_age:
+                self.hits += 1
+            return value, version, age
+
+    def confirm(self, key, version) -> bool:
+        """
+        Records that the cached version of key is still current, if it is.
+
+        Returns:
+            bool: True (a hit) if the cached version is version, False (a miss) otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != version:
+                self.misses += 1
+                return False
+            self._entries[key] = (entry[0], version, self._clock(), entry[3])
+            self.hits += 1
+            return True
+
+    def put(self, key, value, version, token: int) -> bool:
+        size = self._sizeof(value)
+        with self._lock:
+            if token < self._floor or self._tombstones.get(key, -1) >= token:
+                self.rejected_fills += 1
+                return False
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[3]
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (value, version, self._clock(), size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted[3]
+                self.evictions += 1
+            return True
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            self._drop(key)
+            self._tombstones[key] = self._counter
+            self._tombstones.move_to_end(key)
+            self._counter += 1
+            while len(self._tombstones) > self._max_tombstones:
+                # Forgetting a tombstone means refusing every fill that started before it.
+                _, counter = self._tombstones.popitem(last=False)
+                self._floor = max(self._floor, counter + 1)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+            self._tombstones.clear()
+            self._counter += 1
+            self._floor = self._counter
+
+    def _drop(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[3]
+            self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'rejected_fills': self.rejected_fills,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
@@ -2,25 +2,49 @@ from contextlib import contextmanager
 import logging
 import os
 import sqlite3
+import threading
+import time
 
-from app.utils.logger import configure_logger
+from app.utils.logger import RateLimitedLog, configure_logger
+from app.utils.metrics import registry
+from app.utils.sql_trace import TracingConnection
 
 
 logger = logging.getLogger(__name__)
 configure_logger(logger)
+# Released on every query: sampled so it cannot flood the log at DEBUG
+release_log = RateLimitedLog(logger)
 
 
 # load the db path from the environment with a default value
 DB_PATH = os.getenv("DB_PATH", "/app/sql/poke_team.db")
 
+# Connection tuning, applied to every pooled connection
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Negative values are KiB, positive values are pages (see PRAGMA cache_size)
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-16000"))
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+# Time every statement of the pooled connections (see app.utils.sql_trace); off by default
+DB_TRACE = os.getenv("DB_TRACE", "false").lower() == "true"
+
+
+_local = threading.local()
+
+db_operations = registry.counter(
+    "db_operations", "get_db_connection blocks by mode and outcome.", ("mode", "outcome")
+)
+db_seconds = registry.histogram(
+    "db_operation_duration_seconds", "Time spent inside get_db_connection blocks, by mode.", ("mode",)
+)
+
 
 def check_database_connection():
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        # This ensures the connection is actually active
-        cursor.execute("SELECT 1;")
-        conn.close()
+        with get_db_connection(read_only=True) as conn:
+            cursor = conn.cursor()
+            # This ensures the connection is actually active
+            cursor.execute("SELECT 1;")
     except sqlite3.Error as e:
         error_message = f"Database connection error: {e}"
         logger.error(error_message)
@@ -28,15 +52,42 @@ def check_database_connection():
 
 def check_table_exists(tablename: str):
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT 1 FROM {tablename} LIMIT 1;")
-        conn.close()
+        with get_db_connection(read_only=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT 1 FROM {tablename} LIMIT 1;")
     except sqlite3.Error as e:
         error_message = f"Table check error: {e}"
         logger.error(error_message)
         raise Exception(error_message) from e
 
+def connect(read_only: bool = False) -> sqlite3.Connection:
+    """
+    Opens a new connection to DB_PATH with the tuned PRAGMAs.
+
+    WAL lets readers run alongside a writer, and read-only connections are
+    additionally marked query_only so they can never take the write lock.
+    With DB_TRACE the connection times the statements run through its cursors.
+    """
+    factory = TracingConnection if DB_TRACE else sqlite3.Connection
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000, factory=factory)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size={DB_CACHE_SIZE}")
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+def close_db_connections():
+    """
+    Closes the pooled connections of the calling thread.
+    """
+    connections = getattr(_local, "connections", {})
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
 ###################################################
 #
 # This one yields rather than returns.
@@ -44,15 +95,40 @@ def check_table_exists(tablename: str):
 #
 ###################################################
 @contextmanager
-def get_db_connection():
+def get_db_connection(read_only: bool = False):
+    """
+    Lends out the calling thread's pooled connection.
+
+    Connections stay open between calls and are keyed by process, database path
+    and mode, so a forked worker never reuses its parent's handle. Anything the
+    caller did not commit is rolled back when the block exits.
+
+    Args:
+        read_only (bool): Use the query_only connection, for read paths.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    key = (os.getpid(), DB_PATH, read_only)
+    mode = "read" if read_only else "write"
+
     conn = None
+    outcome = "error"
+    start = time.perf_counter()
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connections.get(key)
+        if conn is None:
+            conn = connections[key] = connect(read_only)
         yield conn
+        outcome = "ok"
     except sqlite3.Error as e:
         logger.error("Database connection error: %s", str(e))
         raise e
     finally:
-        if conn:
-            conn.close()
-            logger.info("Database connection closed.")
+        if isinstance(conn, TracingConnection):
+            conn.finish_statements()
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+        db_seconds.observe(time.perf_counter() - start, mode=mode)
+        db_operations.inc(mode=mode, outcome=outcome)
+        release_log.debug("Database connection released.")
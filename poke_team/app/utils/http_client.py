@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.utils.logger import configure_logger
+from app.utils.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+POKEAPI_POOL_SIZE = int(os.getenv("POKEAPI_POOL_SIZE", "10"))
+POKEAPI_CONNECT_TIMEOUT = float(os.getenv("POKEAPI_CONNECT_TIMEOUT", "3.05"))
+POKEAPI_READ_TIMEOUT = float(os.getenv("POKEAPI_READ_TIMEOUT", "10"))
+POKEAPI_RETRIES = int(os.getenv("POKEAPI_RETRIES", "3"))
+POKEAPI_BACKOFF = float(os.getenv("POKEAPI_BACKOFF", "0.2"))
+POKEAPI_BACKOFF_JITTER = float(os.getenv("POKEAPI_BACKOFF_JITTER", "0.1"))
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+upstream_requests = registry.counter("pokeapi_requests", "PokeAPI requests by status code.", ("status",))
+upstream_errors = registry.counter("pokeapi_errors", "PokeAPI requests that got no answer, by exception.", ("error",))
+upstream_seconds = registry.histogram("pokeapi_request_duration_seconds", "PokeAPI request latency, retries included.")
+
+
+_session = None
+_session_pid = None
+_lock = threading.Lock()
+
+
+def build_session(pool_size: int = POKEAPI_POOL_SIZE, retries: int = POKEAPI_RETRIES) -> requests.Session:
+    """
+    Builds a keep-alive session with a bounded connection pool.
+
+    Idempotent GETs are retried on connection errors and 5xx answers with
+    exponential, jittered backoff.
+
+    Args:
+        pool_size (int): Connections kept alive per host.
+        retries (int): Retries after the first attempt.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=POKEAPI_BACKOFF,
+        backoff_jitter=POKEAPI_BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate',
+    })
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the session of the current process, creating it on first use.
+
+    Sessions are never shared across a fork: a child process gets its own pool.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _lock:
+            if _session is None or _session_pid != os.getpid():
+                _session = build_session()
+                _session_pid = os.getpid()
+    return _session
+
+
+def set_session(session: Optional[requests.Session]) -> None:
+    """
+    Swaps the process-wide session, e.g. for a fake in tests. None resets it.
+    """
+    global _session, _session_pid
+    with _lock:
+        if _session is not None and _session is not session:
+            _session.close()
+        _session = session
+        _session_pid = os.getpid() if session is not None else None
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """
+    GETs a url through the pooled session with the configured timeouts.
+
+    Raises:
+        requests.RequestException: If upstream cannot be reached after all retries.
+    """
+    kwargs.setdefault('timeout', (POKEAPI_CONNECT_TIMEOUT, POKEAPI_READ_TIMEOUT))
+    start = time.perf_counter()
+    try:
+        response = get_session().get(url, **kwargs)
+    except requests.RequestException as e:
+        upstream_errors.inc(error=type(e).__name__)
+        logger.error("Upstream request to %s failed: %s", url, str(e))
+        raise e
+    finally:
+        upstream_seconds.observe(time.perf_counter() - start)
+    upstream_requests.inc(status=response.status_code)
+    return response
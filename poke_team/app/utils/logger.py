@@ -1,26 +1,215 @@
+"""
+Logging setup shared by every module.
+
+Loggers hand their records to a bounded in-memory queue and a background
+thread formats and writes them, so request threads never block on stderr.
+When the queue is full new records are dropped (and counted) rather than
+making the caller wait.
+
+Environment:
+    LOG_LEVEL: Default level, INFO unless set.
+    LOG_LEVELS: Per-module overrides, e.g. "app.utils.db_utils=WARNING,app.models=DEBUG".
+        The longest matching prefix of the logger name wins.
+    LOG_FORMAT: "text" (default) or "json", one JSON object per line.
+    LOG_QUEUE_SIZE: Records buffered before new ones are dropped.
+    LOG_SAMPLE_PER_SECOND: Per-query messages logged per second and call site.
+"""
+import atexit
+import copy
+import json
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import os
+import queue
 import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_PER_SECOND = float(os.getenv("LOG_SAMPLE_PER_SECOND", "1"))
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def level_for(name: str, default: str = LOG_LEVEL, overrides: Optional[Dict[str, int]] = None) -> int:
+    """Level of a logger: the longest LOG_LEVELS prefix matching its name, else LOG_LEVEL."""
+    overrides = parse_levels(LOG_LEVELS) if overrides is None else overrides
+    best = None
+    for prefix in overrides:
+        if (name == prefix or name.startswith(prefix + ".")) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return overrides[best] if best is not None else logging.getLevelName(default)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def build_formatter(fmt: str = LOG_FORMAT) -> logging.Formatter:
+    if fmt == "json":
+        return JsonFormatter()
+    return logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+class StderrHandler(logging.StreamHandler):
+    """Writes to whatever sys.stderr is at the time of each record."""
+
+    def __init__(self):
+        super().__init__()
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room: the listener is draining, and every queued record must be written first
+        self.queue.put(self._sentinel)
+
+
+class AsyncHandler(QueueHandler):
+    """
+    Enqueues records for a QueueListener writing to stderr, without ever blocking.
+
+    The listener thread is started lazily in each process, so workers forked
+    after the app was imported get their own.
+    """
+
+    def __init__(self, maxsize: int = LOG_QUEUE_SIZE, formatter: Optional[logging.Formatter] = None):
+        super().__init__(queue.Queue(maxsize))
+        self._maxsize = maxsize
+        self._formatter = formatter or build_formatter()
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+
+    def _ensure_listener(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # The parent's thread did not survive the fork; start over with a fresh queue
+            self.queue = queue.Queue(self._maxsize)
+            target = StderrHandler()
+            target.setFormatter(self._formatter)
+            self._listener = _Listener(self.queue, target, respect_handler_level=False)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the arguments (they may change once we return); formatting
+        # and the traceback text are left to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Stops the listener after it has written everything queued so far."""
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def get_handler() -> AsyncHandler:
+    global _handler
+    with _handler_lock:
+        if _handler is None:
+            _handler = AsyncHandler()
+            atexit.register(_handler.flush)
+        return _handler
+
+
+def configure_logger(logger: logging.Logger) -> None:
+    """
+    Sets the logger's level from LOG_LEVEL/LOG_LEVELS and routes it to the shared
+    queue. Calling it again on the same logger changes nothing.
+    """
+    logger.setLevel(level_for(logger.name))
+    handler = get_handler()
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
 
-from flask import current_app, has_request_context
 
+class RateLimitedLog:
+    """
+    Logs at most per_second messages per second, and counts the rest.
 
-def configure_logger(logger):
-    logger.setLevel(logging.DEBUG)  # Set the desired logging level here
+    Meant for messages emitted on every query or request: the first one in each
+    window is logged with the number suppressed since the previous one.
 
-    # Create a console handler that logs to stderr
-    handler = logging.StreamHandler(sys.stderr)
-    handler.setLevel(logging.DEBUG)
+    Args:
+        logger (logging.Logger): Where the messages go.
+        per_second (float): Messages let through per second. 0 or less logs nothing.
+    """
 
-    # Create a formatter with a timestamp
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    def __init__(self, logger: logging.Logger, per_second: float = LOG_SAMPLE_PER_SECOND,
+                 clock: Callable[[], float] = time.monotonic):
+        self.logger = logger
+        self.interval = 1 / per_second if per_second > 0 else None
+        self._clock = clock
+        self._next = 0.0
+        self._suppressed = 0
+        self._lock = threading.Lock()
 
-    # Add the formatter to the handler
-    handler.setFormatter(formatter)
+    def log(self, level: int, msg: str, *args) -> None:
+        if self.interval is None or not self.logger.isEnabledFor(level):
+            return
+        now = self._clock()
+        with self._lock:
+            if now < self._next:
+                self._suppressed += 1
+                return
+            self._next = now + self.interval
+            suppressed, self._suppressed = self._suppressed, 0
+        if suppressed:
+            self.logger.log(level, msg + " (%d similar messages suppressed)", *args, suppressed)
+        else:
+            self.logger.log(level, msg, *args)
 
-    # Add the handler to the logger
-    logger.addHandler(handler)
+    def debug(self, msg: str, *args) -> None:
+        self.log(logging.DEBUG, msg, *args)
 
-    if has_request_context():
-        app_logger = current_app.logger
-        for handler in app_logger.handlers:
-            logger.addHandler(handler)
\ No newline at end of file
+    def info(self, msg: str, *args) -> None:
+        self.log(logging.INFO, msg, *args)
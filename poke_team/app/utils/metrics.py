@@ -0,0 +1,412 @@
+"""
+Counters and histograms in the Prometheus text format, merged across worker processes.
+
+Each process updates its metrics in memory (a dict update under a lock) and a
+background thread writes a snapshot to its own file in METRICS_DIR every
+METRICS_FLUSH_INTERVAL seconds. /api/metrics adds up the files of every
+process, the current one taken live. Counters and histograms of exited workers
+are kept, so totals never go backwards; gauges only count live processes.
+Under gunicorn the master folds the file of each exited worker into a single
+metrics_exited.json, so the directory does not grow with worker restarts.
+Only server processes (those that call init_app) write a file: CLIs and the
+spawned password hashing children keep their metrics to themselves.
+
+Environment:
+    METRICS_DIR: Directory of the per-process files, next to DB_PATH by default.
+        Cleared when the server starts. If it is not writable, each process
+        only reports its own metrics.
+    METRICS_FLUSH_INTERVAL: Seconds between two snapshots of a process.
+"""
+import atexit
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+METRICS_DIR = os.getenv(
+    "METRICS_DIR", os.path.join(os.path.dirname(os.getenv("DB_PATH", "/app/sql/poke_team.db")), "metrics")
+)
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# A sample as collected: (metric name, type, help, labels, value)
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+# Where the counters of exited processes are added up
+EXITED_FILE = "metrics_exited.json"
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self) -> None:
+        # Only called in a freshly forked child, where the lock may have been copied held
+        self._lock = threading.Lock()
+        self._values = {}
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name + "_total", dict(zip(self.labelnames, key)), value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        # First bucket the value fits in; per-bucket counts are made cumulative when exported
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = [(key, list(entry)) for key, entry in self._values.items()]
+        for key, entry in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+                cumulative += count
+                yield self.name + "_bucket", dict(labels, le=_format_bound(bound)), cumulative
+            yield self.name + "_sum", labels, entry[-1]
+            yield self.name + "_count", labels, cumulative
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == math.inf else repr(float(bound))
+
+
+class Registry:
+    """
+    The metrics of one process, plus collectors called at snapshot time for
+    values kept elsewhere (cache and pool counters).
+
+    Args:
+        directory (str): Where the per-process snapshots go, None for this process only.
+        flush_interval (float): Seconds between two snapshots.
+    """
+
+    def __init__(self, directory: Optional[str] = METRICS_DIR, flush_interval: float = METRICS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+        self._name = None
+        self._serving = False
+        # Collector counters inherited from the parent, subtracted from this process's
+        self._baseline = {}
+        self._fork_baseline = {}
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(before=self._before_fork, after_in_child=self._after_fork)
+
+    def _before_fork(self) -> None:
+        # Taken in the parent, where the collectors' locks can be acquired safely
+        self._fork_baseline = {
+            (name, tuple(labels.items())): value
+            for name, kind, _, labels, value in self._collect() if kind == "counter"
+        }
+
+    def _after_fork(self) -> None:
+        # The parent's counts stay in the parent's file; the child starts from zero
+        # with its own file and flusher thread. Collectors read counters that the
+        # child inherited (cache and pool stats), so it reports only what they add.
+        self._lock = threading.Lock()
+        for metric in self._metrics.values():
+            metric.reset()
+        self._baseline = self._fork_baseline
+        self._flusher = None
+        self._stop = threading.Event()
+        self._name = None
+        if self._serving:
+            self._start_flusher()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Adds a function returning (name, type, help, labels, value) samples, with
+        type "counter" or "gauge", called whenever a snapshot is taken.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _collect(self) -> Iterable[Sample]:
+        for collector in list(self._collectors):
+            try:
+                samples = list(collector())
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", getattr(collector, "__name__", collector), str(e))
+                continue
+            yield from samples
+
+    def snapshot(self) -> dict:
+        families = {}
+        for metric in list(self._metrics.values()):
+            family = families.setdefault(metric.name, {'type': metric.type, 'help': metric.help, 'samples': []})
+            family['samples'].extend([name, labels, value] for name, labels, value in metric.samples())
+        for name, kind, help, labels, value in self._collect():
+            family = families.setdefault(name, {'type': kind, 'help': help, 'samples': []})
+            if kind == "counter":
+                value -= self._baseline.get((name, tuple(labels.items())), 0)
+            family['samples'].append([name + ("_total" if kind == "counter" else ""), labels, value])
+        return {'pid': os.getpid(), 'families': families}
+
+    # Snapshots on disk
+
+    def _file(self) -> Optional[str]:
+        if self.directory is None:
+            return None
+        if self._name is None:
+            self._name = f"metrics_{os.getpid()}_{uuid.uuid4().hex[:8]}.json"
+        return os.path.join(self.directory, self._name)
+
+    def flush(self) -> None:
+        path = self._file()
+        if path is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".metrics_")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(self.snapshot(), fh)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Disabling shared metrics in %s: %s", self.directory, str(e))
+            self.directory = None
+
+    def serve(self) -> None:
+        """
+        Shares this process's metrics through directory: snapshots are written
+        every flush_interval seconds and once more at exit. Processes forked
+        from a serving one serve too.
+        """
+        if self._serving:
+            return
+        self._serving = True
+        atexit.register(self.close)
+        self._start_flusher()
+
+    def _start_flusher(self) -> None:
+        if not self._serving or self._flusher is not None or self.directory is None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            stop = self._stop
+
+            def run():
+                while not stop.wait(self.flush_interval):
+                    self.flush()
+
+            self._flusher = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+            self._flusher.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        self.flush()
+
+    def reset_directory(self) -> None:
+        """Removes every snapshot, e.g. when the server starts."""
+        if self.directory is None or not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.startswith("metrics_") or name.startswith(".metrics_"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def fold_exited(self, pid: int) -> None:
+        """
+        Adds the counters and histograms of an exited process to EXITED_FILE
+        and removes its snapshot. Only one process, the gunicorn master, may call it.
+        """
+        if self.directory is None or not os.path.isdir(self.directory):
+            return
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.startswith(f"metrics_{pid}_")]
+        if not paths:
+            return
+        exited = os.path.join(self.directory, EXITED_FILE)
+        families = {}
+        for path in [exited] + paths:
+            try:
+                with open(path, "r") as fh:
+                    _add_up(families, json.load(fh)['families'], gauges=False)
+            except (OSError, ValueError):
+                continue
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".metrics_")
+            with os.fdopen(fd, "w") as fh:
+                json.dump({'pid': None, 'families': {
+                    name: {'type': family['type'], 'help': family['help'],
+                           'samples': [[sample, dict(labels), value] for (sample, labels), value in family['samples'].items()]}
+                    for name, family in families.items()
+                }}, fh)
+            os.replace(tmp, exited)
+            for path in paths:
+                os.remove(path)
+        except OSError as e:
+            logger.warning("Could not fold the metrics of process %d: %s", pid, str(e))
+
+    # Exposition
+
+    def _snapshots(self) -> List[dict]:
+        own = self.snapshot()
+        snapshots = [own]
+        if self.directory is None or not os.path.isdir(self.directory):
+            return snapshots
+        for name in os.listdir(self.directory):
+            if not name.startswith("metrics_") or name == self._name:
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r") as fh:
+                    snapshot = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            snapshot['alive'] = snapshot['pid'] is not None and _alive(snapshot['pid'])
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self) -> str:
+        """The merged metrics of every process, in the Prometheus text format."""
+        families = {}
+        for snapshot in self._snapshots():
+            _add_up(families, snapshot['families'], gauges=snapshot.get('alive', True))
+
+        lines = []
+        for name in sorted(families):
+            family = families[name]
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for (sample, labels), value in family['samples'].items():
+                lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _add_up(families: dict, snapshot_families: dict, gauges: bool = True) -> None:
+    # Adds the samples of a snapshot to families, keyed by sample name and labels
+    for name, family in snapshot_families.items():
+        if family['type'] == "gauge" and not gauges:
+            continue
+        merged = families.setdefault(name, {'type': family['type'], 'help': family['help'], 'samples': {}})
+        for sample, labels, value in family['samples']:
+            key = (sample, tuple(labels.items()))
+            merged['samples'][key] = merged['samples'].get(key, 0) + value
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = Registry()
+
+
+def init_app(app) -> None:
+    """
+    Counts the requests of a Flask app and times them, by route template, method
+    and status, and makes this process share its metrics with the other workers.
+    """
+    from flask import g, request
+
+    requests_total = registry.counter(
+        "http_requests", "HTTP requests by route, method and status code.", ("route", "method", "status")
+    )
+    request_seconds = registry.histogram(
+        "http_request_duration_seconds", "HTTP request latency by route and method.", ("route", "method")
+    )
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            request_seconds.observe(time.perf_counter() - start, route=route, method=request.method)
+            requests_total.inc(route=route, method=request.method, status=response.status_code)
+        return response
+
+    registry.serve()
@@ -0,0 +1,374 @@
+"""
+Versioned, in-place schema migrations for the SQLite database.
+
+sql/create_*.sql always describe the latest schema and are used to create a
+fresh database; this runner brings an existing database forward without
+losing its data. Applied versions are recorded in the schema_version table.
+
+A database created from the sql files is stamped with the latest version
+(create_db.sh runs --stamp), so the runner does not apply migrations to a
+schema that already has them.
+
+Usage:
+    python -m app.utils.migrations [--db-path PATH] [--stamp]
+"""
+import argparse
+import logging
+import sqlite3
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+from app.utils import db_utils
+from app.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+def _table_exists(cursor: sqlite3.Cursor, table: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+
+def _baseline(cursor: sqlite3.Cursor) -> None:
+    """The schema as shipped before migrations existed."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pokemon (
+            id INTEGER PRIMARY KEY,
+            game_id INTEGER,
+            name TEXT,
+            ability TEXT,
+            total_effort INTEGER
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS learned_moves (
+            pokemon_id INTEGER,
+            move TEXT,
+            FOREIGN KEY (pokemon_id) REFERENCES pokemon(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats (
+            pokemon_id INTEGER,
+            hp_base INTEGER, hp_effort INTEGER,
+            attack_base INTEGER, attack_effort INTEGER,
+            defense_base INTEGER, defense_effort INTEGER,
+            special_attack_base INTEGER, special_attack_effort INTEGER,
+            special_defense_base INTEGER, special_defense_effort INTEGER,
+            speed_base INTEGER, speed_effort INTEGER,
+            FOREIGN KEY (pokemon_id) REFERENCES pokemon(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            hashed_passwd TEXT NOT NULL,
+            salt TEXT NOT NULL
+        )
+    """)
+
+
+def _key_learned_moves_and_stats(cursor: sqlite3.Cursor) -> None:
+    """
+    Rebuilds learned_moves with a (pokemon_id, move) unique key and stats with
+    pokemon_id as its primary key. The unique key's index also serves every
+    lookup by pokemon_id alone. Duplicate rows are collapsed: the first learned
+    move and the last stats row win.
+    """
+    cursor.execute("""
+        CREATE TABLE learned_moves_new (
+            pokemon_id INTEGER NOT NULL,
+            move TEXT NOT NULL,
+            UNIQUE (pokemon_id, move),
+            FOREIGN KEY (pokemon_id) REFERENCES pokemon(id)
+        )
+    """)
+    cursor.execute("""
+        INSERT OR IGNORE INTO learned_moves_new (pokemon_id, move)
+        SELECT pokemon_id, move FROM learned_moves
+        WHERE pokemon_id IS NOT NULL AND move IS NOT NULL
+        ORDER BY rowid
+    """)
+    cursor.execute("DROP TABLE learned_moves")
+    cursor.execute("ALTER TABLE learned_moves_new RENAME TO learned_moves")
+
+    columns = """
+        hp_base, hp_effort,
+        attack_base, attack_effort,
+        defense_base, defense_effort,
+        special_attack_base, special_attack_effort,
+        special_defense_base, special_defense_effort,
+        speed_base, speed_effort
+    """
+    cursor.execute("""
+        CREATE TABLE stats_new (
+            pokemon_id INTEGER PRIMARY KEY,
+            hp_base INTEGER, hp_effort INTEGER,
+            attack_base INTEGER, attack_effort INTEGER,
+            defense_base INTEGER, defense_effort INTEGER,
+            special_attack_base INTEGER, special_attack_effort INTEGER,
+            special_defense_base INTEGER, special_defense_effort INTEGER,
+            speed_base INTEGER, speed_effort INTEGER,
+            FOREIGN KEY (pokemon_id) REFERENCES pokemon(id)
+        )
+    """)
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO stats_new (pokemon_id, {columns})
+        SELECT pokemon_id, {columns} FROM stats
+        WHERE pokemon_id IS NOT NULL
+        ORDER BY rowid
+    """)
+    cursor.execute("DROP TABLE stats")
+    cursor.execute("ALTER TABLE stats_new RENAME TO stats")
+
+
+def _has_column(cursor: sqlite3.Cursor, table: str, column: str) -> bool:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def _pokemon_row_versions(cursor: sqlite3.Cursor) -> None:
+    """
+    Adds pokemon.version and the triggers that bump it on every change to a
+    pokemon, its learned moves or its stats.
+    """
+    if not _has_column(cursor, "pokemon", "version"):
+        cursor.execute("ALTER TABLE pokemon ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS pokemon_version_on_update
+        AFTER UPDATE OF game_id, name, ability, total_effort ON pokemon
+        BEGIN
+            UPDATE pokemon SET version = version + 1 WHERE id = NEW.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS learned_moves_version_on_insert AFTER INSERT ON learned_moves
+        BEGIN
+            UPDATE pokemon SET version = version + 1 WHERE id = NEW.pokemon_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS learned_moves_version_on_delete AFTER DELETE ON learned_moves
+        BEGIN
+            UPDATE pokemon SET version = version + 1 WHERE id = OLD.pokemon_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS stats_version_on_update AFTER UPDATE ON stats
+        BEGIN
+            UPDATE pokemon SET version = version + 1 WHERE id = NEW.pokemon_id;
+        END
+    """)
+
+
+def _team_members(cursor: sqlite3.Cursor) -> None:
+    """
+    Creates teams and team_members, one row per member in slot order. Teams of
+    the former team table, whose members were a JSON array in pokemon_ids,
+    are moved over with their ids, and that table is dropped.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS teams (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS teams_user_id ON teams (user_id)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS team_members (
+            team_id INTEGER NOT NULL,
+            slot INTEGER NOT NULL,
+            pokemon_id INTEGER NOT NULL,
+            PRIMARY KEY (team_id, slot),
+            FOREIGN KEY (team_id) REFERENCES teams(id),
+            FOREIGN KEY (pokemon_id) REFERENCES pokemon(id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS team_members_pokemon_id ON team_members (pokemon_id, team_id)")
+
+    if _table_exists(cursor, "team") and _has_column(cursor, "team", "pokemon_ids"):
+        cursor.execute("INSERT OR IGNORE INTO teams (id, user_id, name) SELECT id, user_id, name FROM team")
+        # Malformed or non-array pokemon_ids leave the team without members
+        cursor.execute("""
+            INSERT OR IGNORE INTO team_members (team_id, slot, pokemon_id)
+            SELECT t.id, m.key, m.value
+            FROM team t, json_each(CASE WHEN json_valid(t.pokemon_ids) AND json_type(t.pokemon_ids) = 'array'
+                                        THEN t.pokemon_ids ELSE '[]' END) m
+            WHERE m.type = 'integer'
+        """)
+        cursor.execute("DROP TABLE team")
+
+
+def _pokemon_id_sequence(cursor: sqlite3.Cursor) -> None:
+    """
+    Adds pokemon_sequence, which hands out pokemon ids from where the highest
+    stored one left off and is not reset by clear_poke, and the trigger that
+    moves it past ids inserted explicitly.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pokemon_sequence (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        INSERT OR IGNORE INTO pokemon_sequence (name, value)
+        SELECT 'next_id', COALESCE(MAX(id) + 1, 0) FROM pokemon
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS pokemon_next_id AFTER INSERT ON pokemon
+        BEGIN
+            UPDATE pokemon_sequence SET value = MAX(value, NEW.id + 1) WHERE name = 'next_id';
+        END
+    """)
+
+
+def _global_pokemon_versions(cursor: sqlite3.Cursor) -> None:
+    """
+    Replaces the per-row version triggers with ones that set pokemon.version
+    from a counter in pokemon_sequence, so a version is never given twice,
+    even after clear_poke. New pokemon get a version as well. The counter
+    starts past every stored version.
+    """
+    cursor.execute("""
+        INSERT OR IGNORE INTO pokemon_sequence (name, value)
+        SELECT 'version', COALESCE(MAX(version), 0) FROM pokemon
+    """)
+    bump = """
+        UPDATE pokemon_sequence SET value = value + 1 WHERE name = 'version';
+        UPDATE pokemon SET version = (SELECT value FROM pokemon_sequence WHERE name = 'version') WHERE id = {row}.{column};
+    """
+    triggers = [
+        ("pokemon_version_on_insert", "AFTER INSERT ON pokemon", "NEW", "id"),
+        ("pokemon_version_on_update", "AFTER UPDATE OF game_id, name, ability, total_effort ON pokemon", "NEW", "id"),
+        ("learned_moves_version_on_insert", "AFTER INSERT ON learned_moves", "NEW", "pokemon_id"),
+        ("learned_moves_version_on_delete", "AFTER DELETE ON learned_moves", "OLD", "pokemon_id"),
+        ("stats_version_on_update", "AFTER UPDATE ON stats", "NEW", "pokemon_id"),
+    ]
+    for name, event, row, column in triggers:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"CREATE TRIGGER {name} {event} BEGIN {bump.format(row=row, column=column)} END")
+
+
+# (version, description, step) in the order they must be applied.
+# Never edit a released step; append a new one instead.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "baseline schema", _baseline),
+    (2, "keys for learned_moves and stats", _key_learned_moves_and_stats),
+    (3, "pokemon row versions", _pokemon_row_versions),
+    (4, "team members", _team_members),
+    (5, "pokemon id sequence", _pokemon_id_sequence),
+    (6, "global pokemon versions", _global_pokemon_versions),
+]
+
+
+def _create_version_table(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at REAL NOT NULL
+        )
+    """)
+
+
+def current_version(cursor: sqlite3.Cursor) -> int:
+    if not _table_exists(cursor, "schema_version"):
+        return 0
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+
+def migrate(db_path: Optional[str] = None, target: Optional[int] = None) -> int:
+    """
+    Applies every pending migration, each in its own transaction.
+
+    Concurrent runners (e.g. several workers starting at once) are serialized by
+    the write lock, and a runner re-reads the version once it holds the lock.
+
+    Args:
+        db_path (str): Database to migrate, defaults to DB_PATH.
+        target (int): Stop after this version, defaults to the latest.
+
+    Returns:
+        int: The schema version after migrating.
+
+    Raises:
+        sqlite3.Error: If a migration fails; that migration is rolled back.
+    """
+    conn = sqlite3.connect(db_path or db_utils.DB_PATH, isolation_level=None, timeout=30)
+    try:
+        cursor = conn.cursor()
+        _create_version_table(cursor)
+        for version, description, step in MIGRATIONS:
+            if target is not None and version > target:
+                break
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                if version <= current_version(cursor):
+                    cursor.execute("COMMIT")
+                    continue
+                logger.info("Applying migration %d: %s", version, description)
+                step(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, time.time())
+                )
+                cursor.execute("COMMIT")
+            except sqlite3.Error as e:
+                cursor.execute("ROLLBACK")
+                logger.error("Migration %d failed: %s", version, str(e))
+                raise e
+        return current_version(cursor)
+    finally:
+        conn.close()
+
+
+def stamp(db_path: Optional[str] = None) -> int:
+    """
+    Records every migration as applied without running it, for a database
+    just created from the sql files, which already describe the latest schema.
+
+    Args:
+        db_path (str): Database to stamp, defaults to DB_PATH.
+
+    Returns:
+        int: The schema version after stamping.
+    """
+    conn = sqlite3.connect(db_path or db_utils.DB_PATH, isolation_level=None, timeout=30)
+    try:
+        cursor = conn.cursor()
+        _create_version_table(cursor)
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.executemany(
+            "INSERT OR IGNORE INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+            [(version, description, time.time()) for version, description, _ in MIGRATIONS]
+        )
+        cursor.execute("COMMIT")
+        logger.info("Stamped schema version %d", MIGRATIONS[-1][0])
+        return current_version(cursor)
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument("--db-path", default=None, help="SQLite database to migrate (defaults to DB_PATH)")
+    parser.add_argument("--target", type=int, default=None, help="Stop after this version")
+    parser.add_argument("--stamp", action="store_true",
+                        help="Record the latest version without migrating (database created from the sql files)")
+    args = parser.parse_args(argv)
+
+    version = stamp(args.db_path) if args.stamp else migrate(args.db_path, args.target)
+    print(f"schema version {version}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
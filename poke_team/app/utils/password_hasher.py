@@ -0,0 +1,229 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from typing import Optional
+
+import bcrypt
+
+from app.utils.logger import configure_logger
+from app.utils.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# bcrypt work factor for new hashes; login rehashes passwords stored with another one
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Hashing processes per server worker. 0 hashes on the calling thread instead.
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 1)))
+# Hashes queued or running at once; callers beyond that wait up to BCRYPT_QUEUE_TIMEOUT seconds
+BCRYPT_QUEUE_SIZE = int(os.getenv("BCRYPT_QUEUE_SIZE", str(max(BCRYPT_WORKERS, 1) * 8)))
+BCRYPT_QUEUE_TIMEOUT = float(os.getenv("BCRYPT_QUEUE_TIMEOUT", "5"))
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+queue_seconds = registry.histogram(
+    "bcrypt_queue_wait_seconds", "Time a password hash waited for a slot and a hashing process.", ("op",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+run_seconds = registry.histogram(
+    "bcrypt_duration_seconds", "Time spent hashing in a hashing process.", ("op",), buckets=LATENCY_BUCKETS
+)
+
+
+class HasherBusyError(Exception):
+    """Raised when the hashing queue stays full for longer than the queue timeout."""
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+def _timed(fn, *args):
+    # Runs in the hashing process, so the caller can tell queueing apart from hashing
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _init_hashing_process() -> None:
+    # Spawned hashing processes import the metrics module afresh: they keep their
+    # metrics to themselves, the server worker records the hashing times
+    registry.directory = None
+
+
+def hash_rounds(hashed: bytes) -> Optional[int]:
+    """
+    Returns the work factor a bcrypt hash was made with, or None if it is not a bcrypt hash.
+    """
+    if isinstance(hashed, str):
+        hashed = hashed.encode('utf-8')
+    parts = hashed.split(b"$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated process pool so hashing never holds up the
+    request threads of a server worker.
+
+    The pool is created lazily, once per process, so a server that forks its
+    workers after importing the app never shares it between them. At most
+    queue_size hashes are queued or running; further callers wait up to
+    queue_timeout seconds for a slot and then get HasherBusyError.
+
+    Args:
+        workers (int): Hashing processes. 0 hashes on the calling thread.
+        queue_size (int): Hashes queued or running at once.
+        queue_timeout (float): Seconds a caller waits for a free slot.
+        rounds (int): bcrypt work factor for new hashes.
+    """
+
+    def __init__(self, workers: int = BCRYPT_WORKERS, queue_size: int = BCRYPT_QUEUE_SIZE,
+                 queue_timeout: float = BCRYPT_QUEUE_TIMEOUT, rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rounds = rounds
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.Condition(self._lock)
+        self._depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.errors = 0
+        self._latency_count = 0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+        self._latency_buckets = [0] * len(LATENCY_BUCKETS)
+
+    def hash(self, password: str) -> bytes:
+        """
+        Hashes a password with the configured work factor.
+
+        Raises:
+            HasherBusyError: If the queue stays full for queue_timeout seconds.
+        """
+        return self._run(_hash, password.encode('utf-8'), self.rounds)
+
+    def check(self, password: str, hashed: bytes) -> bool:
+        """
+        Checks a password against a stored bcrypt hash.
+
+        Raises:
+            HasherBusyError: If the queue stays full for queue_timeout seconds.
+        """
+        if isinstance(hashed, str):
+            hashed = hashed.encode('utf-8')
+        return self._run(_check, password.encode('utf-8'), hashed)
+
+    def needs_rehash(self, hashed: bytes) -> bool:
+        """True if the hash was made with a work factor other than the configured one."""
+        return hash_rounds(hashed) != self.rounds
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # Called with the lock held
+        if self._pool is None or self._pid != os.getpid():
+            # spawn, not fork: server workers are threaded and a forked child could inherit held locks
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_hashing_process)
+            self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, fn, *args):
+        op = fn.__name__.lstrip("_")
+        entered = time.perf_counter()
+        with self._slots:
+            if not self._slots.wait_for(lambda: self._depth < self.queue_size, timeout=self.queue_timeout):
+                self.rejected += 1
+                logger.warning("Password hashing queue full (%d), rejecting request", self._depth)
+                raise HasherBusyError("Password hashing is overloaded, try again later")
+            self._depth += 1
+            pool = self._executor() if self.workers > 0 else None
+
+        start = time.perf_counter()
+        try:
+            if pool is None:
+                result, hashing = _timed(fn, *args)
+            else:
+                result, hashing = pool.submit(_timed, fn, *args).result()
+            queue_seconds.observe(time.perf_counter() - entered - hashing, op=op)
+            run_seconds.observe(hashing, op=op)
+            return result
+        except BrokenProcessPool as e:
+            logger.error("Password hashing pool died, restarting it: %s", str(e))
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+                self.errors += 1
+            raise e
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._slots:
+                self._depth -= 1
+                self.completed += 1
+                self._observe(elapsed)
+                self._slots.notify()
+
+    def _observe(self, seconds: float) -> None:
+        self._latency_count += 1
+        self._latency_sum += seconds
+        self._latency_max = max(self._latency_max, seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self._latency_buckets[i] += 1
+                break
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(LATENCY_BUCKETS, self._latency_buckets):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets['+Inf'] = self._latency_count
+            return {
+                'workers': self.workers,
+                'rounds': self.rounds,
+                'queue_depth': self._depth,
+                'queue_size': self.queue_size,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'errors': self.errors,
+                'latency_seconds': {
+                    'count': self._latency_count,
+                    'sum': round(self._latency_sum, 6),
+                    'max': round(self._latency_max, 6),
+                    'buckets': buckets,
+                },
+            }
+
+
+password_hasher = PasswordHasher()
+
+
+def _collect():
+    stats = password_hasher.stats()
+    yield "bcrypt_queue_depth", "gauge", "Password hashes queued or running.", {}, stats['queue_depth']
+    yield "bcrypt_rejected", "counter", "Password hashes rejected with a full queue.", {}, stats['rejected']
+
+
+registry.register_collector(_collect)
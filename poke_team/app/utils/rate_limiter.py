@@ -0,0 +1,270 @@
+from collections import OrderedDict
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+from app.utils import db_utils
+from app.utils.logger import configure_logger
+from app.utils.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# memory: per worker process, sqlite: shared by every worker through LOGIN_THROTTLE_PATH, off: disabled
+LOGIN_THROTTLE_BACKEND = os.getenv("LOGIN_THROTTLE_BACKEND", "memory").lower()
+LOGIN_THROTTLE_PATH = os.getenv(
+    "LOGIN_THROTTLE_PATH", os.path.join(os.path.dirname(db_utils.DB_PATH), "login_throttle.db")
+)
+# Login attempts allowed in a burst, and refilled per minute, for one username and for one client address
+LOGIN_USER_BURST = float(os.getenv("LOGIN_USER_BURST", "5"))
+LOGIN_USER_PER_MINUTE = float(os.getenv("LOGIN_USER_PER_MINUTE", "5"))
+LOGIN_ADDRESS_BURST = float(os.getenv("LOGIN_ADDRESS_BURST", "20"))
+LOGIN_ADDRESS_PER_MINUTE = float(os.getenv("LOGIN_ADDRESS_PER_MINUTE", "60"))
+# Buckets kept by the memory backend before the least recently used is dropped
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+
+
+class TokenBucketLimiter:
+    """
+    In-memory token buckets, one per key, O(1) per call.
+
+    A bucket holds up to burst tokens and refills at rate tokens per second;
+    each allowed call takes one. Buckets are kept in least recently used order,
+    so the ones that have refilled completely (and are equivalent to a new one)
+    are dropped from the front, and at most max_keys are kept.
+
+    Args:
+        rate (float): Tokens refilled per second.
+        burst (float): Bucket capacity.
+        max_keys (int): Maximum number of buckets kept.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = LOGIN_THROTTLE_MAX_KEYS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """
+        Takes a token for key.
+
+        Returns:
+            float: 0 if the call is allowed, otherwise the seconds until it would be.
+        """
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / self.rate
+
+    def release(self, key: str) -> None:
+        """Gives back a token taken for key, up to the bucket's capacity."""
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(self.burst, tokens + 1), updated)
+
+    def _expire(self, now: float) -> None:
+        refill = self.burst / self.rate
+        while self._buckets:
+            _, (_, updated) = next(iter(self._buckets.items()))
+            if updated + refill > now:
+                break
+            self._buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SQLiteTokenBucketLimiter:
+    """
+    Token buckets in a SQLite file, shared by every worker process.
+
+    Refill and take happen in a single UPSERT, so concurrent workers never
+    both spend the last token. Buckets that have refilled completely are
+    deleted every cleanup_interval calls. If the file cannot be opened the
+    limiter fails open and allows every call.
+
+    Args:
+        path (str): Path of the SQLite file.
+        rate (float): Tokens refilled per second.
+        burst (float): Bucket capacity.
+    """
+
+    def __init__(self, path: str, rate: float, burst: float, cleanup_interval: int = 1000,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.cleanup_interval = cleanup_interval
+        self._clock = clock
+        self._conn = None
+        self._pid = None
+        self._calls = 0
+        self._lock = threading.Lock()
+        self.disabled = False
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self.disabled:
+            return None
+        if self._conn is None or self._pid != os.getpid():
+            try:
+                conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=OFF")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS buckets (
+                        key TEXT PRIMARY KEY,
+                        tokens REAL NOT NULL,
+                        updated REAL NOT NULL
+                    )
+                """)
+            except sqlite3.Error as e:
+                logger.warning("Disabling shared login throttle at %s: %s", self.path, str(e))
+                self.disabled = True
+                return None
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def acquire(self, key: str) -> float:
+        now = self._clock()
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return 0.0
+            try:
+                row = conn.execute("""
+                    INSERT INTO buckets (key, tokens, updated) VALUES (:key, :burst - 1, :now)
+                    ON CONFLICT (key) DO UPDATE SET
+                        tokens = MIN(:burst, tokens + (:now - updated) * :rate) - 1,
+                        updated = :now
+                    WHERE MIN(:burst, tokens + (:now - updated) * :rate) >= 1
+                    RETURNING tokens
+                """, {'key': key, 'burst': self.burst, 'rate': self.rate, 'now': now}).fetchone()
+                if row is not None:
+                    self._cleanup(conn, now)
+                    return 0.0
+                tokens, updated = conn.execute(
+                    "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning("Shared login throttle failed, allowing the call: %s", str(e))
+                return 0.0
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        return max(1 - tokens, 0) / self.rate
+
+    def release(self, key: str) -> None:
+        """Gives back a token taken for key, up to the bucket's capacity."""
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.execute("UPDATE buckets SET tokens = MIN(?, tokens + 1) WHERE key = ?", (self.burst, key))
+            except sqlite3.Error as e:
+                logger.warning("Shared login throttle failed to release a token: %s", str(e))
+
+    def _cleanup(self, conn: sqlite3.Connection, now: float) -> None:
+        self._calls += 1
+        if self._calls % self.cleanup_interval == 0:
+            conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.burst / self.rate,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            conn = self._connection()
+            return conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0] if conn is not None else 0
+
+
+class LoginThrottle:
+    """
+    Limits login attempts per client address and per username, checked before
+    any password hashing. A throttled address does not spend the username's tokens,
+    and a successful login gives its username's token back, so only failed
+    attempts count against an account.
+
+    Args:
+        per_user: Limiter for usernames, or None to disable.
+        per_address: Limiter for client addresses, or None to disable.
+    """
+
+    def __init__(self, per_user=None, per_address=None):
+        self.per_user = per_user
+        self.per_address = per_address
+        self.allowed = 0
+        self.throttled_user = 0
+        self.throttled_address = 0
+
+    def check(self, username: str, address: Optional[str]) -> float:
+        """
+        Returns:
+            float: 0 if the attempt may proceed, otherwise the seconds to wait before retrying.
+        """
+        if self.per_address is not None and address:
+            retry_after = self.per_address.acquire(f"addr:{address}")
+            if retry_after:
+                self.throttled_address += 1
+                return retry_after
+        if self.per_user is not None:
+            retry_after = self.per_user.acquire(f"user:{username.lower()}")
+            if retry_after:
+                self.throttled_user += 1
+                return retry_after
+        self.allowed += 1
+        return 0.0
+
+    def succeeded(self, username: str) -> None:
+        """Refunds the username's token of an attempt that turned out to be a successful login."""
+        if self.per_user is not None:
+            self.per_user.release(f"user:{username.lower()}")
+
+    def stats(self) -> dict:
+        return {
+            'backend': type(self.per_user).__name__ if self.per_user is not None else None,
+            'allowed': self.allowed,
+            'throttled_user': self.throttled_user,
+            'throttled_address': self.throttled_address,
+        }
+
+
+def build_login_throttle(backend: str = LOGIN_THROTTLE_BACKEND) -> LoginThrottle:
+    if backend == "off":
+        return LoginThrottle()
+    if backend == "sqlite":
+        def limiter(per_minute, burst):
+            return SQLiteTokenBucketLimiter(LOGIN_THROTTLE_PATH, per_minute / 60, burst)
+    else:
+        def limiter(per_minute, burst):
+            return TokenBucketLimiter(per_minute / 60, burst)
+    return LoginThrottle(
+        per_user=limiter(LOGIN_USER_PER_MINUTE, LOGIN_USER_BURST),
+        per_address=limiter(LOGIN_ADDRESS_PER_MINUTE, LOGIN_ADDRESS_BURST),
+    )
+
+
+login_throttle = build_login_throttle()
+
+
+def _collect():
+    stats = login_throttle.stats()
+    for outcome in ('allowed', 'throttled_user', 'throttled_address'):
+        yield "login_attempts", "counter", "Login attempts by throttle outcome.", {'outcome': outcome}, stats[outcome]
+
+
+registry.register_collector(_collect)
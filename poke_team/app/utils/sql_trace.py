@@ -0,0 +1,293 @@
+"""
+Per-statement timing of the pooled SQLite connections, enabled with DB_TRACE.
+
+Traced connections run every statement, including the Connection.execute(),
+executemany() and executescript() shortcuts, through TracingCursor objects,
+which time it from execute() until its last row is fetched (or the cursor is
+dropped or the connection released) and count the rows it returned or changed.
+A progress handler counts the SQLite virtual machine instructions run meanwhile,
+which shows a full table scan even when it returns one row. Statements run by
+triggers are not seen on their own: their time and instructions go to the
+statement that fired them. Statements are aggregated by their normalized text,
+and the ones slower than DB_SLOW_QUERY_MS are logged.
+
+Environment:
+    DB_SLOW_QUERY_MS: Statements at least this slow are logged, 0 logs every one.
+    DB_TRACE_MAX_STATEMENTS: Distinct statements kept; later ones are counted under "<other>".
+    DB_TRACE_PROGRESS_OPS: Instructions between two calls of the progress handler.
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from typing import List, Optional, Union
+
+from app.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+# A logger of its own, so LOG_LEVELS can silence or keep the slow query log independently
+slow_log = logging.getLogger(__name__ + ".slow")
+configure_logger(slow_log)
+
+
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+DB_TRACE_MAX_STATEMENTS = int(os.getenv("DB_TRACE_MAX_STATEMENTS", "1000"))
+DB_TRACE_PROGRESS_OPS = int(os.getenv("DB_TRACE_PROGRESS_OPS", "1000"))
+
+OTHER = "<other>"
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+_PLACEHOLDERS = re.compile(r"\?(?:\s*,\s*\?)+")
+# What may contain a ? that is not a parameter: strings, quoted names and comments
+_NOT_PARAMETERS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\[[^\]]*\]|`(?:[^`]|``)*`|--[^\n]*|/\*.*?(?:\*/|$)", re.S)
+_PARAMETER = re.compile(r"\?(\d*)|[:@$]([A-Za-z_]\w*)")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Reduces a statement to its shape: literals become ?, lists of placeholders
+    (IN lists of any length) become "?, ...", and whitespace is collapsed.
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _SPACE.sub(" ", sql).strip().rstrip(";").strip()
+    return _PLACEHOLDERS.sub("?, ...", sql)
+
+
+class StatementStats:
+    """
+    Calls, time, rows and VM instructions per normalized statement, in this process.
+
+    Args:
+        slow_ms (float): Statements at least this slow are logged.
+        max_statements (int): Distinct statements kept.
+    """
+
+    def __init__(self, slow_ms: float = DB_SLOW_QUERY_MS, max_statements: int = DB_TRACE_MAX_STATEMENTS):
+        self.slow_ms = slow_ms
+        self.max_statements = max_statements
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, seconds: float, rows: int, steps: int = 0) -> None:
+        key = normalize_sql(sql)
+        slow = seconds * 1000 >= self.slow_ms
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                if len(self._statements) >= self.max_statements:
+                    key = OTHER
+                    entry = self._statements.get(key)
+                if entry is None:
+                    # The first statement seen keeps its placeholders, so it can be explained later
+                    entry = self._statements[key] = {
+                        'example': sql, 'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                        'rows': 0, 'vm_steps': 0, 'slow': 0,
+                    }
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['rows'] += rows
+            entry['vm_steps'] += steps
+            entry['slow'] += slow
+        if slow:
+            slow_log.warning("Slow query (%.1f ms, %d rows): %s", seconds * 1000, rows, key)
+
+    def top(self, limit: int = 10, sort: str = "total") -> List[dict]:
+        """
+        The statements with the highest total time (or mean, max, calls, rows, vm_steps).
+
+        Raises:
+            ValueError: If sort is not one of those.
+        """
+        keys = {
+            'total': lambda e: e['seconds'],
+            'mean': lambda e: e['seconds'] / e['calls'],
+            'max': lambda e: e['max_seconds'],
+            'calls': lambda e: e['calls'],
+            'rows': lambda e: e['rows'],
+            'vm_steps': lambda e: e['vm_steps'],
+        }
+        if sort not in keys:
+            raise ValueError(f"sort must be one of {', '.join(keys)}")
+        with self._lock:
+            entries = [(key, dict(entry)) for key, entry in self._statements.items()]
+        entries.sort(key=lambda item: keys[sort](item[1]), reverse=True)
+        return [{
+            'statement': key,
+            'example': entry['example'],
+            'calls': entry['calls'],
+            'total_ms': round(entry['seconds'] * 1000, 3),
+            'mean_ms': round(entry['seconds'] * 1000 / entry['calls'], 3),
+            'max_ms': round(entry['max_seconds'] * 1000, 3),
+            'rows': entry['rows'],
+            'vm_steps': entry['vm_steps'],
+            'slow': entry['slow'],
+        } for key, entry in entries[:limit]]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+
+statement_stats = StatementStats()
+
+
+class TracingCursor(sqlite3.Cursor):
+    """
+    Times the statement it last executed until its rows are exhausted, the
+    cursor runs another one or the connection is released.
+    """
+
+    _sql = None
+
+    def _begin(self, sql: str) -> None:
+        self.finish()
+        self._sql = sql
+        self._seconds = 0.0
+        self._rows = 0
+        self._steps = self.connection.vm_steps
+        self.connection.open_cursors.add(self)
+
+    def finish(self) -> None:
+        """Records the current statement, if any."""
+        if self._sql is None:
+            return
+        sql, self._sql = self._sql, None
+        rows = self._rows if self.description is not None else max(self.rowcount, 0)
+        steps = (self.connection.vm_steps - self._steps) * DB_TRACE_PROGRESS_OPS
+        self.connection.stats.record(sql, self._seconds, rows, steps)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._seconds += time.perf_counter() - start
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql)
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        # Recorded as one statement: the script runs to its end before returning
+        self._begin(sql_script)
+        try:
+            return self._timed(super().executescript, sql_script)
+        finally:
+            self.finish()
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self.finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        self._rows += len(rows)
+        if not rows:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._rows += len(rows)
+        self.finish()
+        return rows
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    def __del__(self):
+        # A cursor dropped before its rows were read, like conn.execute("PRAGMA ...")
+        self.finish()
+
+
+class TracingConnection(sqlite3.Connection):
+    """
+    A connection whose cursors are TracingCursor, with a progress handler
+    counting the instructions it runs.
+
+    The execute(), executemany() and executescript() shortcuts are overridden
+    too, since sqlite3 would otherwise run them on a plain cursor.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = statement_stats
+        self.vm_steps = 0
+        # Weak, so a dropped cursor still ends its statement as a plain one would
+        self.open_cursors = weakref.WeakSet()
+        self.set_progress_handler(self._progress, DB_TRACE_PROGRESS_OPS)
+
+    def _progress(self) -> int:
+        self.vm_steps += 1
+        # Non-zero would abort the statement
+        return 0
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def finish_statements(self) -> None:
+        """Records the statements whose rows were not read to the end."""
+        cursors, self.open_cursors = list(self.open_cursors), weakref.WeakSet()
+        for cursor in cursors:
+            cursor.finish()
+
+
+def null_parameters(sql: str) -> Union[list, dict]:
+    """
+    NULL for every parameter of a statement: a dict when they are named
+    (:name, @name or $name), otherwise a list as long as the highest ? or ?NNN
+    number. A ? inside a string, a quoted name or a comment is not counted.
+    """
+    names, count = {}, 0
+    for number, name in _PARAMETER.findall(_NOT_PARAMETERS.sub(" ", sql)):
+        if name:
+            names[name] = None
+        else:
+            # A bare ? takes the number after the highest one so far
+            count = max(count, int(number)) if number else count + 1
+    return names if names else [None] * count
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> Optional[List[str]]:
+    """
+    The EXPLAIN QUERY PLAN of a statement, one line per step, without running
+    it and with every placeholder bound to NULL. None if it cannot be explained.
+    """
+    try:
+        # A plain cursor, so explaining is not itself traced
+        cursor = conn.cursor(sqlite3.Cursor)
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, null_parameters(sql))
+        return [row[3] for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        logger.debug("Cannot explain %s: %s", sql, str(e))
+        return None
@@ -0,0 +1,68 @@
+"""
+Authenticated request throughput: resending the password (one bcrypt check per
+request, as before session tokens) against a signed session token.
+
+Usage:
+    python -m benchmarks.bench_auth [--rounds 12] [--duration 5]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from app.models import user_model
+from app.utils import db_utils
+from app.utils.auth_tokens import token_signer
+from app.utils.password_hasher import PasswordHasher
+
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql")
+
+
+def throughput(call, duration):
+    done = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        call()
+        done += 1
+    return done / duration
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt work factor")
+    parser.add_argument("--duration", type=float, default=5, help="seconds per measurement")
+    args = parser.parse_args(argv)
+
+    import wsgi
+    user_model.password_hasher = PasswordHasher(workers=0, rounds=args.rounds)
+    client = wsgi.app.test_client()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_utils.DB_PATH = os.path.join(tmp, "bench.db")
+        conn = sqlite3.connect(db_utils.DB_PATH)
+        with open(os.path.join(SQL_DIR, "create_user_table.sql"), "r") as fh:
+            conn.executescript(fh.read())
+        conn.close()
+
+        credentials = {"username": "bucket", "password": "hehehe"}
+        user_model.create_account(**credentials)
+        token = client.post("/api/login", json=credentials).get_json()['token']
+        headers = {"Authorization": f"Bearer {token}"}
+
+        results = {
+            'bcrypt_rounds': args.rounds,
+            'password_requests_per_second': round(throughput(lambda: client.post("/api/login", json=credentials), args.duration), 1),
+            'token_requests_per_second': round(throughput(lambda: client.get("/api/whoami", headers=headers), args.duration), 1),
+            'token_verify_us': round(1e6 / throughput(lambda: token_signer.verify(token), 1), 2),
+        }
+        db_utils.close_db_connections()
+
+    results['speedup'] = round(results['token_requests_per_second'] / results['password_requests_per_second'], 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Queries and time per call of poke_model.get_pokemon_by_ids as the batch grows.
+
+Usage:
+    python -m benchmarks.bench_hydration
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from app.models import poke_model
+from app.utils import db_utils
+from app.utils.db_utils import get_db_connection
+
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql")
+ROSTER_SIZE = 1000
+
+
+def populate(db_path):
+    conn = sqlite3.connect(db_path)
+    with open(os.path.join(SQL_DIR, "create_poke_table.sql"), "r") as fh:
+        conn.executescript(fh.read())
+    conn.executemany("INSERT INTO pokemon (id, game_id, name, ability, total_effort) VALUES (?, 25, 'pikachu', 'static', 0)", [(i,) for i in range(ROSTER_SIZE)])
+    conn.executemany("INSERT INTO stats VALUES (?, 35, 0, 55, 0, 40, 0, 50, 0, 50, 0, 90, 0)",
+                     [(i,) for i in range(ROSTER_SIZE)])
+    conn.executemany("INSERT INTO learned_moves VALUES (?, ?)",
+                     [(i, move) for i in range(ROSTER_SIZE) for move in ("thunderbolt", "quick-attack", "agility", "tail-whip")])
+    conn.commit()
+    conn.close()
+
+
+def measure(ids, repeat=50):
+    statements = []
+    with get_db_connection(read_only=True) as conn:
+        conn.set_trace_callback(statements.append)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            poke_model.get_pokemon_by_ids(ids)
+        elapsed = time.perf_counter() - start
+        conn.set_trace_callback(None)
+    return len(statements) / repeat, elapsed / repeat
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_utils.DB_PATH = os.path.join(tmp, "bench.db")
+        populate(db_utils.DB_PATH)
+        results = []
+        for size in (1, 6, 30, 100, 500):
+            queries, seconds = measure(list(range(size)))
+            results.append({
+                'batch_size': size,
+                'queries_per_call': queries,
+                'ms_per_call': round(seconds * 1000, 3),
+                'us_per_pokemon': round(seconds * 1e6 / size, 2),
+            })
+        db_utils.close_db_connections()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
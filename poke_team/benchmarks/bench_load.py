@@ -0,0 +1,274 @@
+"""
+End-to-end load test of the Flask app: a realistic mix of routes at increasing concurrency.
+
+The app is served by a threaded development server in a child process, with a
+temporary database and a local fake PokeAPI. Each virtual user creates an
+account, logs in, creates a few Pokemon, then loops over a weighted mix of
+reads and writes until the level's duration is up. Virtual users are threads
+spread over several client processes.
+
+For every concurrency level the output reports throughput and, per route, the
+request count, p50/p95/p99 latency, the error rate and the status codes;
+responses failing with "database is locked" are counted separately.
+
+Usage:
+    python -m benchmarks.bench_load [--concurrency 1 4 16] [--duration 10] [--output load.json]
+"""
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import json
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.bench_models import MOVES, create_database, species_document
+from benchmarks.bench_serve import free_port
+
+
+SPECIES = {"pikachu": 25, "bulbasaur": 1, "charmander": 4, "squirtle": 7, "eevee": 133, "ditto": 132}
+
+# (weight, action) of the steady-state mix: mostly reads, as a team builder would do
+MIX = [
+    (45, "get_pokemon_by_id"),
+    (10, "create_pokemon_by_name"),
+    (12, "add_move_to_pokemon"),
+    (8, "replace_move_of_pokemon"),
+    (15, "distribute_effort_values"),
+    (5, "login"),
+    (5, "whoami"),
+]
+
+
+def serve(db_path, port, bcrypt_rounds, ready):
+    """Child process: the fake PokeAPI and the app on port."""
+    from werkzeug.serving import make_server
+
+    from app.models import poke_model, user_model
+    from app.utils import api_utils, db_utils, metrics, password_hasher, rate_limiter
+    from tools.fake_pokeapi import FakePokeAPI
+
+    fake = FakePokeAPI({f"/api/v2/pokemon/{name}": species_document(name, game_id) for name, game_id in SPECIES.items()})
+    fake.start()
+
+    # Every virtual user logs in from 127.0.0.1: throttling would turn the test into 429s
+    rate_limiter.login_throttle = rate_limiter.LoginThrottle()
+    password_hasher.password_hasher = user_model.password_hasher = password_hasher.PasswordHasher(
+        workers=1, rounds=bcrypt_rounds
+    )
+    db_utils.DB_PATH = db_path
+    poke_model.BASE_POKE_URL = fake.url + "/api/v2/"
+    api_utils.response_cache.disk = None
+    metrics.registry.directory = None
+    # One INFO line per request would time the log queue as much as the app
+    logging.disable(logging.INFO)
+
+    import wsgi
+    server = make_server("127.0.0.1", port, wsgi.app, threaded=True)
+    ready.set()
+    server.serve_forever()
+
+
+class VirtualUser:
+    """One simulated client: its account, its Pokemon and its timings."""
+
+    def __init__(self, url, name, record):
+        self.url = url
+        self.name = name
+        self.record = record
+        self.session = requests.Session()
+        self.token = None
+        self.pokemon = []
+        self.moves = defaultdict(list)
+
+    def call(self, route, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url + path, timeout=30, **kwargs)
+        except requests.RequestException as e:
+            self.record(route, time.perf_counter() - start, type(e).__name__, False)
+            return None
+        elapsed = time.perf_counter() - start
+        locked = response.status_code >= 500 and "database is locked" in response.text
+        self.record(route, elapsed, response.status_code, locked)
+        return response if response.status_code == 200 else None
+
+    def start(self):
+        credentials = {"username": self.name, "password": "hehehe"}
+        self.call("create_account", "POST", "/api/create-account", json=credentials)
+        self.login()
+        for _ in range(3):
+            self.create_pokemon_by_name()
+
+    def login(self):
+        response = self.call("login", "POST", "/api/login", json={"username": self.name, "password": "hehehe"})
+        if response is not None:
+            self.token = response.json()['token']
+
+    def whoami(self):
+        self.call("whoami", "GET", "/api/whoami", headers={"Authorization": f"Bearer {self.token}"})
+
+    def create_pokemon_by_name(self):
+        response = self.call("create_pokemon_by_name", "POST", f"/api/create-pokemon-by-name/{random.choice(list(SPECIES))}")
+        if response is not None:
+            self.pokemon.append(response.json()['pokemon_id'])
+
+    def get_pokemon_by_id(self):
+        if self.pokemon:
+            self.call("get_pokemon_by_id", "GET", f"/api/get-pokemon-by-id/{random.choice(self.pokemon)}")
+
+    def add_move_to_pokemon(self):
+        if not self.pokemon:
+            return
+        pokemon_id = random.choice(self.pokemon)
+        if len(self.moves[pokemon_id]) >= 4:
+            return self.replace_move_of_pokemon()
+        move = random.choice([move for move in MOVES if move not in self.moves[pokemon_id]])
+        if self.call("add_move_to_pokemon", "POST", "/api/add-move-to-pokemon", json={"id": pokemon_id, "name": move}):
+            self.moves[pokemon_id].append(move)
+
+    def replace_move_of_pokemon(self):
+        known = [pokemon_id for pokemon_id in self.pokemon if self.moves[pokemon_id]]
+        if not known:
+            return self.add_move_to_pokemon()
+        pokemon_id = random.choice(known)
+        old = random.choice(self.moves[pokemon_id])
+        new = random.choice([move for move in MOVES if move not in self.moves[pokemon_id]])
+        if self.call("replace_move_of_pokemon", "POST", "/api/replace-move-of-pokemon",
+                     json={"id": pokemon_id, "old_name": old, "new_name": new}):
+            self.moves[pokemon_id][self.moves[pokemon_id].index(old)] = new
+
+    def distribute_effort_values(self):
+        if self.pokemon:
+            evs = [random.randrange(0, 253) for _ in range(6)]
+            self.call("distribute_effort_values", "POST", "/api/distribute-effort-values",
+                      json={"id": random.choice(self.pokemon), "evs": evs})
+
+    def run(self, deadline):
+        self.start()
+        weights, actions = zip(*MIX)
+        while time.monotonic() < deadline:
+            getattr(self, random.choices(actions, weights)[0])()
+
+
+def client(url, users, duration, first_user, results):
+    """Client process: users virtual users on threads, for duration seconds."""
+    samples = []
+    lock = threading.Lock()
+
+    def record(route, seconds, status, locked):
+        with lock:
+            samples.append((route, seconds, status, locked))
+
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=VirtualUser(url, f"trainer{first_user + i}", record).run, args=(deadline,))
+        for i in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(samples)
+
+
+def percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def summarize(samples, elapsed):
+    by_route = defaultdict(list)
+    for sample in samples:
+        by_route[sample[0]].append(sample)
+
+    routes = {}
+    for route, route_samples in sorted(by_route.items()):
+        latencies = sorted(seconds * 1000 for _, seconds, _, _ in route_samples)
+        statuses = Counter(str(status) for _, _, status, _ in route_samples)
+        errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+        routes[route] = {
+            'requests': len(route_samples),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'error_rate': round(errors / len(route_samples), 4),
+            'sqlite_locked': sum(1 for sample in route_samples if sample[3]),
+            'statuses': dict(sorted(statuses.items())),
+        }
+    errors = sum(route['error_rate'] * route['requests'] for route in routes.values())
+    return {
+        'requests': len(samples),
+        'requests_per_second': round(len(samples) / elapsed, 1),
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'sqlite_locked': sum(route['sqlite_locked'] for route in routes.values()),
+        'routes': routes,
+    }
+
+
+def drive(url, concurrency, duration, processes, first_user):
+    processes = max(1, min(processes, concurrency))
+    shares = [concurrency // processes + (1 if i < concurrency % processes else 0) for i in range(processes)]
+    results = multiprocessing.Queue()
+    workers = []
+    for share in shares:
+        workers.append(multiprocessing.Process(target=client, args=(url, share, duration, first_user, results)))
+        first_user += share
+    start = time.monotonic()
+    for worker in workers:
+        worker.start()
+    samples = [sample for _ in workers for sample in results.get()]
+    for worker in workers:
+        worker.join()
+    return summarize(samples, time.monotonic() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="virtual users per level")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="client processes")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--output", help="JSON file to write as well as printing it")
+    args = parser.parse_args(argv)
+
+    levels = []
+    first_user = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "load.db")
+        create_database(db_path)
+        port = free_port()
+        ready = multiprocessing.Event()
+        server = multiprocessing.Process(target=serve, args=(db_path, port, args.bcrypt_rounds, ready))
+        server.start()
+        try:
+            if not ready.wait(30):
+                raise RuntimeError("the app did not start")
+            for concurrency in args.concurrency:
+                level = drive(f"http://127.0.0.1:{port}", concurrency, args.duration, args.processes, first_user)
+                levels.append(dict(concurrency=concurrency, **level))
+                first_user += concurrency
+        finally:
+            server.terminate()
+            server.join(timeout=30)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'cpus': os.cpu_count(),
+        'settings': {'duration': args.duration, 'bcrypt_rounds': args.bcrypt_rounds, 'mix': dict((a, w) for w, a in MIX)},
+        'levels': levels,
+    }
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+            fh.write("\n")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
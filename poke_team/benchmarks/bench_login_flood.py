@@ -0,0 +1,121 @@
+"""
+Latency of GET /api/get-pokemon-by-id while /api/login is flooded with wrong
+passwords, with the login throttle off and on.
+
+For each backend the server is started, the route's latency is measured alone,
+then again while several client processes hammer /api/login; the flood's
+status codes show how many attempts reached bcrypt (401) and how many were
+turned away first (429).
+
+Usage:
+    python -m benchmarks.bench_login_flood [--backends off memory sqlite] [--duration 5] [--flooders 4]
+"""
+import argparse
+from collections import Counter
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import bcrypt
+import requests
+
+from benchmarks.bench_hydration import ROSTER_SIZE, populate
+from benchmarks.bench_serve import free_port, start_server
+
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql")
+
+
+def add_user(db_path, rounds):
+    conn = sqlite3.connect(db_path)
+    with open(os.path.join(SQL_DIR, "create_user_table.sql"), "r") as fh:
+        conn.executescript(fh.read())
+    hashed = bcrypt.hashpw(b"hehehe", bcrypt.gensalt(rounds))
+    conn.execute("INSERT INTO users (username, hashed_passwd, salt) VALUES ('bucket', ?, ?)", (hashed, hashed[:29]))
+    conn.commit()
+    conn.close()
+
+
+def flood(url, duration, results):
+    session = requests.Session()
+    statuses = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        response = session.post(f"{url}/api/login", json={"username": "bucket", "password": "wrong"})
+        statuses[response.status_code] += 1
+    results.put(dict(statuses))
+
+
+def latencies(url, duration):
+    session = requests.Session()
+    samples = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        session.get(f"{url}/api/get-pokemon-by-id/{random.randrange(ROSTER_SIZE)}")
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'requests': len(samples),
+        'p50_ms': round(statistics.median(samples), 2),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["off", "memory", "sqlite"])
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--flooders", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt work factor")
+    args = parser.parse_args(argv)
+
+    rounds = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        populate(db_path)
+        add_user(db_path, args.rounds)
+        for backend in args.backends:
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            server = start_server(
+                db_path, port, args.workers, 4,
+                LOGIN_THROTTLE_BACKEND=backend,
+                LOGIN_THROTTLE_PATH=os.path.join(tmp, f"throttle-{backend}.db"),
+                BCRYPT_ROUNDS=str(args.rounds),
+            )
+            try:
+                quiet = latencies(url, args.duration)
+                results = multiprocessing.Queue()
+                flooders = [
+                    multiprocessing.Process(target=flood, args=(url, args.duration, results))
+                    for _ in range(args.flooders)
+                ]
+                for flooder in flooders:
+                    flooder.start()
+                loaded = latencies(url, args.duration)
+                statuses = Counter()
+                for _ in flooders:
+                    statuses.update(results.get())
+                for flooder in flooders:
+                    flooder.join()
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+            rounds.append({
+                'throttle': backend,
+                'without_flood': quiet,
+                'during_flood': loaded,
+                'flood_statuses': {str(code): count for code, count in sorted(statuses.items())},
+            })
+    print(json.dumps(rounds, indent=2))
+
+
+if __name__ == '__main__':
+    main()
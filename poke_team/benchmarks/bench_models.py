@@ -0,0 +1,235 @@
+"""
+Microbenchmarks of the model layer, recorded to a JSON baseline and compared against it.
+
+Every benchmark runs in-process against a real temporary SQLite file, with
+species documents served by a local fake PokeAPI, and reports the median, p95
+and minimum time per call. bcrypt runs on the calling thread with a low work
+factor by default, so the login and account numbers show the model's own cost.
+
+Usage:
+    python -m benchmarks.bench_models run [--output benchmarks/baseline.json] [--iterations 100] [--repeat 5]
+    python -m benchmarks.bench_models compare benchmarks/baseline.json [current.json] [--threshold 0.2]
+
+compare runs the suite when no current results are given, prints the change of
+every benchmark's median and exits with status 1 if one got slower than the
+threshold allows.
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from app.models import poke_model, user_model
+from app.utils import api_utils, db_utils, metrics
+from app.utils.password_hasher import PasswordHasher
+from tools.fake_pokeapi import FakePokeAPI
+
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+STAT_NAMES = ("hp", "attack", "defense", "special-attack", "special-defense", "speed")
+MOVES = ["thunderbolt", "quick-attack", "agility", "tail-whip"] + [f"move-{i}" for i in range(80)]
+
+
+def species_document(name, game_id):
+    return {
+        'id': game_id,
+        'name': name,
+        'stats': [{'base_stat': 50 + i, 'stat': {'name': stat}} for i, stat in enumerate(STAT_NAMES)],
+        'moves': [{'move': {'name': move}} for move in MOVES],
+    }
+
+
+def create_database(db_path):
+    conn = sqlite3.connect(db_path)
+    for script in ("create_poke_table.sql", "create_user_table.sql"):
+        with open(os.path.join(SQL_DIR, script), "r") as fh:
+            conn.executescript(fh.read())
+    conn.close()
+
+
+def time_calls(op, iterations, warmup, repeat, undo=None):
+    """
+    Times op(i) alone, in repeat rounds of iterations calls after warmup calls;
+    undo(i) runs untimed after each call. The median is the one of the fastest
+    round, which is far less noisy than a single round on a busy machine.
+    """
+    rounds = []
+    i = 0
+    for _ in range(warmup):
+        op(i)
+        if undo is not None:
+            undo(i)
+        i += 1
+    for _ in range(repeat):
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            op(i)
+            samples.append((time.perf_counter() - start) * 1e6)
+            if undo is not None:
+                undo(i)
+            i += 1
+        rounds.append(samples)
+    samples = sorted(sample for samples in rounds for sample in samples)
+    return {
+        'calls': len(samples),
+        'median_us': round(min(statistics.median(samples) for samples in rounds), 2),
+        'p95_us': round(samples[max(int(len(samples) * 0.95) - 1, 0)], 2),
+        'min_us': round(samples[0], 2),
+        'mean_us': round(statistics.fmean(samples), 2),
+    }
+
+
+def benchmarks(pikachu_id):
+    """(name, op, undo) of every benchmark; ops get the call number."""
+    document = species_document("pikachu", 25)
+
+    def create_by_object(i):
+        poke_model.create_pokemon_by_object(poke_model.pokemon_from_species(document))
+
+    def add_move(i):
+        poke_model.add_move_to_pokemon(pikachu_id, "thunderbolt")
+
+    def remove_move(i):
+        poke_model.remove_move_from_pokemon(pikachu_id, "thunderbolt")
+
+    def distribute(i):
+        poke_model.distribute_effort_values(pikachu_id, [i % 256, 252, 4, 0, 0, (i * 7) % 256])
+
+    return [
+        ('create_pokemon_by_object', create_by_object, None),
+        ('create_pokemon_by_name', lambda i: poke_model.create_pokemon_by_name("pikachu"), None),
+        ('get_pokemon_by_id', lambda i: poke_model.get_pokemon_by_id(pikachu_id), None),
+        ('get_pokemon_by_id_uncached', lambda i: poke_model.get_pokemon_by_id(pikachu_id),
+         lambda i: poke_model.pokemon_cache.clear()),
+        ('add_move_to_pokemon', add_move, remove_move),
+        ('distribute_effort_values', distribute, None),
+        ('create_account', lambda i: user_model.create_account(f"trainer{i}", "hehehe"), None),
+        ('login', lambda i: user_model.login("bucket", "hehehe"), None),
+    ]
+
+
+def run(iterations=100, warmup=20, repeat=5, bcrypt_rounds=4, only=None):
+    """Runs the suite and returns its results, ready to be saved as JSON."""
+    user_model.password_hasher = PasswordHasher(workers=0, rounds=bcrypt_rounds)
+    # Memory-only caches and no metric files: nothing outside the temporary directory
+    api_utils.response_cache.disk = None
+    metrics.registry.directory = None
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, FakePokeAPI() as fake:
+        fake.documents["/api/v2/pokemon/pikachu"] = species_document("pikachu", 25)
+        poke_model.BASE_POKE_URL = fake.url + "/api/v2/"
+        db_utils.DB_PATH = os.path.join(tmp, "bench.db")
+        create_database(db_utils.DB_PATH)
+
+        user_model.create_account("bucket", "hehehe")
+        pikachu = poke_model.pokemon_from_species(species_document("pikachu", 25))
+        poke_model.create_pokemon_by_object(pikachu)
+
+        for name, op, undo in benchmarks(pikachu.id):
+            if only and name not in only:
+                continue
+            results[name] = time_calls(op, iterations, warmup, repeat, undo)
+        db_utils.close_db_connections()
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': {'iterations': iterations, 'warmup': warmup, 'repeat': repeat, 'bcrypt_rounds': bcrypt_rounds},
+        'benchmarks': results,
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Compares the medians of two result sets.
+
+    Returns:
+        list: One dict per benchmark with its baseline and current medians, the
+        ratio between them and a status of ok, regression, improvement or missing.
+    """
+    rows = []
+    for name, base in baseline['benchmarks'].items():
+        now = current['benchmarks'].get(name)
+        if now is None:
+            rows.append({'benchmark': name, 'status': 'missing'})
+            continue
+        ratio = now['median_us'] / base['median_us'] if base['median_us'] else float("inf")
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 - threshold:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append({
+            'benchmark': name,
+            'baseline_us': base['median_us'],
+            'current_us': now['median_us'],
+            'ratio': round(ratio, 3),
+            'status': status,
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite and save or print the results")
+    run_parser.add_argument("--output", help="JSON file to write, e.g. benchmarks/baseline.json")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions against a baseline")
+    compare_parser.add_argument("baseline", nargs="?", default=BASELINE_PATH)
+    compare_parser.add_argument("current", nargs="?", help="results of a previous run; runs the suite if omitted")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown of a median, 0.2 is 20%%")
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--iterations", type=int, default=100, help="calls per round")
+        sub.add_argument("--warmup", type=int, default=20)
+        sub.add_argument("--repeat", type=int, default=5, help="rounds; the fastest round's median is kept")
+        sub.add_argument("--bcrypt-rounds", type=int, default=4)
+        sub.add_argument("--only", nargs="+", help="benchmarks to run")
+    args = parser.parse_args(argv)
+
+    # Per-call INFO messages would time the log queue rather than the model
+    logging.disable(logging.INFO)
+
+    if args.command == "run":
+        results = run(args.iterations, args.warmup, args.repeat, args.bcrypt_rounds, args.only)
+        if args.output:
+            with open(args.output, "w") as fh:
+                json.dump(results, fh, indent=2)
+                fh.write("\n")
+        print(json.dumps(results, indent=2))
+        return 0
+
+    with open(args.baseline, "r") as fh:
+        baseline = json.load(fh)
+    if args.current:
+        with open(args.current, "r") as fh:
+            current = json.load(fh)
+    else:
+        current = run(args.iterations, args.warmup, args.repeat, args.bcrypt_rounds, args.only)
+    if args.only:
+        baseline['benchmarks'] = {name: base for name, base in baseline['benchmarks'].items() if name in args.only}
+
+    rows = compare(baseline, current, args.threshold)
+    print(json.dumps({'threshold': args.threshold, 'benchmarks': rows}, indent=2))
+    return 1 if any(row['status'] == 'regression' for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
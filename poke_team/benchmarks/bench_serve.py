@@ -0,0 +1,122 @@
+"""
+Throughput of GET /api/get-pokemon-by-id under gunicorn as the worker count grows.
+
+Each round starts the production server (gunicorn.conf.py, wsgi:app) against a
+populated temporary database and drives it from several client processes for a
+fixed duration, then prints requests per second and the scaling relative to a
+single worker.
+
+Usage:
+    python -m benchmarks.bench_serve [--workers 1 2 4] [--duration 10] [--clients 8]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks.bench_hydration import ROSTER_SIZE, populate
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path, port, workers, threads, **extra_env):
+    env = dict(
+        os.environ,
+        **extra_env,
+        DB_PATH=db_path,
+        POKEAPI_CACHE_PATH="",
+        WEB_BIND=f"127.0.0.1:{port}",
+        WEB_WORKERS=str(workers),
+        WEB_THREADS=str(threads),
+        WEB_ACCESS_LOG="",
+        WEB_LOG_LEVEL="warning",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return server
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def client(url, duration, results):
+    session = requests.Session()
+    done = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        response = session.get(f"{url}/api/get-pokemon-by-id/{random.randrange(ROSTER_SIZE)}")
+        if response.status_code == 200:
+            done += 1
+        else:
+            errors += 1
+    results.put((done, errors))
+
+
+def drive(url, duration, clients):
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=client, args=(url, duration, results)) for _ in range(clients)]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return sum(done for done, _ in totals), sum(errors for _, errors in totals)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        populate(db_path)
+        for workers in args.workers:
+            port = free_port()
+            server = start_server(db_path, port, workers, args.threads)
+            try:
+                done, errors = drive(f"http://127.0.0.1:{port}", args.duration, args.clients)
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+            results.append({
+                'workers': workers,
+                'threads': args.threads,
+                'requests_per_second': round(done / args.duration, 1),
+                'errors': errors,
+            })
+
+    base = results[0]['requests_per_second'] / results[0]['workers']
+    for result in results:
+        result['scaling_efficiency'] = round(result['requests_per_second'] / (base * result['workers']), 2) if base else 0.0
+    print(json.dumps({'cpus': os.cpu_count(), 'rounds': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Final stats of a roster: the vectorized stat engine against a scalar Python version.
+
+Both compute the same stats for random bases, EVs, IVs, levels and natures;
+the scalar one loops over Pokemon and stats as a client would. The roster
+rows time loading the columns from SQLite and computing them end to end.
+
+Usage:
+    python -m benchmarks.bench_stats [--sizes 6 100 1000 10000]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from app.models import stat_model
+from app.utils import db_utils
+
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql")
+
+
+def scalar_stats(base, evs, ivs, level, nature):
+    """One Pokemon's stats, one stat at a time."""
+    raised, lowered = stat_model.NATURES[nature]
+    stats = []
+    for i in range(6):
+        core = (2 * base[i] + ivs[i] + evs[i] // 4) * level // 100
+        if i == 0:
+            stats.append(1 if base[0] == 1 else core + level + 10)
+            continue
+        value = core + 5
+        if raised != lowered and i == raised:
+            value = value * 11 // 10
+        elif raised != lowered and i == lowered:
+            value = value * 9 // 10
+        stats.append(value)
+    return stats
+
+
+def roster(size, seed=0):
+    rng = np.random.default_rng(seed)
+    return (
+        rng.integers(1, 256, size=(size, 6)),
+        rng.integers(0, 256, size=(size, 6)),
+        rng.integers(0, 32, size=(size, 6)),
+        rng.integers(1, 101, size=size),
+        rng.choice(list(stat_model.NATURES), size=size).tolist(),
+    )
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def populate(db_path, base, evs):
+    conn = sqlite3.connect(db_path)
+    with open(os.path.join(SQL_DIR, "create_poke_table.sql"), "r") as fh:
+        conn.executescript(fh.read())
+    conn.executemany("INSERT INTO pokemon (id, game_id, name, ability, total_effort) VALUES (?, 0, 'mon', '', 0)",
+                     [(i,) for i in range(len(base))])
+    conn.executemany("INSERT INTO stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     [(i, *(value for pair in zip(b, e) for value in pair)) for i, (b, e) in enumerate(zip(base.tolist(), evs.tolist()))])
+    conn.commit()
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[6, 100, 1000, 10000], help="Pokemon per pass")
+    parser.add_argument("--repeat", type=int, default=5, help="passes; the fastest one is kept")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        base, evs, ivs, levels, natures = roster(size)
+        vector_seconds, vector = best_of(lambda: stat_model.calculate_stats(base, evs, ivs, levels, natures), args.repeat)
+        rows = (base.tolist(), evs.tolist(), ivs.tolist(), levels.tolist())
+        scalar_seconds, scalar = best_of(
+            lambda: [scalar_stats(*row, nature) for *row, nature in zip(*rows, natures)], args.repeat
+        )
+        if vector.tolist() != scalar:
+            raise AssertionError(f"vectorized and scalar stats differ for {size} Pokemon")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db_utils.DB_PATH = os.path.join(tmp, "bench.db")
+            populate(db_utils.DB_PATH, base, evs)
+            roster_seconds, _ = best_of(lambda: stat_model.get_roster_stats(level=50), args.repeat)
+            db_utils.close_db_connections()
+
+        results.append({
+            'pokemon': size,
+            'vectorized_us': round(vector_seconds * 1e6, 1),
+            'scalar_us': round(scalar_seconds * 1e6, 1),
+            'speedup': round(scalar_seconds / vector_seconds, 1),
+            'roster_from_db_ms': round(roster_seconds * 1000, 3),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
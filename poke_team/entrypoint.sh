@@ -13,5 +13,14 @@ else
     echo "Skipping database creation."
 fi
 
-# Start the Python application
-exec python app.py
+# Bring an existing database up to the current schema without dropping data
+echo "Applying schema migrations..."
+python -m app.utils.migrations
+
+# Start the Python application: gunicorn by default, Flask's development server
+# (with the debugger and reloader if FLASK_DEBUG=true) when WEB_SERVER=development
+if [ "$WEB_SERVER" = "development" ]; then
+    exec python app.py
+else
+    exec gunicorn -c gunicorn.conf.py wsgi:app
+fi
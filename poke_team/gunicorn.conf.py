@@ -0,0 +1,57 @@
+"""
+Gunicorn settings for the production server, all driven by environment variables
+(see .env).
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Signals: SIGTERM/SIGINT stop after in-flight requests finish (up to
+WEB_GRACEFUL_TIMEOUT seconds), SIGHUP re-reads these settings and replaces every
+worker gracefully, and SIGTTIN/SIGTTOU add or remove a worker. With WEB_PRELOAD
+the code is not re-imported on SIGHUP; restart the container to deploy new code.
+"""
+import multiprocessing
+import os
+
+
+def _flag(name, default):
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:5000")
+
+# SQLite admits one writer at a time, so past a few processes per core extra
+# workers mostly wait on the write lock; threads cover slow upstream fetches.
+workers = int(os.getenv("WEB_WORKERS", str(multiprocessing.cpu_count() * 2)))
+threads = int(os.getenv("WEB_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+backlog = int(os.getenv("WEB_BACKLOG", "2048"))
+
+# Import the app and warm its caches once in the master, then fork
+preload_app = _flag("WEB_PRELOAD", "true")
+
+# Seconds a worker may spend on one request before it is killed and replaced
+timeout = int(os.getenv("WEB_TIMEOUT", "30"))
+# Seconds in-flight requests get to finish on shutdown or reload
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+# Seconds an idle keep-alive connection is held open
+keepalive = int(os.getenv("WEB_KEEPALIVE", "5"))
+
+# Recycle workers after this many requests (0 never), jittered so they do not all restart at once
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("WEB_MAX_REQUESTS_JITTER", "0"))
+
+loglevel = os.getenv("WEB_LOG_LEVEL", "info")
+accesslog = os.getenv("WEB_ACCESS_LOG", "-") or None
+errorlog = "-"
+
+
+def on_starting(server):
+    # Metric files of a previous run would otherwise be added to this one's totals
+    from app.utils.metrics import registry
+    registry.reset_directory()
+
+
+def child_exit(server, worker):
+    # Runs in the master: add the exited worker's counters to the shared total and drop its file
+    from app.utils.metrics import registry
+    registry.fold_exited(worker.pid)
@@ -6,11 +6,18 @@ if [ -f "$DB_PATH" ]; then
     # Drop and recreate the tables
     sqlite3 "$DB_PATH" < /app/sql/create_poke_table.sql #switch meal out for whichever database we're going to create
     sqlite3 "$DB_PATH" < /app/sql/create_user_table.sql
+    sqlite3 "$DB_PATH" < /app/sql/create_team_table.sql
+    sqlite3 "$DB_PATH" < /app/sql/create_mirror_tables.sql # keeps an existing PokeAPI mirror
+    # The tables are now at the latest schema: record it so no migration re-runs on them
+    python -m app.utils.migrations --db-path "$DB_PATH" --stamp
     echo "Database recreated successfully."
 else
     echo "Creating database at $DB_PATH."
     # Create the database for the first time
     sqlite3 "$DB_PATH" < /app/sql/create_poke_table.sql #switch meal out for whichever database we're going to create
     sqlite3 "$DB_PATH" < /app/sql/create_user_table.sql
+    sqlite3 "$DB_PATH" < /app/sql/create_team_table.sql
+    sqlite3 "$DB_PATH" < /app/sql/create_mirror_tables.sql
+    python -m app.utils.migrations --db-path "$DB_PATH" --stamp
     echo "Database created successfully."
 fi
\ No newline at end of file
@@ -0,0 +1,48 @@
+CREATE TABLE IF NOT EXISTS species (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    content_hash TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS species_stats (
+    species_id INTEGER NOT NULL,
+    stat TEXT NOT NULL,
+    base_stat INTEGER NOT NULL,
+    PRIMARY KEY (species_id, stat),
+    FOREIGN KEY (species_id) REFERENCES species(id)
+);
+
+CREATE TABLE IF NOT EXISTS species_abilities (
+    species_id INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    ability TEXT NOT NULL,
+    is_hidden INTEGER NOT NULL,
+    PRIMARY KEY (species_id, slot),
+    FOREIGN KEY (species_id) REFERENCES species(id)
+);
+
+CREATE TABLE IF NOT EXISTS species_types (
+    species_id INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (species_id, slot),
+    FOREIGN KEY (species_id) REFERENCES species(id)
+);
+
+CREATE TABLE IF NOT EXISTS species_moves (
+    species_id INTEGER NOT NULL,
+    move TEXT NOT NULL,
+    PRIMARY KEY (species_id, move),
+    FOREIGN KEY (species_id) REFERENCES species(id)
+);
+
+CREATE TABLE IF NOT EXISTS moves (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    power INTEGER,
+    damage_class TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
@@ -2,22 +2,34 @@ DROP TABLE IF EXISTS pokemon;
 DROP TABLE IF EXISTS learned_moves;
 DROP TABLE IF EXISTS stats;
 
+-- Not dropped with the catalog: ids are never handed out twice, even after
+-- the pokemon are cleared, so nothing that kept an id can see another pokemon.
+CREATE TABLE IF NOT EXISTS pokemon_sequence (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO pokemon_sequence (name, value) VALUES ('next_id', 0);
+INSERT OR IGNORE INTO pokemon_sequence (name, value) VALUES ('version', 0);
+
 CREATE TABLE pokemon (
     id INTEGER PRIMARY KEY,
     game_id INTEGER,
     name TEXT,
     ability TEXT,
-    total_effort INTEGER
+    total_effort INTEGER,
+    version INTEGER NOT NULL DEFAULT 0
 );
 
 CREATE TABLE learned_moves (
-    pokemon_id INTEGER,
-    move TEXT,
+    pokemon_id INTEGER NOT NULL,
+    move TEXT NOT NULL,
+    UNIQUE (pokemon_id, move),
     FOREIGN KEY (pokemon_id) REFERENCES pokemon(id)
 );
 
 CREATE TABLE stats (
-    pokemon_id INTEGER,
+    pokemon_id INTEGER PRIMARY KEY,
     hp_base INTEGER, hp_effort INTEGER,
     attack_base INTEGER, attack_effort INTEGER,
     defense_base INTEGER, defense_effort INTEGER,
@@ -26,3 +38,43 @@ CREATE TABLE stats (
     speed_base INTEGER, speed_effort INTEGER,
     FOREIGN KEY (pokemon_id) REFERENCES pokemon(id)
 );
+
+-- Ids given explicitly move the sequence past them too
+CREATE TRIGGER pokemon_next_id AFTER INSERT ON pokemon
+BEGIN
+    UPDATE pokemon_sequence SET value = MAX(value, NEW.id + 1) WHERE name = 'next_id';
+END;
+
+-- Every new pokemon and every change to a pokemon, its moves or its stats
+-- sets pokemon.version to the next value of a counter that clear_poke does
+-- not reset, which lets cached copies, in any process, be checked for
+-- staleness with one indexed read.
+CREATE TRIGGER pokemon_version_on_insert AFTER INSERT ON pokemon
+BEGIN
+    UPDATE pokemon_sequence SET value = value + 1 WHERE name = 'version';
+    UPDATE pokemon SET version = (SELECT value FROM pokemon_sequence WHERE name = 'version') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER pokemon_version_on_update AFTER UPDATE OF game_id, name, ability, total_effort ON pokemon
+BEGIN
+    UPDATE pokemon_sequence SET value = value + 1 WHERE name = 'version';
+    UPDATE pokemon SET version = (SELECT value FROM pokemon_sequence WHERE name = 'version') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER learned_moves_version_on_insert AFTER INSERT ON learned_moves
+BEGIN
+    UPDATE pokemon_sequence SET value = value + 1 WHERE name = 'version';
+    UPDATE pokemon SET version = (SELECT value FROM pokemon_sequence WHERE name = 'version') WHERE id = NEW.pokemon_id;
+END;
+
+CREATE TRIGGER learned_moves_version_on_delete AFTER DELETE ON learned_moves
+BEGIN
+    UPDATE pokemon_sequence SET value = value + 1 WHERE name = 'version';
+    UPDATE pokemon SET version = (SELECT value FROM pokemon_sequence WHERE name = 'version') WHERE id = OLD.pokemon_id;
+END;
+
+CREATE TRIGGER stats_version_on_update AFTER UPDATE ON stats
+BEGIN
+    UPDATE pokemon_sequence SET value = value + 1 WHERE name = 'version';
+    UPDATE pokemon SET version = (SELECT value FROM pokemon_sequence WHERE name = 'version') WHERE id = NEW.pokemon_id;
+END;
@@ -0,0 +1,24 @@
+DROP TABLE IF EXISTS team_members;
+DROP TABLE IF EXISTS teams;
+
+CREATE TABLE teams (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE INDEX teams_user_id ON teams (user_id);
+
+-- One row per member; the key keeps a team's members in slot order and
+-- the second index answers "which teams contain this pokemon".
+CREATE TABLE team_members (
+    team_id INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    pokemon_id INTEGER NOT NULL,
+    PRIMARY KEY (team_id, slot),
+    FOREIGN KEY (team_id) REFERENCES teams(id),
+    FOREIGN KEY (pokemon_id) REFERENCES pokemon(id)
+) WITHOUT ROWID;
+
+CREATE INDEX team_members_pokemon_id ON team_members (pokemon_id, team_id);
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+
+import pytest
+
+from app.utils import db_utils, metrics
+from app.utils.migrations import stamp
+
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql")
+
+
+class FakeClock:
+    """A time source that only moves when a test sets now."""
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture(autouse=True, scope="session")
+def metrics_dir(tmp_path_factory):
+    """Keep the metric snapshots of the test run out of the default METRICS_DIR."""
+    metrics.registry.directory = str(tmp_path_factory.mktemp("metrics"))
+    yield metrics.registry.directory
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """Point the app at a fresh SQLite file with every table created."""
+    db_path = str(tmp_path / "poke_team.db")
+    monkeypatch.setattr(db_utils, "DB_PATH", db_path)
+    monkeypatch.setenv("SQL_CREATE_POKE_TABLE_PATH", os.path.join(SQL_DIR, "create_poke_table.sql"))
+    monkeypatch.setenv("SQL_CREATE_TABLE_PATH", os.path.join(SQL_DIR, "create_user_table.sql"))
+    monkeypatch.setenv("SQL_CREATE_MIRROR_TABLE_PATH", os.path.join(SQL_DIR, "create_mirror_tables.sql"))
+
+    conn = sqlite3.connect(db_path)
+    for script in ("create_poke_table.sql", "create_user_table.sql", "create_team_table.sql", "create_mirror_tables.sql"):
+        with open(os.path.join(SQL_DIR, script), "r") as fh:
+            conn.executescript(fh.read())
+    conn.close()
+    # As create_db.sh does
+    stamp(db_path)
+
+    yield db_path
+    db_utils.close_db_connections()
+
+@pytest.fixture
+def clock():
+    """A fake clock to inject wherever a component takes one."""
+    return FakeClock()
+
+@pytest.fixture
+def count_queries(sqlite_db):
+    """A function running fn and returning its result and how many statements it sent to SQLite."""
+    def count(fn):
+        statements = []
+        with db_utils.get_db_connection(read_only=True) as conn:
+            conn.set_trace_callback(statements.append)
+            try:
+                result = fn()
+            finally:
+                conn.set_trace_callback(None)
+        return result, len(statements)
+    return count
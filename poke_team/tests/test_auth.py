@@ -0,0 +1,165 @@
+import json
+
+from flask import Flask, g
+import pytest
+
+from app.utils.auth_tokens import InvalidTokenError, TokenSigner, _b64encode, token_required
+from app.utils.password_hasher import PasswordHasher
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def signer(mocker, clock):
+    """Replace the app's token signer with one on a fake clock."""
+    signer = TokenSigner(b"test-secret", ttl=60, clock=clock)
+    mocker.patch("app.utils.auth_tokens.token_signer", signer)
+    mocker.patch("app.models.user_model.token_signer", signer)
+    return signer
+
+######################################################
+#
+#    Tokens
+#
+######################################################
+
+def test_issued_token_verifies(signer):
+    """Test that a fresh token carries its user."""
+    claims = signer.verify(signer.issue("bucket"))
+
+    assert claims['sub'] == "bucket"
+    assert claims['exp'] - claims['iat'] == 60 * 1000
+
+def test_tampered_token_is_rejected(signer):
+    """Test that changing the claims or signing with another key breaks the signature."""
+    payload, signature = signer.issue("bucket").split(".")
+    forged = TokenSigner(b"other-secret").issue("bucket")
+
+    for token in (f"{payload}x.{signature}", f"{payload}.{signature[:-2]}", forged, "garbage", ""):
+        with pytest.raises(InvalidTokenError, match="Invalid token"):
+            signer.verify(token)
+
+@pytest.mark.parametrize("claims", [{'sub': "bucket", 'iat': 0}, [1, 2], "bucket", {'sub': "bucket", 'iat': 0, 'exp': "soon", 'jti': "x"}])
+def test_signed_malformed_claims_are_rejected(signer, claims):
+    """Test that a correctly signed payload which is not an object with the issued claims is invalid."""
+    payload = _b64encode(json.dumps(claims).encode("utf-8"))
+
+    with pytest.raises(InvalidTokenError, match="Invalid token"):
+        signer.verify(f"{payload}.{signer._sign(payload)}")
+
+def test_non_ascii_token_is_rejected(signer):
+    """Test that characters a token can never contain are an invalid token, not an error."""
+    with pytest.raises(InvalidTokenError, match="Invalid token"):
+        signer.verify("\xe9abc.def")
+
+def test_token_expires(signer, clock):
+    """Test that a token stops verifying once its ttl has passed."""
+    token = signer.issue("bucket")
+    clock.now += 60
+
+    with pytest.raises(InvalidTokenError, match="expired"):
+        signer.verify(token)
+
+def test_revoke_single_token(signer):
+    """Test that revoking one token leaves the user's other tokens valid."""
+    first, second = signer.issue("bucket"), signer.issue("bucket")
+    signer.revoke(signer.verify(first))
+
+    with pytest.raises(InvalidTokenError, match="revoked"):
+        signer.verify(first)
+    signer.verify(second)
+
+def test_revoke_user_rejects_earlier_tokens(signer, clock):
+    """Test that a password change revokes every token issued before it, not after."""
+    before = signer.issue("bucket")
+    other = signer.issue("pail")
+    clock.now += 1
+    signer.revoke_user("bucket")
+    clock.now += 1
+    after = signer.issue("bucket")
+
+    with pytest.raises(InvalidTokenError, match="revoked"):
+        signer.verify(before)
+    signer.verify(other)
+    signer.verify(after)
+
+def test_revoke_user_within_the_same_millisecond(signer):
+    """Test that the cut-off splits tokens issued in the millisecond of the revocation."""
+    before = signer.issue("bucket")
+    signer.revoke_user("bucket")
+    after = signer.issue("bucket")
+
+    with pytest.raises(InvalidTokenError, match="revoked"):
+        signer.verify(before)
+    signer.verify(after)
+
+def test_revocations_are_forgotten_after_ttl(signer, clock):
+    """Test that revocations do not accumulate once the tokens they match have expired."""
+    signer.revoke(signer.verify(signer.issue("bucket")))
+    signer.revoke_user("pail")
+    clock.now += 61
+    signer.revoke_user("shovel")
+
+    assert signer.stats() == {'ttl': 60, 'revoked_tokens': 0, 'revoked_users': 1}
+
+
+######################################################
+#
+#    Decorator
+#
+######################################################
+
+def protected_app():
+    app = Flask(__name__)
+
+    @app.route("/private")
+    @token_required
+    def private():
+        return {'user': g.username}
+
+    return app.test_client()
+
+def test_token_required(signer):
+    """Test that the decorator admits valid bearer tokens only."""
+    client = protected_app()
+    token = signer.issue("bucket")
+
+    assert client.get("/private", headers={"Authorization": f"Bearer {token}"}).get_json() == {'user': 'bucket'}
+    assert client.get("/private").status_code == 401
+    assert client.get("/private", headers={"Authorization": f"Basic {token}"}).status_code == 401
+    assert client.get("/private", headers={"Authorization": "Bearer nope"}).get_json() == {'error': 'Invalid token'}
+    assert client.get("/private", headers={"Authorization": "Bearer \xe9abc.def"}).status_code == 401
+
+@pytest.mark.parametrize("route", ['/api/cache-stats', '/api/hasher-stats', '/api/query-stats'])
+def test_diagnostic_routes_require_token(sqlite_db, signer, route):
+    """Test that the routes exposing server internals answer only to a session token."""
+    import wsgi
+    client = wsgi.app.test_client()
+
+    assert client.get(route).status_code == 401
+    assert client.get(route, headers={"Authorization": f"Bearer {signer.issue('bucket')}"}).status_code == 200
+
+def test_login_logout_and_password_change(sqlite_db, signer, mocker):
+    """Test the token lifecycle through the routes."""
+    import wsgi
+    mocker.patch.dict(wsgi.app.view_functions['login'].__globals__, {'token_signer': signer})
+    mocker.patch("app.models.user_model.password_hasher", PasswordHasher(workers=0, rounds=4))
+    client = wsgi.app.test_client()
+    client.post("/api/create-account", json={"username": "bucket", "password": "hehehe"})
+
+    login = client.post("/api/login", json={"username": "bucket", "password": "hehehe"}).get_json()
+    auth = {"Authorization": f"Bearer {login['token']}"}
+    assert login['expires_in'] == 60
+    assert client.get("/api/whoami", headers=auth).get_json() == {'status': 'success', 'user': 'bucket'}
+
+    assert client.post("/api/logout", headers=auth).status_code == 200
+    assert client.get("/api/whoami", headers=auth).status_code == 401
+
+    token = client.post("/api/login", json={"username": "bucket", "password": "hehehe"}).get_json()['token']
+    signer._clock.now += 1
+    client.post("/api/update-password", json={"username": "bucket", "new": "hahaha"})
+    assert client.get("/api/whoami", headers={"Authorization": f"Bearer {token}"}).status_code == 401
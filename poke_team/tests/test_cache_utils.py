@@ -0,0 +1,165 @@
+import pytest
+
+from app.utils.cache_utils import DiskCache, LRUCache, ObjectCache, TwoTierCache
+
+
+######################################################
+#
+#    LRU
+#
+######################################################
+
+def test_lru_evicts_least_recently_used():
+    """Test that the least recently used entry is evicted first."""
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+def test_lru_expires_entries(clock):
+    """Test that entries older than the TTL are dropped."""
+    cache = LRUCache(max_entries=4, ttl=10, clock=clock)
+    cache.put("a", 1)
+
+    clock.now += 9
+    assert cache.get("a") == 1
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+
+def test_lru_stats():
+    """Test the hit/miss counters and hit ratio."""
+    cache = LRUCache(max_entries=4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+    assert stats['hit_ratio'] == pytest.approx(2 / 3)
+
+
+######################################################
+#
+#    Disk and two-tier
+#
+######################################################
+
+def test_disk_cache_survives_new_instance(tmp_path):
+    """Test that a second store on the same file (another process, a restart) sees the data."""
+    path = str(tmp_path / "cache.db")
+    DiskCache(path).put("pokemon/ditto", {"id": 132})
+
+    assert DiskCache(path).get("pokemon/ditto") == {"id": 132}
+
+def test_disk_cache_expires_entries(tmp_path, clock):
+    """Test that documents older than the TTL are not served."""
+    cache = DiskCache(str(tmp_path / "cache.db"), ttl=10, clock=clock)
+    cache.put("a", [1])
+
+    clock.now += 11
+    assert cache.get("a") is None
+
+def test_disk_cache_disables_itself_on_bad_path(tmp_path):
+    """Test that an unusable path degrades to a no-op store."""
+    cache = DiskCache(str(tmp_path / "missing" / "cache.db"))
+    cache.put("a", 1)
+
+    assert cache.get("a") is None
+    assert cache.stats()['enabled'] is False
+
+def test_two_tier_promotes_disk_hits(tmp_path):
+    """Test that a disk hit is copied into the memory tier."""
+    path = str(tmp_path / "cache.db")
+    TwoTierCache(LRUCache(), DiskCache(path)).put("a", {"x": 1})
+
+    cache = TwoTierCache(LRUCache(), DiskCache(path))
+    assert cache.get("a") == {"x": 1}
+    assert cache.get("a") == {"x": 1}
+    assert cache.stats()['disk']['hits'] == 1
+    assert cache.stats()['memory']['hits'] == 1
+
+
+######################################################
+#
+#    Object cache
+#
+######################################################
+
+def test_object_cache_reports_version_and_age(clock):
+    """Test that a hit carries the row version and the time since it was confirmed."""
+    cache = ObjectCache(max_bytes=100, sizeof=len, clock=clock)
+    cache.put(1, "ditto", 3, cache.token())
+
+    clock.now += 5
+    assert cache.get(1) == ("ditto", 3, 5)
+    cache.confirm(1, 3)
+    assert cache.get(1) == ("ditto", 3, 0)
+    assert cache.get(2) is None
+
+def test_object_cache_counts_hits_once_revalidated(clock):
+    """Test that an entry past max_age is a hit only once confirmed, and a stale one is a miss."""
+    cache = ObjectCache(max_bytes=100, sizeof=len, clock=clock)
+    cache.put(1, "ditto", 3, cache.token())
+
+    cache.get(1, max_age=10)
+    assert (cache.hits, cache.misses) == (1, 0)
+    clock.now += 20
+    cache.get(1, max_age=10)
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert cache.confirm(1, 3)
+    assert (cache.hits, cache.misses) == (2, 0)
+    cache.get(1)
+    assert not cache.confirm(1, 4)
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_object_cache_rejects_fill_older_than_invalidation():
+    """Test that a read which started before a write cannot put back the old copy."""
+    cache = ObjectCache(max_bytes=100, sizeof=len)
+    token = cache.token()
+    cache.invalidate(1)
+
+    assert cache.put(1, "stale", 0, token) is False
+    assert cache.get(1) is None
+    assert cache.put(1, "fresh", 1, cache.token()) is True
+    assert cache.stats()['rejected_fills'] == 1
+
+def test_object_cache_forgotten_tombstones_reject_older_fills():
+    """Test that fills are still refused once the matching invalidation has been forgotten."""
+    cache = ObjectCache(max_bytes=100, sizeof=len, max_tombstones=1)
+    token = cache.token()
+    cache.invalidate(1)
+    cache.invalidate(2)
+
+    assert cache.put(1, "stale", 0, token) is False
+
+def test_object_cache_evicts_by_size():
+    """Test that the least recently used entries go once the byte budget is exceeded."""
+    cache = ObjectCache(max_bytes=10, sizeof=len)
+    cache.put("a", "aaaa", 0, cache.token())
+    cache.put("b", "bbbb", 0, cache.token())
+    cache.get("a")
+    cache.put("c", "cccc", 0, cache.token())
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()['bytes'] == 8
+    assert cache.stats()['evictions'] == 1
+
+def test_object_cache_clear_rejects_inflight_fills():
+    """Test that clear drops every entry and refuses fills that started before it."""
+    cache = ObjectCache(max_bytes=100, sizeof=len)
+    cache.put(1, "ditto", 0, cache.token())
+    token = cache.token()
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.put(2, "pikachu", 0, token) is False
@@ -0,0 +1,157 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.models import type_model
+from app.models.damage_model import NO_DAMAGE, PHYSICAL, SPECIAL, calculate_damage, damage_matrix
+from app.models.poke_model import Pokemon, Stats, create_pokemon_by_objects
+from app.models.stat_model import STAT_NAMES, calculate_stats
+from app.models.type_model import NO_TYPE, TYPE_CHART, TYPE_INDEX
+import wsgi
+
+
+ICE, DRAGON, GROUND = TYPE_INDEX['ice'], TYPE_INDEX['dragon'], TYPE_INDEX['ground']
+
+SPECIES_TYPES = {
+    1: ('grass', 'poison'), 6: ('fire', 'flying'), 25: ('electric',), 130: ('water', 'flying'),
+    445: ('dragon', 'ground'), 471: ('ice',),
+}
+MOVES = {
+    'ice-fang': ('ice', 65, 'physical'),
+    'ice-beam': ('ice', 90, 'special'),
+    'earthquake': ('ground', 100, 'physical'),
+    'thunderbolt': ('electric', 90, 'special'),
+    'flamethrower': ('fire', 90, 'special'),
+    'quick-attack': ('normal', 40, 'physical'),
+    'giga-drain': ('grass', 75, 'special'),
+    'roost': ('flying', 0, 'status'),
+}
+
+
+def scalar_damage(level, power, damage_class, move_type, attacker, attacker_types, defender, defender_types, roll):
+    """One combination, one step at a time."""
+    if damage_class == 'status' or not power:
+        return 0
+    attack, defense = (attacker[1], defender[2]) if damage_class == 'physical' else (attacker[3], defender[4])
+    damage = ((2 * level // 5 + 2) * power * attack // defense) // 50 + 2
+    damage = damage * roll // 100
+    if move_type in attacker_types:
+        damage = damage * 3 // 2
+    effectiveness = 1.0
+    for defending in defender_types:
+        effectiveness *= TYPE_CHART[move_type, defending]
+    if effectiveness == 0:
+        return 0
+    return max(1, int(damage * int(effectiveness * 16) // 16))
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def roster(sqlite_db, mocker):
+    """Six stored Pokemon of the species above, with up to four moves each, and warm catalogs."""
+    mocker.patch.object(type_model, "species_types", {
+        game_id: tuple([TYPE_INDEX[t] for t in types] + [NO_TYPE])[:2] for game_id, types in SPECIES_TYPES.items()
+    })
+    mocker.patch.object(type_model, "move_data", {
+        name: (TYPE_INDEX[t], power, damage_class) for name, (t, power, damage_class) in MOVES.items()
+    })
+    # Catalogs are warm: nothing may be fetched
+    mocker.patch.object(type_model, "fetch_move", side_effect=AssertionError("unexpected move fetch"))
+
+    rng = random.Random(0)
+    pokemons = [
+        Pokemon(id=None, game_id=game_id, name=f"mon{game_id}", ability="",
+                learned_moves=rng.sample(list(MOVES), 4), total_effort=0,
+                stats=Stats(*([rng.randint(40, 130), rng.choice([0, 4, 252])] for _ in range(6))))
+        for game_id in SPECIES_TYPES
+    ]
+    create_pokemon_by_objects(pokemons)
+    return pokemons
+
+
+######################################################
+#
+#    Engine
+#
+######################################################
+
+def test_calculate_damage_known_values():
+    """Test Bulbapedia's example: a level 75 Glaceon's Ice Fang against Garchomp, 4x with STAB."""
+    glaceon = np.array([[0, 123, 0, 0, 0, 0]])
+    garchomp = np.array([[0, 0, 163, 0, 0, 0]])
+
+    low, high, effectiveness = calculate_damage(
+        75, np.array([[65]]), np.array([[PHYSICAL]]), np.array([[ICE]]),
+        glaceon, np.array([[ICE, NO_TYPE]]), garchomp, np.array([[DRAGON, GROUND]])
+    )
+
+    assert (low.item(), high.item(), effectiveness.item()) == (168, 196, 4.0)
+
+def test_calculate_damage_no_damage_cases():
+    """Test immunities, status moves and the 1 damage minimum."""
+    stats = np.array([[100, 5, 100, 5, 300, 100]])
+    low, high, effectiveness = calculate_damage(
+        5, np.array([[90, 0, 10]]), np.array([[SPECIAL, NO_DAMAGE, SPECIAL]]),
+        np.array([[TYPE_INDEX['electric'], TYPE_INDEX['flying'], TYPE_INDEX['bug']]]),
+        stats, np.array([[NO_TYPE, NO_TYPE]]), stats, np.array([[GROUND, TYPE_INDEX['steel']]])
+    )
+
+    assert low.tolist() == [[[0], [0], [1]]]
+    assert effectiveness.tolist() == [[[0.0], [0.5], [0.5]]]
+
+######################################################
+#
+#    Matrix
+#
+######################################################
+
+def test_damage_matrix_matches_scalar(roster):
+    """Test that a 6x4x6 matrix computed in one call matches a per-combination calculation."""
+    ids = [pokemon.id for pokemon in roster]
+
+    matrix = damage_matrix(ids, ids, level=50)
+
+    assert np.array(matrix['min_damage']).shape == (6, 4, 6)
+    base = [[getattr(p.stats, name)[0] for name in STAT_NAMES] for p in roster]
+    evs = [[getattr(p.stats, name)[1] for name in STAT_NAMES] for p in roster]
+    stats = calculate_stats(base, evs, level=50).tolist()
+    types = [[TYPE_INDEX[t] for t in SPECIES_TYPES[p.game_id]] for p in roster]
+    for a, attacker in enumerate(roster):
+        assert matrix['moves'][a] == attacker.learned_moves
+        for m, move in enumerate(attacker.learned_moves):
+            move_type, power, damage_class = MOVES[move]
+            for d in range(len(roster)):
+                args = (50, power, damage_class, TYPE_INDEX[move_type], stats[a], types[a], stats[d], types[d])
+                assert matrix['min_damage'][a][m][d] == scalar_damage(*args, roll=85)
+                assert matrix['max_damage'][a][m][d] == scalar_damage(*args, roll=100)
+                assert matrix['max_percent'][a][m][d] == round(matrix['max_damage'][a][m][d] * 100 / stats[d][0], 1)
+
+def test_damage_matrix_unknown_pokemon(roster):
+    """Test that an unknown attacker or defender is an error."""
+    with pytest.raises(ValueError, match="Pokemon with ID 999 not found"):
+        damage_matrix([roster[0].id], [999])
+
+def test_damage_matrix_route(roster):
+    """Test the route and its validation."""
+    client = wsgi.app.test_client()
+
+    response = client.post('/api/damage-matrix', json={'attackers': [roster[5].id], 'defenders': [roster[4].id, roster[0].id]})
+
+    assert response.status_code == 200
+    matrix = response.get_json()['matrix']
+    assert matrix['defenders'] == [roster[4].id, roster[0].id]
+    assert np.array(matrix['effectiveness']).shape == (1, 4, 2)
+    assert client.post('/api/damage-matrix', json={'attackers': [], 'defenders': [1]}).status_code == 400
+    assert client.post('/api/damage-matrix', json={'attackers': [roster[0].id], 'defenders': [roster[0].id], 'level': 0}).status_code == 400
+    for body in ({'attackers': [True], 'defenders': [roster[0].id]},
+                 {'attackers': [roster[0].id], 'defenders': [roster[0].id], 'level': True},
+                 {'attackers': [roster[0].id], 'defenders': [roster[0].id], 'level': 101}):
+        response = client.post('/api/damage-matrix', json=body)
+        assert response.status_code == 400
+        assert response.get_json()['error'].startswith("Invalid input")
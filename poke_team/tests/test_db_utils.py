@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from app.utils import db_utils
+from app.utils.db_utils import check_database_connection, check_table_exists, get_db_connection
+
+
+######################################################
+#
+#    Pooling
+#
+######################################################
+
+def test_connection_is_reused_within_a_thread(sqlite_db):
+    """Test that consecutive calls on one thread share the pooled connection."""
+    with get_db_connection() as first:
+        pass
+    with get_db_connection() as second:
+        pass
+    assert first is second
+
+def test_threads_get_their_own_connection(sqlite_db):
+    """Test that a connection is never shared across threads."""
+    with get_db_connection() as main_conn:
+        pass
+    other = []
+
+    def worker():
+        with get_db_connection() as conn:
+            other.append(conn)
+        db_utils.close_db_connections()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert other[0] is not main_conn
+
+def test_new_connection_after_fork(sqlite_db, mocker):
+    """Test that a forked worker does not reuse its parent's connection."""
+    with get_db_connection() as parent:
+        pass
+    mocker.patch("os.getpid", return_value=os.getpid() + 1)
+    with get_db_connection() as child:
+        pass
+    assert child is not parent
+
+def test_uncommitted_work_is_rolled_back(sqlite_db):
+    """Test that a block exiting without commit leaves nothing behind for the next caller."""
+    with pytest.raises(ValueError):
+        with get_db_connection() as conn:
+            conn.execute("INSERT INTO pokemon (id, name) VALUES (1, 'ditto')")
+            raise ValueError("caller gave up")
+
+    with get_db_connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM pokemon").fetchone()[0] == 0
+
+
+######################################################
+#
+#    Tuning
+#
+######################################################
+
+def test_connection_pragmas(sqlite_db):
+    """Test that pooled connections are tuned for concurrent access."""
+    with get_db_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == db_utils.DB_BUSY_TIMEOUT_MS
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == db_utils.DB_CACHE_SIZE
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 0
+
+def test_read_only_connection_rejects_writes(sqlite_db):
+    """Test that the read-only pool cannot take the write lock."""
+    with get_db_connection(read_only=True) as conn:
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO pokemon (id, name) VALUES (1, 'ditto')")
+
+def test_readers_do_not_block_behind_a_writer(sqlite_db):
+    """Test that a reader sees the last committed state while a write transaction is open."""
+    with get_db_connection() as writer:
+        writer.execute("INSERT INTO pokemon (id, name) VALUES (1, 'ditto')")
+        with get_db_connection(read_only=True) as reader:
+            assert reader.execute("SELECT COUNT(*) FROM pokemon").fetchone()[0] == 0
+        writer.commit()
+
+def test_health_checks(sqlite_db):
+    """Test the database and table checks against a real file."""
+    check_database_connection()
+    check_table_exists("pokemon")
+    with pytest.raises(Exception, match="Table check error"):
+        check_table_exists("meals")
@@ -0,0 +1,129 @@
+import os
+import subprocess
+import sys
+
+import pytest
+import requests
+
+from app.models import poke_model
+from app.utils import api_utils, http_client
+from app.utils.cache_utils import LRUCache, TwoTierCache
+from app.utils.singleflight import SingleFlight
+from tools.fake_pokeapi import FakePokeAPI
+
+
+DITTO = {
+    'id': 132,
+    'name': 'ditto',
+    'stats': [{'base_stat': 48, 'stat': {'name': 'hp'}}, {'base_stat': 48, 'stat': {'name': 'speed'}}],
+    'moves': [{'move': {'name': 'transform'}}],
+}
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def cassettes(tmp_path):
+    """A cassette directory recorded from a live (fake) upstream, which is stopped afterwards."""
+    with FakePokeAPI({"/api/v2/pokemon/ditto": DITTO}) as upstream:
+        with FakePokeAPI(cassette_dir=str(tmp_path), record_from=upstream.url) as recorder:
+            assert requests.get(recorder.url + "/api/v2/pokemon/ditto").status_code == 200
+            assert requests.get(recorder.url + "/api/v2/pokemon/missingno").status_code == 404
+            assert recorder.recorded == 1
+    return str(tmp_path)
+
+@pytest.fixture
+def fresh_upstream_state(mocker):
+    """An empty response cache and a new session with no backoff sleeps."""
+    mocker.patch.object(http_client, "POKEAPI_BACKOFF", 0)
+    mocker.patch.object(http_client, "POKEAPI_BACKOFF_JITTER", 0)
+    mocker.patch.object(api_utils, "response_cache", TwoTierCache(LRUCache(max_entries=16)))
+    mocker.patch.object(api_utils, "inflight", SingleFlight())
+    http_client.set_session(None)
+    yield
+    http_client.set_session(None)
+
+
+######################################################
+#
+#    Record and replay
+#
+######################################################
+
+def test_record_writes_cassettes(cassettes):
+    """Test that a recorded document is stored under its path."""
+    assert os.path.exists(os.path.join(cassettes, "api", "v2", "pokemon", "ditto.json"))
+    assert not os.path.exists(os.path.join(cassettes, "api", "v2", "pokemon", "missingno.json"))
+
+def test_replay_by_name_and_id(cassettes):
+    """Test that cassettes are served offline, by the recorded name and by id."""
+    with FakePokeAPI(cassette_dir=cassettes) as fake:
+        assert requests.get(fake.url + "/api/v2/pokemon/ditto").json() == DITTO
+        assert requests.get(fake.url + "/api/v2//pokemon/132/").json() == DITTO
+        assert requests.get(fake.url + "/api/v2/pokemon/pikachu").status_code == 404
+
+def test_model_runs_offline_on_cassettes(cassettes, fresh_upstream_state, mocker):
+    """Test that the model fetches through the real HTTP path and caches a slow upstream's answer."""
+    with FakePokeAPI(cassette_dir=cassettes, latency=0.1) as fake:
+        mocker.patch.object(poke_model, "BASE_POKE_URL", fake.url + "/api/v2/")
+
+        assert poke_model.fetch_species("ditto") == DITTO
+        assert poke_model.fetch_species("ditto") == DITTO
+
+        assert fake.hits["/api/v2/pokemon/ditto"] == 1
+
+######################################################
+#
+#    Fault injection
+#
+######################################################
+
+def test_injected_errors_are_retried(fresh_upstream_state):
+    """Test that the client's retries absorb a flaky upstream."""
+    with FakePokeAPI({"/api/v2/pokemon/ditto": DITTO}, error_rate=0.3, seed=7) as fake:
+        statuses = [http_client.get(fake.url + "/api/v2/pokemon/ditto").status_code for _ in range(10)]
+
+        assert statuses == [200] * 10
+        assert fake.injected[503] > 0
+
+def test_injected_errors_are_repeatable():
+    """Test that the same seed injects the same errors."""
+    def run():
+        with FakePokeAPI({"/api/v2/pokemon/ditto": DITTO}, error_rate=0.5, seed=3) as fake:
+            return [requests.get(fake.url + "/api/v2/pokemon/ditto").status_code for _ in range(12)]
+
+    first = run()
+    assert first == run()
+    assert 503 in first and 200 in first
+
+def test_throttling_answers_429():
+    """Test that requests beyond the token bucket get 429 with a Retry-After header."""
+    with FakePokeAPI({"/api/v2/pokemon/ditto": DITTO}, rate=0.5, burst=2) as fake:
+        responses = [requests.get(fake.url + "/api/v2/pokemon/ditto") for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert responses[2].headers['Retry-After'] == "2"
+
+######################################################
+#
+#    Configuration
+#
+######################################################
+
+def test_pokeapi_url_is_configurable():
+    """Test that POKEAPI_URL points both PokeAPI clients at another server."""
+    code = (
+        "from app.models import poke_model; from app.services import pokeapi_service; "
+        "print(poke_model.BASE_POKE_URL); print(pokeapi_service.POKEAPI_BASE_URL)"
+    )
+    env = dict(os.environ, POKEAPI_URL="http://127.0.0.1:8000/api/v2/", POKEAPI_CACHE_PATH="")
+    output = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ).stdout.split()
+
+    assert output == ["http://127.0.0.1:8000/api/v2/", "http://127.0.0.1:8000/api/v2/pokemon"]
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+import requests
+
+from app.utils import http_client
+from tools.fake_pokeapi import FakePokeAPI
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture(autouse=True)
+def fresh_session(mocker):
+    """Start every test without a process-wide session and with no backoff sleeps."""
+    mocker.patch.object(http_client, "POKEAPI_BACKOFF", 0)
+    mocker.patch.object(http_client, "POKEAPI_BACKOFF_JITTER", 0)
+    http_client.set_session(None)
+    yield
+    http_client.set_session(None)
+
+@pytest.fixture
+def fake_api():
+    with FakePokeAPI({"/api/v2/pokemon/ditto": {'id': 132, 'name': 'ditto'}}) as fake:
+        yield fake
+
+
+######################################################
+#
+#    Tests
+#
+######################################################
+
+def test_session_is_reused_within_a_process():
+    """Test that every call in a process shares one pooled session."""
+    assert http_client.get_session() is http_client.get_session()
+
+def test_session_is_rebuilt_after_fork(mocker):
+    """Test that a forked child does not reuse its parent's connection pool."""
+    parent = http_client.get_session()
+    mocker.patch("os.getpid", return_value=os.getpid() + 1)
+    assert http_client.get_session() is not parent
+
+def test_session_pool_and_retry_configuration():
+    """Test the adapter's pool size, retry policy and accepted encodings."""
+    session = http_client.build_session(pool_size=7, retries=2)
+    adapter = session.get_adapter("https://pokeapi.co")
+
+    assert adapter._pool_maxsize == 7
+    assert adapter.max_retries.total == 2
+    assert 503 in adapter.max_retries.status_forcelist
+    assert "gzip" in session.headers['Accept-Encoding']
+
+def test_get_applies_default_timeouts(mocker):
+    """Test that calls without an explicit timeout get the configured one."""
+    session = mocker.Mock()
+    http_client.set_session(session)
+
+    http_client.get("https://pokeapi.co/api/v2/pokemon/ditto")
+
+    session.get.assert_called_once_with(
+        "https://pokeapi.co/api/v2/pokemon/ditto",
+        timeout=(http_client.POKEAPI_CONNECT_TIMEOUT, http_client.POKEAPI_READ_TIMEOUT)
+    )
+
+def test_get_retries_server_errors(fake_api):
+    """Test that 5xx answers are retried until upstream recovers."""
+    fake_api.script("/api/v2/pokemon/ditto", 503, 502)
+
+    response = http_client.get(fake_api.url + "/api/v2/pokemon/ditto")
+
+    assert response.status_code == 200
+    assert response.json()['name'] == "ditto"
+    assert fake_api.hits["/api/v2/pokemon/ditto"] == 3
+
+def test_get_does_not_retry_not_found(fake_api):
+    """Test that a 404 is returned immediately."""
+    response = http_client.get(fake_api.url + "/api/v2/pokemon/missingno")
+
+    assert response.status_code == 404
+    assert fake_api.hits["/api/v2/pokemon/missingno"] == 1
+
+def test_get_raises_when_upstream_is_unreachable(fake_api):
+    """Test that connection errors surface after the retries are spent."""
+    url = fake_api.url
+    fake_api.stop()
+
+    with pytest.raises(requests.ConnectionError):
+        http_client.get(url + "/api/v2/pokemon/ditto", timeout=1)
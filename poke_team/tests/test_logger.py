@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import threading
+
+from app.utils.logger import (
+    AsyncHandler,
+    JsonFormatter,
+    RateLimitedLog,
+    configure_logger,
+    get_handler,
+    level_for,
+    parse_levels,
+)
+
+
+def record(msg, *args, level=logging.INFO, name="app.test"):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+######################################################
+#
+#    Setup
+#
+######################################################
+
+def test_configure_logger_is_idempotent():
+    """Test that configuring a logger twice attaches the shared handler once."""
+    logger = logging.getLogger("app.test_idempotent")
+    configure_logger(logger)
+    configure_logger(logger)
+
+    assert logger.handlers == [get_handler()]
+
+def test_levels_per_module():
+    """Test that the longest matching LOG_LEVELS prefix decides a logger's level."""
+    overrides = parse_levels("app.utils=WARNING, app.utils.db_utils=DEBUG,bogus")
+
+    assert level_for("app.utils.db_utils", "INFO", overrides) == logging.DEBUG
+    assert level_for("app.utils.http_client", "INFO", overrides) == logging.WARNING
+    assert level_for("app.utilsx", "INFO", overrides) == logging.INFO
+    assert level_for("app.models.poke_model", "ERROR", overrides) == logging.ERROR
+
+def test_json_formatter():
+    """Test that JSON output is one parseable object per record."""
+    line = JsonFormatter().format(record("caught %s", "ditto"))
+
+    entry = json.loads(line)
+    assert entry['message'] == "caught ditto"
+    assert entry['level'] == "INFO"
+    assert entry['logger'] == "app.test"
+
+
+######################################################
+#
+#    Queue
+#
+######################################################
+
+def test_records_are_written_by_the_listener(capsys):
+    """Test that queued records reach stderr once the listener drains them."""
+    handler = AsyncHandler()
+    handler.handle(record("caught %s", "ditto"))
+    handler.flush()
+
+    assert "app.test - INFO - caught ditto" in capsys.readouterr().err
+
+def test_arguments_are_captured_when_logged(capsys):
+    """Test that mutating an argument after logging does not change the message."""
+    handler = AsyncHandler()
+    moves = ["tackle"]
+    handler.handle(record("moves %s", moves))
+    moves.append("growl")
+    handler.flush()
+
+    assert "moves ['tackle']" in capsys.readouterr().err
+
+def test_full_queue_drops_instead_of_blocking():
+    """Test that a stalled writer never blocks the logging thread."""
+    release = threading.Event()
+
+    class StalledFormatter(logging.Formatter):
+        def format(self, record):
+            release.wait(5)
+            return super().format(record)
+
+    handler = AsyncHandler(maxsize=1, formatter=StalledFormatter())
+    handler.handle(record("first"))  # taken by the listener, which stalls on it
+    while not handler.queue.empty():
+        pass
+    handler.handle(record("second"))  # fills the queue
+    handler.handle(record("third"))  # dropped
+
+    assert handler.dropped == 1
+    release.set()
+    handler.flush()
+
+def test_listener_restarts_after_fork(mocker, capsys):
+    """Test that a forked worker gets its own listener thread."""
+    handler = AsyncHandler()
+    handler.handle(record("parent"))
+    parent_listener = handler._listener
+
+    mocker.patch("os.getpid", return_value=os.getpid() + 1)
+    handler.handle(record("child"))
+
+    assert handler._listener is not parent_listener
+    handler.flush()
+    assert "child" in capsys.readouterr().err
+
+
+######################################################
+#
+#    Sampling
+#
+######################################################
+
+def test_rate_limited_log(caplog, clock):
+    """Test that per-query messages are sampled and report what was suppressed."""
+    logger = logging.getLogger("app.test_sampled")
+    logger.setLevel(logging.DEBUG)
+    sampled = RateLimitedLog(logger, per_second=1, clock=clock)
+
+    with caplog.at_level(logging.DEBUG, logger="app.test_sampled"):
+        for _ in range(5):
+            sampled.debug("released %s", "conn")
+        clock.now += 1
+        sampled.debug("released %s", "conn")
+
+    assert [r.getMessage() for r in caplog.records] == [
+        "released conn",
+        "released conn (4 similar messages suppressed)",
+    ]
+
+def test_rate_limited_log_skips_disabled_levels(caplog):
+    """Test that nothing is counted or formatted below the logger's level."""
+    logger = logging.getLogger("app.test_sampled_quiet")
+    logger.setLevel(logging.INFO)
+    sampled = RateLimitedLog(logger, per_second=1)
+
+    sampled.debug("released")
+
+    assert sampled._suppressed == 0
+    assert caplog.records == []
@@ -0,0 +1,196 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from app.utils.metrics import Registry, registry
+import wsgi
+
+
+def sample_lines(text):
+    return [line for line in text.splitlines() if not line.startswith("#")]
+
+
+@pytest.fixture
+def local_registry(tmp_path):
+    """A registry of its own, sharing snapshots through a temporary directory."""
+    return Registry(directory=str(tmp_path), flush_interval=60)
+
+
+######################################################
+#
+#    Metric types
+#
+######################################################
+
+def test_counter_exposition(local_registry):
+    """Test that counters are rendered with _total, their labels and HELP/TYPE lines."""
+    counter = local_registry.counter("widgets", "Widgets made.", ("color",))
+    counter.inc(color="red")
+    counter.inc(2, color="red")
+    counter.inc(color='say "hi"')
+
+    text = local_registry.render()
+
+    assert "# HELP widgets Widgets made." in text
+    assert "# TYPE widgets counter" in text
+    assert 'widgets_total{color="red"} 3' in text
+    assert 'widgets_total{color="say \\"hi\\""} 1' in text
+
+def test_histogram_buckets_are_cumulative(local_registry):
+    """Test that histogram buckets count every observation up to their bound."""
+    histogram = local_registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value)
+
+    lines = sample_lines(local_registry.render())
+
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_count 4" in lines
+    assert "latency_seconds_sum 6.05" in lines
+
+def test_registering_twice_returns_the_same_metric(local_registry):
+    """Test that modules asking for the same metric name share it."""
+    assert local_registry.counter("hits", "Hits.") is local_registry.counter("hits", "Hits.")
+
+def test_failing_collector_is_skipped(local_registry):
+    """Test that a collector raising does not break the exposition."""
+    def broken():
+        raise RuntimeError("boom")
+
+    def working():
+        yield "queue_depth", "gauge", "Depth.", {}, 3
+
+    local_registry.register_collector(broken)
+    local_registry.register_collector(working)
+
+    assert "queue_depth 3" in sample_lines(local_registry.render())
+
+######################################################
+#
+#    Across processes
+#
+######################################################
+
+def _child(local_registry):
+    local_registry.counter("jobs", "Jobs.").inc(5)
+    local_registry.flush()
+
+def test_counters_add_up_across_processes(local_registry):
+    """Test that a forked worker starts from zero and its counts are merged into the parent's."""
+    jobs = local_registry.counter("jobs", "Jobs.")
+    jobs.inc(2)
+    local_registry.register_collector(lambda: [("workers_busy", "gauge", "Busy.", {}, 1)])
+
+    child = multiprocessing.get_context("fork").Process(target=_child, args=(local_registry,))
+    child.start()
+    child.join()
+
+    lines = sample_lines(local_registry.render())
+    assert "jobs_total 7" in lines
+    # The child has exited: its counters are kept, its gauges are not
+    assert "workers_busy 1" in lines
+
+def _child_collects(local_registry, hits):
+    hits['count'] += 2
+    local_registry.flush()
+
+def test_collected_counters_are_not_counted_twice_after_fork(local_registry):
+    """Test that a forked worker reports only what a collected counter added after the fork."""
+    hits = {'count': 3}
+    local_registry.register_collector(lambda: [("cache_hits", "counter", "Hits.", {}, hits['count'])])
+
+    child = multiprocessing.get_context("fork").Process(target=_child_collects, args=(local_registry, hits))
+    child.start()
+    child.join()
+
+    assert "cache_hits_total 5" in sample_lines(local_registry.render())
+
+def test_exited_processes_are_folded_into_one_file(local_registry, tmp_path):
+    """Test that the snapshots of exited workers are merged into one file that keeps their counters."""
+    local_registry.counter("jobs", "Jobs.")
+    for _ in range(3):
+        child = multiprocessing.get_context("fork").Process(target=_child, args=(local_registry,))
+        child.start()
+        child.join()
+        local_registry.fold_exited(child.pid)
+
+    assert os.listdir(tmp_path) == ["metrics_exited.json"]
+    assert "jobs_total 15" in sample_lines(local_registry.render())
+
+def test_only_serving_processes_write_snapshots(tmp_path):
+    """Test that a process writes its snapshot only once it serves, e.g. not a CLI."""
+    local = Registry(directory=str(tmp_path), flush_interval=0.01)
+    local.counter("jobs", "Jobs.").inc()
+    time.sleep(0.1)
+    assert os.listdir(tmp_path) == []
+
+    local.serve()
+    time.sleep(0.1)
+    local.close()
+
+    assert len(os.listdir(tmp_path)) == 1
+
+def test_gauges_of_live_processes_are_summed(local_registry, tmp_path):
+    """Test that gauges from another live process's snapshot are added to this one's."""
+    other = Registry(directory=str(tmp_path), flush_interval=60)
+    other.register_collector(lambda: [("workers_busy", "gauge", "Busy.", {}, 2)])
+    other.flush()
+    local_registry.register_collector(lambda: [("workers_busy", "gauge", "Busy.", {}, 1)])
+
+    assert "workers_busy 3" in sample_lines(local_registry.render())
+
+def test_reset_directory(local_registry, tmp_path):
+    """Test that snapshots of a previous run are removed."""
+    local_registry.counter("jobs", "Jobs.").inc()
+    local_registry.flush()
+    assert os.listdir(tmp_path)
+
+    local_registry.reset_directory()
+
+    assert os.listdir(tmp_path) == []
+
+def test_unwritable_directory_falls_back_to_this_process(tmp_path):
+    """Test that a directory that cannot be written disables sharing instead of failing."""
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    local = Registry(directory=str(blocker / "metrics"), flush_interval=60)
+    local.counter("jobs", "Jobs.").inc()
+
+    local.flush()
+
+    assert local.directory is None
+    assert "jobs_total 1" in sample_lines(local.render())
+
+######################################################
+#
+#    Route
+#
+######################################################
+
+def test_metrics_route_counts_requests(sqlite_db):
+    """Test that /api/metrics reports requests by route template and status."""
+    client = wsgi.app.test_client()
+    client.get('/api/health')
+    client.get('/api/get-pokemon-by-id/12345')
+    client.get('/api/no-such-route')
+
+    response = client.get('/api/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert 'http_requests_total{route="/api/health",method="GET",status="200"}' in text
+    assert 'http_requests_total{route="/api/get-pokemon-by-id/<int:id>",method="GET",status="500"}' in text
+    assert 'http_requests_total{route="unmatched",method="GET",status="404"}' in text
+    assert 'http_request_duration_seconds_bucket{route="/api/health",method="GET",le="+Inf"}' in text
+    assert 'db_operations_total{mode="read",outcome="ok"}' in text
+    assert "pokemon_cache_misses_total" in text
+    assert "bcrypt_queue_depth" in text
+
+def test_process_registry_uses_test_directory(metrics_dir):
+    """Test that the test run writes its snapshots to a temporary directory."""
+    assert registry.directory == metrics_dir
@@ -0,0 +1,183 @@
+import sqlite3
+
+import pytest
+
+from app.utils import migrations
+from app.utils.migrations import MIGRATIONS, main, migrate
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE pokemon (
+    id INTEGER PRIMARY KEY,
+    game_id INTEGER,
+    name TEXT,
+    ability TEXT,
+    total_effort INTEGER
+);
+
+CREATE TABLE learned_moves (
+    pokemon_id INTEGER,
+    move TEXT,
+    FOREIGN KEY (pokemon_id) REFERENCES pokemon(id)
+);
+
+CREATE TABLE stats (
+    pokemon_id INTEGER,
+    hp_base INTEGER, hp_effort INTEGER,
+    attack_base INTEGER, attack_effort INTEGER,
+    defense_base INTEGER, defense_effort INTEGER,
+    special_attack_base INTEGER, special_attack_effort INTEGER,
+    special_defense_base INTEGER, special_defense_effort INTEGER,
+    speed_base INTEGER, speed_effort INTEGER,
+    FOREIGN KEY (pokemon_id) REFERENCES pokemon(id)
+);
+"""
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def query_plan(db_path, sql, params):
+    conn = sqlite3.connect(db_path)
+    plan = " | ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+    conn.close()
+    return plan
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """A database created by the pre-migration create_poke_table.sql, with data."""
+    db_path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.execute("INSERT INTO pokemon VALUES (0, 132, 'ditto', 'limber', 0)")
+    conn.execute("INSERT INTO pokemon VALUES (1, 25, 'pikachu', 'static', 0)")
+    conn.executemany("INSERT INTO learned_moves VALUES (?, ?)", [
+        (1, 'thunderbolt'), (1, 'tail-whip'), (1, 'thunderbolt'), (0, 'transform')
+    ])
+    conn.executemany("INSERT INTO stats VALUES (?, ?, 0, ?, 0, 48, 0, 48, 0, 48, 0, 48, 0)", [
+        (0, 48, 48), (1, 35, 55), (1, 35, 60)
+    ])
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+######################################################
+#
+#    Tests
+#
+######################################################
+
+def test_migrate_keeps_data(legacy_db):
+    """Test that migrating a legacy database keeps every row, collapsing duplicates."""
+    assert migrate(legacy_db) == LATEST
+
+    conn = sqlite3.connect(legacy_db)
+    moves = conn.execute("SELECT pokemon_id, move FROM learned_moves ORDER BY rowid").fetchall()
+    assert moves == [(1, 'thunderbolt'), (1, 'tail-whip'), (0, 'transform')]
+    stats = conn.execute("SELECT pokemon_id, hp_base, attack_base FROM stats ORDER BY pokemon_id").fetchall()
+    assert stats == [(0, 48, 48), (1, 35, 60)]
+    assert conn.execute("SELECT COUNT(*) FROM pokemon").fetchone()[0] == 2
+    # Ids continue after the highest stored one
+    assert conn.execute("SELECT value FROM pokemon_sequence WHERE name = 'next_id'").fetchone()[0] == 2
+    # A change takes a version no pokemon has had
+    conn.execute("UPDATE pokemon SET ability = 'imposter' WHERE id = 0")
+    assert conn.execute("SELECT version FROM pokemon ORDER BY id").fetchall() == [(1,), (0,)]
+    conn.close()
+
+def test_migrate_adds_keys(legacy_db):
+    """Test that the new keys reject duplicate moves and duplicate stats rows."""
+    migrate(legacy_db)
+
+    conn = sqlite3.connect(legacy_db)
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO learned_moves (pokemon_id, move) VALUES (1, 'tail-whip')")
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO stats (pokemon_id) VALUES (1)")
+    conn.close()
+
+def test_query_plans_use_indexes(legacy_db):
+    """Test that per-pokemon lookups go from full scans to index searches."""
+    lookups = [
+        ("SELECT move FROM learned_moves WHERE pokemon_id = ?", (1,)),
+        ("DELETE FROM learned_moves WHERE pokemon_id = ? AND move = ?", (1, 'tail-whip')),
+        ("SELECT hp_base FROM stats WHERE pokemon_id = ?", (1,)),
+        ("UPDATE stats SET hp_effort = 4 WHERE pokemon_id = ?", (1,)),
+    ]
+
+    before = [query_plan(legacy_db, sql, params) for sql, params in lookups]
+    assert all(plan.startswith("SCAN") for plan in before), before
+
+    migrate(legacy_db)
+
+    after = [query_plan(legacy_db, sql, params) for sql, params in lookups]
+    assert all(plan.startswith("SEARCH") for plan in after), after
+
+def test_migrate_is_idempotent(legacy_db):
+    """Test that a second run applies nothing and records each version once."""
+    migrate(legacy_db)
+    assert migrate(legacy_db) == LATEST
+
+    conn = sqlite3.connect(legacy_db)
+    versions = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+    assert versions == [version for version, _, _ in MIGRATIONS]
+    conn.close()
+
+def test_migrate_to_target(legacy_db):
+    """Test stopping at an intermediate version."""
+    assert migrate(legacy_db, target=1) == 1
+    assert query_plan(legacy_db, "SELECT move FROM learned_moves WHERE pokemon_id = ?", (1,)).startswith("SCAN")
+
+def test_migrate_fresh_database(tmp_path, capsys):
+    """Test that an empty file is brought to the latest schema through the CLI."""
+    db_path = str(tmp_path / "fresh.db")
+    assert main(["--db-path", db_path]) == 0
+    assert capsys.readouterr().out.strip() == f"schema version {LATEST}"
+
+def test_migrate_skips_database_created_from_sql_files(sqlite_db, monkeypatch):
+    """Test that a database created and stamped from the current sql files gets no migration."""
+    def rebuild(cursor):
+        raise AssertionError("migration re-run on the latest schema")
+    monkeypatch.setattr(migrations, "MIGRATIONS", [(version, description, rebuild) for version, description, _ in MIGRATIONS])
+
+    assert migrate(sqlite_db) == LATEST
+
+def test_stamp_through_the_cli(tmp_path, capsys):
+    """Test that --stamp records the latest version, as create_db.sh does, and is idempotent."""
+    db_path = str(tmp_path / "created.db")
+    assert main(["--db-path", db_path, "--stamp"]) == 0
+    assert main(["--db-path", db_path, "--stamp"]) == 0
+
+    assert capsys.readouterr().out.split() == ["schema", "version", str(LATEST)] * 2
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(MIGRATIONS)
+    conn.close()
+
+def test_migrate_moves_team_members_out_of_json(legacy_db):
+    """Test that teams of the former JSON column become one team_members row per member."""
+    conn = sqlite3.connect(legacy_db)
+    conn.execute("CREATE TABLE team (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, name VARCHAR(80) NOT NULL, pokemon_ids JSON NOT NULL)")
+    conn.executemany("INSERT INTO team VALUES (?, ?, ?, ?)", [
+        (3, 1, 'electric', '[1, 0]'), (4, 2, 'empty', '[]'), (5, 2, 'broken', 'not json')
+    ])
+    conn.commit()
+    conn.close()
+
+    migrate(legacy_db)
+
+    conn = sqlite3.connect(legacy_db)
+    assert conn.execute("SELECT id, user_id, name FROM teams ORDER BY id").fetchall() == [
+        (3, 1, 'electric'), (4, 2, 'empty'), (5, 2, 'broken')
+    ]
+    assert conn.execute("SELECT team_id, slot, pokemon_id FROM team_members ORDER BY team_id, slot").fetchall() == [
+        (3, 0, 1), (3, 1, 0)
+    ]
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'team'").fetchone() is None
+    conn.close()
+    assert query_plan(legacy_db, "SELECT team_id FROM team_members WHERE pokemon_id = ?", (1,)).startswith("SEARCH")
@@ -0,0 +1,81 @@
+import threading
+
+import bcrypt
+import pytest
+
+from app.utils.password_hasher import HasherBusyError, PasswordHasher, hash_rounds
+
+
+def test_pool_hashes_and_checks():
+    """Test a round trip through the hashing processes."""
+    hasher = PasswordHasher(workers=1, rounds=4)
+    try:
+        hashed = hasher.hash("hehehe")
+
+        assert hash_rounds(hashed) == 4
+        assert hasher.check("hehehe", hashed) is True
+        assert hasher.check("wrong", hashed) is False
+    finally:
+        hasher.shutdown()
+
+def _metrics_directory():
+    from app.utils.metrics import registry
+    return registry.directory
+
+def test_hashing_processes_write_no_metrics():
+    """Test that hashing processes have no snapshot directory, so they never leave a file behind."""
+    hasher = PasswordHasher(workers=1, rounds=4)
+    try:
+        assert hasher._executor().submit(_metrics_directory).result(timeout=60) is None
+    finally:
+        hasher.shutdown()
+
+def test_inline_hashing_matches_bcrypt():
+    """Test that workers=0 hashes on the calling thread with the configured cost."""
+    hasher = PasswordHasher(workers=0, rounds=5)
+
+    hashed = hasher.hash("hehehe")
+
+    assert bcrypt.checkpw(b"hehehe", hashed)
+    assert not hasher.needs_rehash(hashed)
+    assert hasher.needs_rehash(bcrypt.hashpw(b"hehehe", bcrypt.gensalt(4)))
+
+def test_hash_rounds():
+    """Test reading the work factor out of a stored hash."""
+    assert hash_rounds(b"$2b$12$" + b"a" * 53) == 12
+    assert hash_rounds("$2b$04$" + "a" * 53) == 4
+    assert hash_rounds(b"not a hash") is None
+
+def test_full_queue_rejects_after_timeout():
+    """Test that callers beyond the queue size give up instead of piling up."""
+    hasher = PasswordHasher(workers=0, queue_size=1, queue_timeout=0.05, rounds=4)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    worker = threading.Thread(target=hasher._run, args=(slow,))
+    worker.start()
+    started.wait(5)
+    try:
+        assert hasher.stats()['queue_depth'] == 1
+        with pytest.raises(HasherBusyError):
+            hasher.hash("hehehe")
+    finally:
+        release.set()
+        worker.join()
+
+    assert hasher.stats()['queue_depth'] == 0
+    assert hasher.stats()['rejected'] == 1
+
+def test_stats_latency_histogram():
+    """Test that every hash is counted in the cumulative latency buckets."""
+    hasher = PasswordHasher(workers=0, rounds=4)
+    hasher.check("hehehe", hasher.hash("hehehe"))
+
+    latency = hasher.stats()['latency_seconds']
+    assert latency['count'] == 2
+    assert latency['buckets']['+Inf'] == 2
+    assert latency['buckets']['10'] == 2
+    assert 0 < latency['sum'] <= 2 * latency['max']
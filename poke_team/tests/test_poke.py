@@ -1,10 +1,17 @@
 from contextlib import contextmanager
+import multiprocessing
+import os
 import re
 import sqlite3
 
+import numpy as np
 import pytest
 
+from app.models import poke_model
 from app.models.poke_model import *
+from app.models.team_model import create_team, get_team, get_teams_with_pokemon
+from app.utils.db_utils import get_db_connection
+from app.utils.cache_utils import LRUCache, ObjectCache, TwoTierCache
 from unittest.mock import Mock
 
 pokemon = Pokemon(
@@ -47,7 +54,7 @@ def mock_cursor(mocker):
 
     # Mock the get_db_connection context manager from sql_utils
     @contextmanager
-    def mock_get_db_connection():
+    def mock_get_db_connection(*args, **kwargs):
         yield mock_conn  # Yield the mocked connection object
 
     mocker.patch("app.models.poke_model.get_db_connection", mock_get_db_connection)
@@ -55,10 +62,26 @@ def mock_cursor(mocker):
     return mock_cursor  # Return the mock cursor so we can set expectations per test
 
 
+@pytest.fixture(autouse=True)
+def response_cache(mocker):
+    """Give every test an empty, memory-only PokeAPI response cache."""
+    cache = TwoTierCache(LRUCache(max_entries=16))
+    mocker.patch("app.utils.api_utils.response_cache", cache)
+    return cache
+
+@pytest.fixture(autouse=True)
+def pokemon_cache(mocker):
+    """Give every test an empty Pokemon cache."""
+    cache = ObjectCache(max_bytes=1024 * 1024, sizeof=lambda pokemon: 1)
+    mocker.patch("app.models.poke_model.pokemon_cache", cache)
+    return cache
+
 @pytest.fixture
 def mock_requests(mocker):
-    """Mock the requests.get call."""
-    return mocker.patch('requests.get')
+    """Mock the pooled HTTP client's get call."""
+    mock = mocker.patch('app.utils.http_client.get')
+    mock.return_value.status_code = 200
+    return mock
 
 @pytest.fixture
 def mock_get_pokemon_by_id(mocker):
@@ -135,16 +158,11 @@ def test_create_pokemon_by_object(mock_cursor):
 def test_get_pokemon_by_id(mock_cursor):
     """Test retrieving a Pokémon by its ID."""
 
-    # Setup mock data returned by the cursor
-    mock_cursor.fetchone.side_effect = [
-        # First call (pokemon table)
-        (1, 132, "ditto", "limber", 0),
-        # Third call (stats table)
-        (48, 0, 48, 0, 48, 0, 48, 0, 48, 0, 48, 0),
-    ]
-    mock_cursor.fetchall.side_effect = [
-        # Second call (learned_moves table)
-        [("transform",)],
+    # Setup mock data returned by the cursor: one joined row per Pokémon
+    mock_cursor.fetchall.return_value = [
+        (1, 132, "ditto", "limber", 0,
+         48, 0, 48, 0, 48, 0, 48, 0, 48, 0, 48, 0,
+         '["transform"]', 0),
     ]
 
     # Call the function to retrieve the Pokémon
@@ -171,49 +189,21 @@ def test_get_pokemon_by_id(mock_cursor):
     # Assert that the returned Pokémon matches the expected object
     assert pokemon == expected_pokemon, f"Expected {expected_pokemon}, but got {pokemon}."
 
-    # Verify the SQL queries were executed in the correct sequence
-    expected_queries = [
-        normalize_whitespace("""
-            SELECT id, game_id, name, ability, total_effort
-            FROM pokemon WHERE id = ?
-        """),
-        normalize_whitespace("""
-            SELECT move FROM learned_moves WHERE pokemon_id = ?
-        """),
-        normalize_whitespace("""
-            SELECT 
-                hp_base, hp_effort,
-                attack_base, attack_effort,
-                defense_base, defense_effort,
-                special_attack_base, special_attack_effort,
-                special_defense_base, special_defense_effort,
-                speed_base, speed_effort
-            FROM stats WHERE pokemon_id = ?
-        """)
-    ]
-
+    # Verify that pokemon, stats and moves were loaded with a single query
     actual_queries = [normalize_whitespace(call[0][0]) for call in mock_cursor.execute.call_args_list]
-    assert actual_queries == expected_queries, (
-        f"Expected SQL queries {expected_queries}, but got {actual_queries}."
+    assert actual_queries == [normalize_whitespace(HYDRATE_QUERY)], (
+        f"Expected a single hydration query, but got {actual_queries}."
     )
 
-    # Verify arguments for the queries
-    expected_arguments = [
-        (1,),  # Argument for the Pokémon retrieval
-        (1,),  # Argument for the learned_moves retrieval
-        (1,),  # Argument for the stats retrieval
-    ]
-
+    # Verify the ids are passed as one JSON array
     actual_arguments = [call[0][1] for call in mock_cursor.execute.call_args_list]
-    assert actual_arguments == expected_arguments, (
-        f"Expected SQL query arguments {expected_arguments}, but got {actual_arguments}."
-    )
+    assert actual_arguments == [("[1]",)], f"Expected SQL query arguments [('[1]',)], but got {actual_arguments}."
 
 def test_get_pokemon_by_invalid_id(mock_cursor):
     """Test retrieving a Pokémon with an invalid ID."""
 
     # Setup mock to simulate no Pokémon found
-    mock_cursor.fetchone.return_value = None  # No data returned for the Pokémon query
+    mock_cursor.fetchall.return_value = []  # No data returned for the Pokémon query
 
     # Call the function and verify it raises a ValueError
     invalid_id = 999  # Example of an invalid Pokémon ID
@@ -221,16 +211,12 @@ def test_get_pokemon_by_invalid_id(mock_cursor):
         get_pokemon_by_id(invalid_id)
 
     # Verify the query executed
-    expected_query = normalize_whitespace("""
-        SELECT id, game_id, name, ability, total_effort
-        FROM pokemon WHERE id = ?
-    """)
     actual_query = normalize_whitespace(mock_cursor.execute.call_args[0][0])
-    assert actual_query == expected_query, "The SQL query for Pokémon retrieval did not match the expected structure."
+    assert actual_query == normalize_whitespace(HYDRATE_QUERY), "The SQL query for Pokémon retrieval did not match the expected structure."
 
     # Verify the argument passed to the query
     actual_argument = mock_cursor.execute.call_args[0][1]
-    assert actual_argument == (invalid_id,), f"Expected argument {(invalid_id,)}, but got {actual_argument}."
+    assert actual_argument == ("[999]",), f"Expected argument ('[999]',), but got {actual_argument}."
 
 def test_add_move_to_pokemon_successful(mock_cursor, mock_requests, mock_get_pokemon_by_id):
     # Set up the mock responses for the requests and get_pokemon_by_id
@@ -241,6 +227,7 @@ def test_add_move_to_pokemon_successful(mock_cursor, mock_requests, mock_get_pok
     
     # Set up mock response for requests.get
     mock_response = Mock()
+    mock_response.status_code = 200
     mock_response.json.return_value = {'moves': [{'move': {'name': 'transform'}}, {'move': {'name': 'growl'}}]}
     mock_requests.return_value = mock_response
     
@@ -331,6 +318,7 @@ def test_add_move_to_pokemon_four_moves(mock_cursor, mock_requests, mock_get_pok
     )
 
     mock_response = Mock()
+    mock_response.status_code = 200
     mock_get_pokemon_by_id.return_value = mock_pokemon
     mock_response.json.return_value = {
         "moves": [{"move": {"name": "quick-attack"}}, {"move": {"name": "tail-whip"}}, {"move": {"name": "thunderbolt"}}]
@@ -475,3 +463,369 @@ def test_distribute_effort_values_with_caps(mock_cursor, mock_get_pokemon_by_id)
     assert actual_arguments == expected_arguments, (
         f"Expected arguments {expected_arguments}, got {actual_arguments}."
     )
+
+def test_add_move_to_pokemon_uses_cached_species(mock_cursor, mock_requests, mock_get_pokemon_by_id):
+    """Test that adding moves to the same species only downloads it once."""
+
+    mock_get_pokemon_by_id.side_effect = lambda _: Pokemon(
+        id=1,
+        game_id=25,
+        name="pikachu",
+        ability="static",
+        learned_moves=[],
+        stats=Stats([35, 0], [55, 0], [40, 0], [50, 0], [50, 0], [90, 0]),
+        total_effort=0
+    )
+    mock_requests.return_value.json.return_value = {
+        "moves": [{"move": {"name": "thunderbolt"}}, {"move": {"name": "tail-whip"}}]
+    }
+
+    add_move_to_pokemon(1, "thunderbolt")
+    add_move_to_pokemon(1, "tail-whip")
+
+    assert mock_requests.call_count == 1
+
+def species_response(url):
+    """Build a mocked PokeAPI answer for a /pokemon/<name> url."""
+    name = url.rstrip('/').rsplit('/', 1)[-1]
+    response = Mock()
+    if name == "missingno":
+        response.status_code = 404
+        return response
+    response.status_code = 200
+    response.json.return_value = {
+        'id': {'ditto': 132, 'pikachu': 25}[name],
+        'name': name,
+        'stats': [{'base_stat': 48, 'stat': {'name': 'hp'}}, {'base_stat': 90, 'stat': {'name': 'speed'}}],
+        'moves': [],
+    }
+    return response
+
+def test_create_pokemon_batch(mock_cursor, mock_requests, mocker):
+    """Test creating a roster in one transaction with one fetch per distinct species."""
+    mock_cursor.fetchone.return_value = (10,)  # next free id
+    mock_requests.side_effect = species_response
+
+    results = create_pokemon_batch(["ditto", "pikachu", "ditto", "missingno"])
+
+    assert results == [
+        {'name': 'ditto', 'pokemon_id': 10},
+        {'name': 'pikachu', 'pokemon_id': 11},
+        {'name': 'ditto', 'pokemon_id': 12},
+        {'name': 'missingno', 'error': 'This pokemon does not exist'},
+    ]
+    assert mock_requests.call_count == 3
+
+    # Ids are allocated once for the whole batch, under the write lock
+    actual_queries = [normalize_whitespace(call[0][0]) for call in mock_cursor.execute.call_args_list]
+    assert actual_queries == ["BEGIN IMMEDIATE", "SELECT value FROM pokemon_sequence WHERE name = 'next_id'"]
+
+    # Every row is written with executemany, never row by row
+    pokemon_rows = mock_cursor.executemany.call_args_list[0][0][1]
+    assert pokemon_rows == [(10, 132, 'ditto', '', 0), (11, 25, 'pikachu', '', 0), (12, 132, 'ditto', '', 0)]
+    stats_rows = mock_cursor.executemany.call_args_list[2][0][1]
+    assert stats_rows[1] == (11, 48, 0, 0, 0, 0, 0, 0, 0, 0, 0, 90, 0)
+
+def test_create_pokemon_batch_persists(sqlite_db, mock_requests):
+    """Test that a batch lands in a real database and reads back."""
+    mock_requests.side_effect = species_response
+
+    results = create_pokemon_batch(["pikachu", "ditto"])
+
+    ids = [result['pokemon_id'] for result in results]
+    assert [get_pokemon_by_id(i).name for i in ids] == ["pikachu", "ditto"]
+    assert get_pokemon_by_id(ids[0]).stats.speed == [90, 0]
+
+def test_get_pokemon_by_ids_constant_queries(sqlite_db, mock_requests, count_queries):
+    """Test that the number of queries does not grow with the number of Pokémon loaded."""
+    mock_requests.side_effect = species_response
+    ids = [result['pokemon_id'] for result in create_pokemon_batch(["ditto", "pikachu"] * 50)]
+    for pokemon_id in ids[:10]:
+        with get_db_connection() as conn:
+            conn.execute("INSERT INTO learned_moves (pokemon_id, move) VALUES (?, 'tackle')", (pokemon_id,))
+            conn.commit()
+
+    queries = {n: count_queries(lambda: get_pokemon_by_ids(ids[:n]))[1] for n in (1, 6, 100)}
+
+    assert queries == {1: 1, 6: 1, 100: 1}
+
+def test_get_pokemon_by_ids_order_and_missing(sqlite_db, mock_requests):
+    """Test that results follow the requested order and unknown ids are skipped."""
+    mock_requests.side_effect = species_response
+    ditto, pikachu = [result['pokemon_id'] for result in create_pokemon_batch(["ditto", "pikachu"])]
+    with get_db_connection() as conn:
+        conn.executemany("INSERT INTO learned_moves (pokemon_id, move) VALUES (?, ?)",
+                         [(pikachu, "thunderbolt"), (pikachu, "agility")])
+        conn.commit()
+
+    pokemons = get_pokemon_by_ids([pikachu, 999, ditto])
+
+    assert [p.name for p in pokemons] == ["pikachu", "ditto"]
+    assert pokemons[0].learned_moves == ["thunderbolt", "agility"]
+    assert pokemons[1].learned_moves == []
+
+def test_get_pokemon_by_id_served_from_cache(sqlite_db, mock_requests, pokemon_cache):
+    """Test that a repeated read costs one version probe instead of a hydration."""
+    mock_requests.side_effect = species_response
+    [result] = create_pokemon_batch(["pikachu"])
+    pokemon_id = result['pokemon_id']
+    get_pokemon_by_id(pokemon_id)
+
+    statements = []
+    with get_db_connection(read_only=True) as conn:
+        conn.set_trace_callback(statements.append)
+        cached = get_pokemon_by_id(pokemon_id)
+        conn.set_trace_callback(None)
+
+    assert cached.name == "pikachu"
+    assert len(statements) == 1 and statements[0].startswith("SELECT version FROM pokemon")
+    assert pokemon_cache.hits == 1
+
+def test_get_pokemon_by_id_returns_copies(sqlite_db, mock_requests):
+    """Test that callers mutating a returned Pokemon do not corrupt the cache."""
+    mock_requests.side_effect = species_response
+    [result] = create_pokemon_batch(["ditto"])
+
+    get_pokemon_by_id(result['pokemon_id']).learned_moves.append("tackle")
+
+    assert get_pokemon_by_id(result['pokemon_id']).learned_moves == []
+
+def test_writes_invalidate_cached_pokemon(sqlite_db, mock_requests, pokemon_cache):
+    """Test that moves and effort values written through the model are visible on the next read."""
+    mock_requests.return_value.json.return_value = {
+        'id': 132,
+        'name': 'ditto',
+        'stats': [{'base_stat': 48, 'stat': {'name': 'hp'}}],
+        'moves': [{'move': {'name': 'transform'}}],
+    }
+    [result] = create_pokemon_batch(["ditto"])
+    pokemon_id = result['pokemon_id']
+
+    get_pokemon_by_id(pokemon_id)
+    add_move_to_pokemon(pokemon_id, "transform")
+    assert get_pokemon_by_id(pokemon_id).learned_moves == ["transform"]
+
+    distribute_effort_values(pokemon_id, [10])
+    assert get_pokemon_by_id(pokemon_id).stats.hp == [48, 10]
+
+    remove_move_from_pokemon(pokemon_id, "transform")
+    assert get_pokemon_by_id(pokemon_id).learned_moves == []
+    assert pokemon_cache.invalidations == 3
+
+def test_cache_detects_writes_from_other_processes(sqlite_db, mock_requests, pokemon_cache):
+    """Test that a change made outside this process bumps the row version and is picked up as a miss."""
+    mock_requests.side_effect = species_response
+    [result] = create_pokemon_batch(["ditto"])
+    pokemon_id = result['pokemon_id']
+    assert get_pokemon_by_id(pokemon_id).learned_moves == []
+
+    other = sqlite3.connect(sqlite_db)
+    other.execute("INSERT INTO learned_moves (pokemon_id, move) VALUES (?, 'transform')", (pokemon_id,))
+    other.commit()
+    other.close()
+
+    assert get_pokemon_by_id(pokemon_id).learned_moves == ["transform"]
+    assert (pokemon_cache.hits, pokemon_cache.misses) == (0, 2)
+
+def test_cache_detects_clear_and_recreate_from_other_processes(sqlite_db, mock_requests):
+    """Test that a Pokemon cleared and recreated under the same id by another connection is not served from the cache."""
+    mock_requests.side_effect = species_response
+    pokemon_id = create_pokemon_by_name("pikachu")
+    assert get_pokemon_by_id(pokemon_id).name == "pikachu"
+
+    other = sqlite3.connect(sqlite_db)
+    with open(os.environ["SQL_CREATE_POKE_TABLE_PATH"]) as fh:
+        other.executescript(fh.read())
+    other.execute("INSERT INTO pokemon (id, game_id, name, ability, total_effort) VALUES (?, 1, 'bulbasaur', '', 0)",
+                  (pokemon_id,))
+    other.execute("INSERT INTO stats (pokemon_id) VALUES (?)", (pokemon_id,))
+    other.commit()
+    other.close()
+
+    assert get_pokemon_by_id(pokemon_id).name == "bulbasaur"
+
+def test_clear_poke_empties_cache(sqlite_db, mock_requests, pokemon_cache):
+    """Test that clearing the catalog drops every cached Pokemon."""
+    mock_requests.side_effect = species_response
+    [result] = create_pokemon_batch(["ditto"])
+    get_pokemon_by_id(result['pokemon_id'])
+
+    clear_poke()
+
+    assert len(pokemon_cache) == 0
+    with pytest.raises(ValueError, match="not found"):
+        get_pokemon_by_id(result['pokemon_id'])
+
+def test_ids_continue_after_existing_rows(sqlite_db, mock_requests):
+    """Test that ids come from the database, so a restarted process never reuses one."""
+    mock_requests.side_effect = species_response
+    assert create_pokemon_by_name("ditto") == 0
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO pokemon (id, name) VALUES (41, 'mew')")
+        conn.commit()
+
+    assert create_pokemon_by_name("pikachu") == 42
+    assert [r['pokemon_id'] for r in create_pokemon_batch(["ditto", "pikachu"])] == [43, 44]
+
+def test_ids_are_not_reused_after_clear(sqlite_db, mock_requests):
+    """Test that clearing the catalog neither restarts ids nor leaves teams pointing at new pokemon."""
+    mock_requests.side_effect = species_response
+    first = create_pokemon_by_name("ditto")
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO users (username, hashed_passwd, salt) VALUES ('ash', 'x', 'x')")
+        conn.commit()
+    team_id = create_team("ash", "solo", [first])
+
+    clear_poke()
+
+    assert create_pokemon_by_name("pikachu") == first + 1
+    assert get_team(team_id).members == []
+    assert get_teams_with_pokemon(first) == []
+
+def test_failed_batch_releases_ids(sqlite_db, mock_requests):
+    """Test that pokemon from a rolled back batch do not keep the ids they were given."""
+    mock_requests.side_effect = species_response
+    taken = create_pokemon_by_name("ditto")
+    data = species_response("ditto").json()
+    pokemons = [pokemon_from_species(data), pokemon_from_species(data, taken)]
+
+    with pytest.raises(sqlite3.IntegrityError):
+        create_pokemon_by_objects(pokemons)
+    assert pokemons[0].id is None
+    assert create_pokemon_by_name("pikachu") == taken + 1
+
+def _create_many(db_path, names, queue):
+    from app.utils import db_utils
+    db_utils.DB_PATH = db_path
+    data = species_response("ditto").json()
+    ids = []
+    for name in names:
+        pokemon = pokemon_from_species(data)
+        pokemon.name = name
+        create_pokemon_by_object(pokemon)
+        ids.append(pokemon.id)
+    queue.put(ids)
+
+def test_concurrent_processes_never_collide(sqlite_db):
+    """Test that worker processes creating pokemon at the same time all get distinct ids."""
+    processes, per_process = 6, 25
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    workers = [
+        context.Process(target=_create_many, args=(sqlite_db, [f"p{w}-{i}" for i in range(per_process)], queue))
+        for w in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    ids = [pokemon_id for _ in workers for pokemon_id in queue.get(timeout=60)]
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    assert sorted(ids) == list(range(processes * per_process))
+    with get_db_connection(read_only=True) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM pokemon").fetchone()[0] == processes * per_process
+        assert conn.execute("SELECT COUNT(*) FROM stats").fetchone()[0] == processes * per_process
+
+def test_warm_pokemon_cache(sqlite_db, mock_requests, pokemon_cache):
+    """Test that warming loads the most recent pokemon so the first reads are hits."""
+    mock_requests.side_effect = species_response
+    create_pokemon_batch(["ditto", "pikachu", "ditto"])
+
+    assert warm_pokemon_cache(2) == 2
+    assert get_pokemon_by_id(2).name == "ditto"
+    assert pokemon_cache.stats()['hits'] == 1
+
+######################################################
+#
+#    Batch effort values
+#
+######################################################
+
+def test_clamp_effort_values_matches_single_path():
+    """Test that the vectorized caps give what distribute_effort_values writes, spread by spread."""
+    rng = np.random.default_rng(0)
+    spreads = rng.integers(0, 320, size=(500, 6))
+    spreads[:50] = rng.integers(0, 90, size=(50, 6))  # under every cap
+
+    def single(evs):
+        effort_values, total = [0] * 6, 0
+        for i, ev in enumerate(evs):
+            increase = min(ev, 255)
+            if increase + total > 510:
+                effort_values[i] = 510 - total
+                break
+            effort_values[i] = increase
+            total += increase
+        return effort_values
+
+    assert clamp_effort_values(spreads).tolist() == [single(evs) for evs in spreads.tolist()]
+    assert clamp_effort_values([[300] * 6]).tolist() == [[255, 255, 0, 0, 0, 0]]
+    assert clamp_effort_values([[252, 252, 10, 4, 0, 0]]).tolist() == [[252, 252, 6, 0, 0, 0]]
+
+def test_distribute_effort_values_batch_matches_single_path(sqlite_db, mock_requests):
+    """Test that a batch leaves the same rows as one distribute_effort_values call per Pokémon."""
+    mock_requests.side_effect = species_response
+    ids = [result['pokemon_id'] for result in create_pokemon_batch(["ditto", "pikachu"] * 10)]
+    single_ids, batch_ids = ids[:10], ids[10:]
+    spreads = [[(i * 37) % 300, 252, (i * 91) % 280, 4, i * 3, 300 - i] for i in range(10)]
+    spreads[3] = [10, 20]  # padded with zeros
+
+    for pokemon_id, evs in zip(single_ids, spreads):
+        distribute_effort_values(pokemon_id, evs)
+    written = distribute_effort_values_batch(list(zip(batch_ids, spreads)))
+
+    for single_id, batch_id, evs in zip(single_ids, batch_ids, written):
+        single_stats = vars(get_pokemon_by_id(single_id).stats)
+        batch_stats = vars(get_pokemon_by_id(batch_id).stats)
+        assert [stat[1] for stat in batch_stats.values()] == [stat[1] for stat in single_stats.values()] == evs
+
+def test_distribute_effort_values_batch_one_statement(mock_cursor):
+    """Test that every row is written by one executemany and committed once."""
+    mock_cursor.fetchall.return_value = [(1,), (2,)]
+
+    written = distribute_effort_values_batch([(1, [300] * 6), (2, [4, 0, 252])])
+
+    assert written == [[255, 255, 0, 0, 0, 0], [4, 0, 252, 0, 0, 0]]
+    assert mock_cursor.executemany.call_count == 1
+    assert mock_cursor.executemany.call_args[0][1] == [(255, 255, 0, 0, 0, 0, 1), (4, 0, 252, 0, 0, 0, 2)]
+    with poke_model.get_db_connection() as conn:
+        assert conn.commit.call_count == 1
+
+def test_distribute_effort_values_batch_missing_pokemon(sqlite_db, mock_requests):
+    """Test that an unknown id fails the whole batch without writing anything."""
+    mock_requests.side_effect = species_response
+    pokemon_id = create_pokemon_batch(["ditto"])[0]['pokemon_id']
+
+    with pytest.raises(ValueError, match="Pokemon with ID 999 not found"):
+        distribute_effort_values_batch([(pokemon_id, [100] * 6), (999, [100] * 6)])
+
+    assert get_pokemon_by_id(pokemon_id).stats.hp == [48, 0]
+
+@pytest.mark.parametrize("evs", [[-1], [1] * 7, ["252"], [True], None])
+def test_distribute_effort_values_batch_invalid(mock_cursor, evs):
+    """Test that spreads of the wrong shape or type are rejected before touching the database."""
+    with pytest.raises(ValueError, match="Effort values of 1"):
+        distribute_effort_values_batch([(1, evs)])
+
+    assert not mock_cursor.executemany.called
+
+def test_distribute_effort_values_batch_route(sqlite_db, mock_requests):
+    """Test that the route reports the capped values and rejects malformed bodies."""
+    import wsgi
+    mock_requests.side_effect = species_response
+    # Two pokemon, so that the id 1 exists
+    pokemon_id = create_pokemon_batch(["pikachu", "ditto"])[0]['pokemon_id']
+    client = wsgi.app.test_client()
+
+    response = client.post('/api/distribute-effort-values-batch',
+                           json={'distributions': [{'id': pokemon_id, 'evs': [300, 300, 300]}]})
+    assert response.status_code == 200
+    assert response.get_json()['effort_values'] == [{'id': pokemon_id, 'evs': [255, 255, 0, 0, 0, 0]}]
+
+    assert client.post('/api/distribute-effort-values-batch', json={'distributions': []}).status_code == 400
+    missing = client.post('/api/distribute-effort-values-batch', json={'distributions': [{'id': 999, 'evs': [1]}]})
+    assert missing.status_code == 400
+    # JSON true is not the id 1 nor the value 1
+    for item in ({'id': True, 'evs': [1]}, {'id': pokemon_id, 'evs': [True]}):
+        assert client.post('/api/distribute-effort-values-batch', json={'distributions': [item]}).status_code == 400
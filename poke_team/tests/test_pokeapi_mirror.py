@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from app.models import poke_model
+from app.services import pokeapi_mirror
+from app.services.pokeapi_mirror import get_move, get_species, iter_dump, main, sync
+
+
+def species_doc(id, name, base, moves, types=("normal",)):
+    return {
+        'id': id,
+        'name': name,
+        'stats': [
+            {'base_stat': base, 'stat': {'name': stat}}
+            for stat in ('hp', 'attack', 'defense', 'special-attack', 'special-defense', 'speed')
+        ],
+        'abilities': [{'slot': 1, 'ability': {'name': 'limber'}, 'is_hidden': False}],
+        'types': [{'slot': i, 'type': {'name': t}} for i, t in enumerate(types, start=1)],
+        'moves': [{'move': {'name': move}} for move in moves],
+        'sprites': {'front_default': 'ignored'},
+    }
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def dump_dir(tmp_path):
+    """A PokeAPI api-data style dump with two species."""
+    for doc in (species_doc(132, "ditto", 48, ["transform"]),
+                species_doc(25, "pikachu", 50, ["thunderbolt", "tail-whip"], types=("electric",))):
+        directory = tmp_path / "dump" / "api" / "v2" / "pokemon" / str(doc['id'])
+        directory.mkdir(parents=True)
+        (directory / "index.json").write_text(json.dumps(doc))
+    return str(tmp_path / "dump")
+
+@pytest.fixture
+def no_http(mocker):
+    """Fail the test on any outbound HTTP call."""
+    return mocker.patch("app.utils.http_client.get", side_effect=AssertionError("unexpected HTTP request"))
+
+
+######################################################
+#
+#    Import
+#
+######################################################
+
+def test_iter_dump_reads_api_data_layout(dump_dir):
+    """Test that documents are found under api/v2/pokemon/<id>/index.json."""
+    names = sorted(doc['name'] for doc in iter_dump(dump_dir))
+    assert names == ["ditto", "pikachu"]
+
+def test_sync_imports_species(sqlite_db, dump_dir):
+    """Test that a first sync inserts every species with its child rows."""
+    counts = sync(iter_dump(dump_dir))
+    assert counts == {'inserted': 2, 'updated': 0, 'unchanged': 0}
+
+    conn = sqlite3.connect(sqlite_db)
+    assert conn.execute("SELECT COUNT(*) FROM species_stats").fetchone()[0] == 12
+    assert conn.execute("SELECT COUNT(*) FROM species_moves").fetchone()[0] == 3
+    conn.close()
+
+def test_resync_only_touches_changed_records(sqlite_db, dump_dir):
+    """Test that re-syncing skips species whose mirrored content did not change."""
+    sync(iter_dump(dump_dir))
+
+    path = os.path.join(dump_dir, "api", "v2", "pokemon", "25", "index.json")
+    with open(path) as fh:
+        doc = json.load(fh)
+    doc['moves'].append({'move': {'name': 'quick-attack'}})
+    doc['sprites'] = {'front_default': 'changed but not mirrored'}
+    with open(path, "w") as fh:
+        json.dump(doc, fh)
+
+    counts = sync(iter_dump(dump_dir))
+    assert counts == {'inserted': 0, 'updated': 1, 'unchanged': 1}
+
+    moves = [m['move']['name'] for m in get_species("pikachu")['moves']]
+    assert sorted(moves) == ["quick-attack", "tail-whip", "thunderbolt"]
+
+def test_sync_imports_moves(sqlite_db, dump_dir):
+    """Test that move documents in the dump are mirrored and read back in PokeAPI's shape."""
+    directory = os.path.join(dump_dir, "api", "v2", "move", "85")
+    os.makedirs(directory)
+    thunderbolt = {'id': 85, 'name': 'thunderbolt', 'type': {'name': 'electric'}, 'power': 90,
+                   'damage_class': {'name': 'special'}, 'accuracy': 100}
+    with open(os.path.join(directory, "index.json"), "w") as fh:
+        json.dump(thunderbolt, fh)
+
+    assert sync(iter_dump(dump_dir)) == {'inserted': 3, 'updated': 0, 'unchanged': 0}
+    assert sync(iter_dump(dump_dir))['unchanged'] == 3
+
+    move = get_move("Thunderbolt")
+    assert move == get_move(85)
+    assert move == {'id': 85, 'name': 'thunderbolt', 'type': {'name': 'electric'}, 'power': 90,
+                    'damage_class': {'name': 'special'}}
+    assert get_move("splash") is None
+
+def test_cli(sqlite_db, dump_dir, capsys):
+    """Test the command-line entry point."""
+    assert main(["--dump-dir", dump_dir, "--db-path", sqlite_db]) == 0
+    assert json.loads(capsys.readouterr().out) == {'inserted': 2, 'updated': 0, 'unchanged': 0}
+
+
+######################################################
+#
+#    Reads
+#
+######################################################
+
+def test_get_species_matches_pokeapi_shape(sqlite_db, dump_dir):
+    """Test that a mirrored species reads back by name and by id."""
+    sync(iter_dump(dump_dir))
+
+    by_name = get_species("Ditto")
+    assert by_name == get_species(132)
+    assert by_name['id'] == 132
+    assert by_name['types'] == [{'slot': 1, 'type': {'name': 'normal'}}]
+    assert {s['stat']['name']: s['base_stat'] for s in by_name['stats']}['speed'] == 48
+    assert get_species("missingno") is None
+
+def test_poke_model_runs_against_mirror(sqlite_db, dump_dir, mocker, no_http):
+    """Test creating a pokemon and teaching it a move with no outbound HTTP."""
+    sync(iter_dump(dump_dir))
+    mocker.patch.object(pokeapi_mirror, "POKEAPI_MIRROR", True)
+
+    pokemon_id = poke_model.create_pokemon_by_name("pikachu")
+    poke_model.add_move_to_pokemon(pokemon_id, "thunderbolt")
+
+    pokemon = poke_model.get_pokemon_by_id(pokemon_id)
+    assert pokemon.game_id == 25
+    assert pokemon.stats.speed == [50, 0]
+    assert pokemon.learned_moves == ["thunderbolt"]
+
+    with pytest.raises(ValueError, match="This pokemon does not exist"):
+        poke_model.create_pokemon_by_name("missingno")
@@ -0,0 +1,165 @@
+import multiprocessing
+
+import pytest
+
+from app.utils.password_hasher import PasswordHasher
+from app.utils.rate_limiter import LoginThrottle, SQLiteTokenBucketLimiter, TokenBucketLimiter
+
+
+######################################################
+#
+#    In-memory buckets
+#
+######################################################
+
+def test_bucket_allows_burst_then_refills(clock):
+    """Test that a key gets burst calls at once, then one per 1/rate seconds."""
+    limiter = TokenBucketLimiter(rate=0.5, burst=3, clock=clock)
+
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a") == pytest.approx(2)
+    assert limiter.acquire("b") == 0
+
+    clock.now += 2
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == pytest.approx(2)
+
+def test_full_buckets_are_forgotten(clock):
+    """Test that buckets which have refilled completely no longer take memory."""
+    limiter = TokenBucketLimiter(rate=1, burst=2, clock=clock)
+    for key in "abc":
+        limiter.acquire(key)
+
+    clock.now += 2
+    limiter.acquire("d")
+
+    assert len(limiter) == 1
+
+def test_bucket_count_is_bounded(clock):
+    """Test that a flood of distinct keys never keeps more than max_keys buckets."""
+    limiter = TokenBucketLimiter(rate=1, burst=2, max_keys=10, clock=clock)
+    for i in range(1000):
+        limiter.acquire(f"user{i}")
+
+    assert len(limiter) == 10
+
+
+######################################################
+#
+#    Shared buckets
+#
+######################################################
+
+def test_sqlite_buckets_are_shared(tmp_path, clock):
+    """Test that two limiters on the same file (two workers) spend the same tokens."""
+    path = str(tmp_path / "throttle.db")
+    first = SQLiteTokenBucketLimiter(path, rate=0.5, burst=2, clock=clock)
+    second = SQLiteTokenBucketLimiter(path, rate=0.5, burst=2, clock=clock)
+
+    assert first.acquire("a") == 0
+    assert second.acquire("a") == 0
+    assert first.acquire("a") == pytest.approx(2)
+
+    clock.now += 2
+    assert second.acquire("a") == 0
+
+def test_sqlite_buckets_are_cleaned_up(tmp_path, clock):
+    """Test that refilled buckets are deleted from the shared file."""
+    limiter = SQLiteTokenBucketLimiter(str(tmp_path / "throttle.db"), rate=1, burst=2, cleanup_interval=1, clock=clock)
+    limiter.acquire("a")
+    clock.now += 3
+    limiter.acquire("b")
+
+    assert len(limiter) == 1
+
+def _spend(path, results):
+    limiter = SQLiteTokenBucketLimiter(path, rate=0.001, burst=20)
+    results.put(sum(limiter.acquire("shared") == 0 for _ in range(10)))
+
+def test_sqlite_buckets_across_processes(tmp_path):
+    """Test that concurrent processes never spend more than the burst between them."""
+    path = str(tmp_path / "throttle.db")
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=_spend, args=(path, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    allowed = sum(results.get(timeout=30) for _ in workers)
+    for worker in workers:
+        worker.join(timeout=30)
+
+    assert allowed == 20
+
+def test_sqlite_fails_open(tmp_path):
+    """Test that an unusable file never blocks logins."""
+    limiter = SQLiteTokenBucketLimiter(str(tmp_path / "missing" / "throttle.db"), rate=1, burst=1)
+
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+
+def test_sqlite_release_refunds_a_token(tmp_path, clock):
+    """Test that a released token can be taken again, but never past the burst."""
+    limiter = SQLiteTokenBucketLimiter(str(tmp_path / "throttle.db"), rate=1 / 60, burst=1, clock=clock)
+
+    assert limiter.acquire("a") == 0
+    limiter.release("a")
+    limiter.release("a")
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+
+
+######################################################
+#
+#    Login throttle
+#
+######################################################
+
+def test_throttled_address_spares_the_user(clock):
+    """Test that an address over its limit does not lock its victims' accounts."""
+    throttle = LoginThrottle(
+        per_user=TokenBucketLimiter(rate=1, burst=2, clock=clock),
+        per_address=TokenBucketLimiter(rate=1, burst=1, clock=clock),
+    )
+
+    assert throttle.check("Bucket", "10.0.0.1") == 0
+    assert throttle.check("bucket", "10.0.0.1") > 0
+    assert throttle.check("bucket", "10.0.0.2") == 0
+    assert throttle.check("BUCKET", "10.0.0.3") > 0
+
+    assert throttle.stats() == {
+        'backend': 'TokenBucketLimiter', 'allowed': 2, 'throttled_user': 1, 'throttled_address': 1,
+    }
+
+def test_successful_logins_are_not_charged_to_the_user(sqlite_db, mocker):
+    """Test that a client logging in again and again is never throttled, but failed attempts still are."""
+    import wsgi
+    throttle = LoginThrottle(per_user=TokenBucketLimiter(rate=1 / 60, burst=2))
+    mocker.patch.dict(wsgi.app.view_functions['login'].__globals__, {'login_throttle': throttle})
+    mocker.patch("app.models.user_model.password_hasher", PasswordHasher(workers=0, rounds=4))
+    client = wsgi.app.test_client()
+    client.post("/api/create-account", json={"username": "bucket", "password": "hehehe"})
+
+    statuses = [client.post("/api/login", json={"username": "bucket", "password": "hehehe"}).status_code
+                for _ in range(10)]
+    statuses += [client.post("/api/login", json={"username": "bucket", "password": "wrong"}).status_code
+                 for _ in range(3)]
+
+    assert statuses == [200] * 10 + [401, 401, 429]
+
+def test_login_route_throttles_before_hashing(sqlite_db, mocker):
+    """Test that the route answers 429 with Retry-After and never reaches bcrypt."""
+    import wsgi
+    throttle = LoginThrottle(per_user=TokenBucketLimiter(rate=1 / 60, burst=2))
+    mocker.patch.dict(wsgi.app.view_functions['login'].__globals__, {'login_throttle': throttle})
+    hasher = PasswordHasher(workers=0, rounds=4)
+    mocker.patch("app.models.user_model.password_hasher", hasher)
+    client = wsgi.app.test_client()
+    client.post("/api/create-account", json={"username": "bucket", "password": "hehehe"})
+    credentials = {"username": "bucket", "password": "wrong"}
+
+    statuses = [client.post("/api/login", json=credentials).status_code for _ in range(3)]
+    response = client.post("/api/login", json=credentials)
+
+    assert statuses == [401, 401, 429]
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == "60"
+    assert hasher.stats()['completed'] == 3  # the account and the two checked attempts
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from app.models import poke_model
+from app.services import pokeapi_service
+from app.utils import api_utils, http_client
+from app.utils.cache_utils import LRUCache, TwoTierCache
+from app.utils.singleflight import SingleFlight
+from tools.fake_pokeapi import FakePokeAPI
+
+
+DITTO = {'id': 132, 'name': 'ditto', 'stats': [], 'moves': [{'move': {'name': 'transform'}}]}
+THREADS = 16
+
+
+def run_concurrently(fn, n=THREADS):
+    """Runs fn in n threads released at the same time; returns results and errors."""
+    barrier = threading.Barrier(n)
+    results, errors = [None] * n, [None] * n
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def fake_api(mocker):
+    """A slow local PokeAPI with an empty response cache in front of it."""
+    mocker.patch.object(api_utils, "response_cache", TwoTierCache(LRUCache(max_entries=16)))
+    mocker.patch.object(api_utils, "inflight", SingleFlight())
+    http_client.set_session(None)
+    with FakePokeAPI({"/api/v2/pokemon/ditto": DITTO, "/api/v2/pokemon/132": DITTO}, latency=0.2) as fake:
+        mocker.patch.object(poke_model, "BASE_POKE_URL", fake.url + "/api/v2/")
+        mocker.patch.object(pokeapi_service, "POKEAPI_BASE_URL", fake.url + "/api/v2/pokemon")
+        yield fake
+    http_client.set_session(None)
+
+
+######################################################
+#
+#    SingleFlight
+#
+######################################################
+
+def test_single_flight_shares_errors():
+    """Test that every waiter sees the leader's exception."""
+    flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.1)
+        raise ValueError("upstream down")
+
+    results, errors = run_concurrently(lambda: flight.do("ditto", failing), n=8)
+
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert flight.executions == 1
+    assert flight.coalesced == 7
+
+def test_single_flight_forgets_finished_keys():
+    """Test that a key is executed again once its call has completed."""
+    flight = SingleFlight()
+    assert flight.do("ditto", lambda: 1) == 1
+    assert flight.do("ditto", lambda: 2) == 2
+    assert flight.stats() == {'in_flight': 0, 'executions': 2, 'coalesced': 0}
+
+
+######################################################
+#
+#    Upstream coalescing
+#
+######################################################
+
+def test_concurrent_species_fetches_hit_upstream_once(fake_api):
+    """Test that N threads asking for the same species cause exactly one upstream GET."""
+    results, errors = run_concurrently(lambda: poke_model.fetch_species("ditto"))
+
+    assert errors == [None] * THREADS
+    assert all(result == DITTO for result in results)
+    assert fake_api.hits["/api/v2/pokemon/ditto"] == 1
+
+def test_concurrent_fetches_by_id_hit_upstream_once(fake_api):
+    """Test that pokeapi_service.fetch_pokemon coalesces by id."""
+    results, errors = run_concurrently(lambda: pokeapi_service.fetch_pokemon(132))
+
+    assert errors == [None] * THREADS
+    assert all(result == DITTO for result in results)
+    assert fake_api.hits["/api/v2/pokemon/132"] == 1
+
+def test_concurrent_fetches_share_not_found(fake_api):
+    """Test that a missing species is looked up once and reported to every waiter."""
+    results, errors = run_concurrently(lambda: poke_model.fetch_species("missingno"))
+
+    assert errors == [None] * THREADS
+    assert results == [None] * THREADS
+    assert fake_api.hits["/api/v2/pokemon/missingno"] == 1
@@ -0,0 +1,175 @@
+import logging
+
+import pytest
+
+from app.models import poke_model
+from app.utils import db_utils, sql_trace
+from app.utils.auth_tokens import token_signer
+from app.utils.sql_trace import StatementStats, normalize_sql, null_parameters
+import wsgi
+
+
+@pytest.fixture
+def traced(sqlite_db, monkeypatch):
+    """Trace the pooled connections of a fresh database into empty stats."""
+    stats = StatementStats(slow_ms=1000)
+    monkeypatch.setattr(db_utils, "DB_TRACE", True)
+    monkeypatch.setattr(sql_trace, "statement_stats", stats)
+    # Fine-grained enough to see the instructions of a few rows
+    monkeypatch.setattr(sql_trace, "DB_TRACE_PROGRESS_OPS", 10)
+    return stats
+
+
+def add_pokemon(conn, count):
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO pokemon (id, game_id, name, ability, total_effort) VALUES (?, 25, ?, 'static', 0)",
+        [(i, f"mon{i}") for i in range(count)]
+    )
+    conn.commit()
+
+def authorized():
+    return {"Authorization": f"Bearer {token_signer.issue('ash')}"}
+
+
+######################################################
+#
+#    Aggregation
+#
+######################################################
+
+def test_normalize_sql():
+    """Test that literals, IN lists and whitespace do not split a statement."""
+    assert normalize_sql("SELECT *\n  FROM pokemon WHERE id IN (?, ?,?) AND name = 'pika''chu' LIMIT 5;") == \
+        "SELECT * FROM pokemon WHERE id IN (?, ...) AND name = ? LIMIT ?"
+    assert normalize_sql("SELECT p2.id FROM pokemon p2") == "SELECT p2.id FROM pokemon p2"
+
+def test_top_statements():
+    """Test that statements are aggregated by shape and sorted by total time."""
+    stats = StatementStats(slow_ms=1000)
+    stats.record("SELECT * FROM pokemon WHERE id = 1", 0.002, 1)
+    stats.record("SELECT * FROM pokemon WHERE id = 2", 0.004, 1)
+    stats.record("DELETE FROM pokemon", 0.005, 30)
+
+    top = stats.top(limit=2)
+
+    assert [entry['statement'] for entry in top] == ["SELECT * FROM pokemon WHERE id = ?", "DELETE FROM pokemon"]
+    assert top[0]['calls'] == 2
+    assert top[0]['total_ms'] == 6.0
+    assert top[0]['max_ms'] == 4.0
+    assert top[0]['rows'] == 2
+    assert stats.top(sort="rows")[0]['statement'] == "DELETE FROM pokemon"
+    with pytest.raises(ValueError):
+        stats.top(sort="bogus")
+
+def test_statement_cap():
+    """Test that statements beyond the cap are counted together."""
+    stats = StatementStats(slow_ms=1000, max_statements=1)
+    stats.record("SELECT 1 FROM pokemon", 0.001, 1)
+    stats.record("SELECT 1 FROM users", 0.001, 1)
+    stats.record("SELECT 1 FROM stats", 0.001, 1)
+
+    assert len(stats) == 2
+    assert {entry['statement']: entry['calls'] for entry in stats.top()}[sql_trace.OTHER] == 2
+
+def test_slow_queries_are_logged(caplog):
+    """Test that statements over the threshold go to the slow query log."""
+    stats = StatementStats(slow_ms=10)
+    with caplog.at_level(logging.WARNING, logger="app.utils.sql_trace.slow"):
+        stats.record("SELECT * FROM pokemon WHERE id = 1", 0.002, 1)
+        stats.record("SELECT * FROM pokemon WHERE id = 2", 0.020, 1)
+
+    assert len(caplog.records) == 1
+    assert "SELECT * FROM pokemon WHERE id = ?" in caplog.records[0].getMessage()
+    assert stats.top()[0]['slow'] == 1
+
+def test_null_parameters():
+    """Test that only real placeholders are bound, numbered and named ones included."""
+    assert null_parameters("SELECT * FROM pokemon WHERE name = '?' AND id = ? -- why?") == [None]
+    assert null_parameters("SELECT * FROM pokemon WHERE id IN (?2, ?, ?1)") == [None] * 3
+    assert null_parameters("SELECT * FROM pokemon WHERE id = :id OR name = :name OR id = :id") == \
+        {'id': None, 'name': None}
+
+######################################################
+#
+#    Traced connections
+#
+######################################################
+
+def test_untraced_connections_are_plain(sqlite_db):
+    """Test that tracing is off unless DB_TRACE is set."""
+    with db_utils.get_db_connection() as conn:
+        assert not isinstance(conn, sql_trace.TracingConnection)
+
+def test_pooled_connections_record_rows(traced):
+    """Test that statements run through get_db_connection are timed with their rows."""
+    with db_utils.get_db_connection() as conn:
+        add_pokemon(conn, 20)
+    with db_utils.get_db_connection(read_only=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM pokemon WHERE total_effort = 0")
+        cursor.fetchall()
+        # Abandoned after one row: recorded when the connection is released
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM pokemon ORDER BY id")
+        cursor.fetchone()
+
+    entries = {entry['statement']: entry for entry in traced.top()}
+    insert = next(entry for statement, entry in entries.items() if statement.startswith("INSERT INTO pokemon"))
+    assert insert['calls'] == 1
+    assert insert['rows'] == 20
+    assert entries["SELECT id FROM pokemon WHERE total_effort = ?"]['rows'] == 20
+    assert entries["SELECT id FROM pokemon WHERE total_effort = ?"]['vm_steps'] > 0
+    assert entries["SELECT id FROM pokemon ORDER BY id"]['rows'] == 1
+
+def test_connection_shortcuts_are_traced(traced):
+    """Test that Connection.execute() and executescript() are timed like cursors."""
+    with db_utils.get_db_connection() as conn:
+        add_pokemon(conn, 3)
+        conn.execute("UPDATE pokemon SET total_effort = 1 WHERE id < 2")
+        conn.executescript("DELETE FROM pokemon WHERE id = 0; DELETE FROM pokemon WHERE id = 1;")
+
+    entries = {entry['statement']: entry for entry in traced.top()}
+    assert entries["UPDATE pokemon SET total_effort = ? WHERE id < ?"]['rows'] == 2
+    assert entries["DELETE FROM pokemon WHERE id = ?; DELETE FROM pokemon WHERE id = ?"]['calls'] == 1
+
+def test_model_queries_are_traced(traced):
+    """Test that the model layer's queries show up without any change to it."""
+    with db_utils.get_db_connection() as conn:
+        add_pokemon(conn, 3)
+
+    poke_model.get_pokemon_by_ids([0, 1, 2])
+
+    assert any("FROM pokemon p" in entry['statement'] for entry in traced.top())
+
+def test_query_stats_route_explains(traced):
+    """Test that the route reports the top statements with their query plans."""
+    with db_utils.get_db_connection() as conn:
+        add_pokemon(conn, 5)
+    with db_utils.get_db_connection(read_only=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM pokemon WHERE total_effort = ?", (0,))
+        cursor.fetchall()
+
+    response = wsgi.app.test_client().get('/api/query-stats?limit=5', headers=authorized())
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['enabled'] is True
+    statement = next(s for s in body['statements'] if s['statement'] == "SELECT name FROM pokemon WHERE total_effort = ?")
+    assert statement['rows'] == 5
+    assert any("SCAN" in step for step in statement['plan'])
+    assert 'example' not in statement
+
+def test_explain_binds_only_real_placeholders(traced):
+    """Test that a ? inside a string does not count as a parameter."""
+    with db_utils.get_db_connection(read_only=True) as conn:
+        plan = sql_trace.explain(conn, "SELECT id FROM pokemon WHERE name = 'who?' AND id = ?")
+
+    assert plan and any("pokemon" in step for step in plan)
+
+def test_query_stats_route_rejects_bad_sort(traced):
+    """Test that an unknown sort key is a 400."""
+    response = wsgi.app.test_client().get('/api/query-stats?sort=bogus', headers=authorized())
+
+    assert response.status_code == 400
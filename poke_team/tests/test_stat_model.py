@@ -0,0 +1,136 @@
+import pytest
+
+from app.models.poke_model import Pokemon, Stats, create_pokemon_by_objects, distribute_effort_values
+from app.models.stat_model import calculate_stats, get_pokemon_stats, get_roster_stats, load_stat_columns, nature_tenths
+import wsgi
+
+
+# Bulbapedia's worked example: a level 78 Adamant Garchomp
+GARCHOMP_BASE = [108, 130, 95, 80, 85, 102]
+GARCHOMP_IVS = [24, 12, 30, 16, 23, 5]
+GARCHOMP_EVS = [74, 190, 91, 48, 84, 23]
+GARCHOMP_STATS = [289, 278, 193, 135, 171, 171]
+
+
+def pokemon(name, base):
+    return Pokemon(
+        id=None, game_id=0, name=name, ability="", learned_moves=[],
+        stats=Stats(*([value, 0] for value in base)), total_effort=0
+    )
+
+@pytest.fixture
+def roster(sqlite_db):
+    """Three stored Pokemon: pikachu, garchomp and shedinja, with their ids."""
+    members = [
+        pokemon("pikachu", [35, 55, 40, 50, 50, 90]),
+        pokemon("garchomp", GARCHOMP_BASE),
+        pokemon("shedinja", [1, 90, 45, 30, 30, 40]),
+    ]
+    create_pokemon_by_objects(members)
+    return [member.id for member in members]
+
+
+######################################################
+#
+#    Stat engine
+#
+######################################################
+
+def test_calculate_stats_known_values():
+    """Test the formulas against a worked example with IVs, EVs, level and nature."""
+    stats = calculate_stats([GARCHOMP_BASE], [GARCHOMP_EVS], GARCHOMP_IVS, 78, "adamant")
+
+    assert stats.tolist() == [GARCHOMP_STATS]
+
+def test_calculate_stats_per_pokemon_settings():
+    """Test that levels and natures can differ per row in the same pass."""
+    base = [[35, 55, 40, 50, 50, 90], [1, 90, 45, 30, 30, 40], GARCHOMP_BASE]
+    evs = [[0] * 6, [0] * 6, GARCHOMP_EVS]
+
+    stats = calculate_stats(base, evs, ivs=[[31] * 6, [31] * 6, GARCHOMP_IVS], level=[50, 100, 78],
+                            natures=["hardy", "timid", "adamant"])
+
+    assert stats.tolist() == [
+        [110, 75, 60, 70, 70, 110],
+        [1, 194, 126, 96, 96, 127],  # timid: speed up, attack down; shedinja stays at 1 HP
+        GARCHOMP_STATS,
+    ]
+
+def test_nature_tenths():
+    """Test that neutral natures change nothing and others raise one stat and lower another."""
+    assert nature_tenths(None).tolist() == [10] * 6
+    assert nature_tenths("Serious").tolist() == [10] * 6
+    assert nature_tenths(["modest", "jolly"]).tolist() == [[10, 9, 10, 11, 10, 10], [10, 10, 10, 9, 10, 11]]
+    with pytest.raises(ValueError, match="Unknown nature"):
+        nature_tenths("grumpy")
+
+@pytest.mark.parametrize("settings", [{'level': 0}, {'level': 101}, {'ivs': 32}, {'ivs': -1}])
+def test_calculate_stats_rejects_out_of_range(settings):
+    """Test that levels and IVs outside the games' ranges are rejected."""
+    with pytest.raises(ValueError):
+        calculate_stats([GARCHOMP_BASE], [GARCHOMP_EVS], **settings)
+
+######################################################
+#
+#    Roster
+#
+######################################################
+
+def test_load_stat_columns_order_and_missing(roster):
+    """Test that the columns follow the requested order and unknown ids are skipped."""
+    pikachu, garchomp, shedinja = roster
+
+    ids, base, evs = load_stat_columns([shedinja, 999, pikachu])
+
+    assert ids.tolist() == [shedinja, pikachu]
+    assert base[:, 0].tolist() == [1, 35]
+    assert evs.shape == (2, 6)
+    assert load_stat_columns()[0].tolist() == sorted(roster)
+    assert load_stat_columns([999])[0].tolist() == []
+
+def test_roster_stats_use_stored_effort_values(roster):
+    """Test that the stored EVs are part of the computation."""
+    pikachu, garchomp, shedinja = roster
+    distribute_effort_values(garchomp, GARCHOMP_EVS)
+
+    stats = get_pokemon_stats(garchomp, GARCHOMP_IVS, 78, "adamant")
+
+    assert list(stats.values()) == GARCHOMP_STATS
+    assert [entry['id'] for entry in get_roster_stats()] == roster
+    with pytest.raises(ValueError, match="Pokemon with ID 999 not found"):
+        get_pokemon_stats(999)
+
+######################################################
+#
+#    Routes
+#
+######################################################
+
+def test_pokemon_stats_route(roster):
+    """Test the single Pokemon route and its validation."""
+    client = wsgi.app.test_client()
+
+    response = client.get(f'/api/pokemon/{roster[0]}/stats?level=50')
+
+    assert response.status_code == 200
+    assert response.get_json()['stats'] == {
+        'hp': 110, 'attack': 75, 'defense': 60, 'special_attack': 70, 'special_defense': 70, 'speed': 110
+    }
+    assert client.get(f'/api/pokemon/{roster[0]}/stats?ivs=31,31').status_code == 400
+    assert client.get(f'/api/pokemon/{roster[0]}/stats?nature=grumpy').status_code == 400
+    assert client.get('/api/pokemon/999/stats').status_code == 400
+
+def test_roster_stats_route(roster):
+    """Test that the bulk route covers the requested ids, or the whole roster without any."""
+    client = wsgi.app.test_client()
+
+    response = client.get(f'/api/pokemon/stats?ids={roster[2]},999&nature=timid')
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body['pokemon'] == [{'id': roster[2], 'stats': {
+        'hp': 1, 'attack': 194, 'defense': 126, 'special_attack': 96, 'special_defense': 96, 'speed': 127
+    }}]
+    assert body['missing'] == [999]
+    assert len(client.get('/api/pokemon/stats').get_json()['pokemon']) == 3
+    assert client.get('/api/pokemon/stats?level=high').status_code == 400
@@ -0,0 +1,142 @@
+import sqlite3
+
+import pytest
+
+from app.models.poke_model import Pokemon, Stats, add_move_to_pokemon, create_pokemon_by_objects
+from app.models.team_model import (
+    create_team, get_team, get_teams, get_teams_with_pokemon, get_user_teams, set_team_members
+)
+from app.utils.auth_tokens import token_signer
+import wsgi
+
+
+def pokemon(name, hp):
+    return Pokemon(
+        id=None, game_id=0, name=name, ability="", learned_moves=[],
+        stats=Stats([hp, 0], [50, 0], [50, 0], [50, 0], [50, 0], [50, 0]), total_effort=0
+    )
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture
+def roster(sqlite_db):
+    """Twelve stored Pokemon and two users, ash and misty."""
+    members = [pokemon(f"mon{i}", 10 + i) for i in range(12)]
+    create_pokemon_by_objects(members)
+    conn = sqlite3.connect(sqlite_db)
+    conn.executemany("INSERT INTO users (username, hashed_passwd, salt) VALUES (?, 'x', 'x')", [("ash",), ("misty",)])
+    conn.commit()
+    conn.close()
+    return [member.id for member in members]
+
+
+######################################################
+#
+#    Teams
+#
+######################################################
+
+def test_create_and_get_team(roster, mocker):
+    """Test that a team reads back with its members' stats and moves in slot order."""
+    mocker.patch("app.models.poke_model.fetch_species", return_value={'moves': [{'move': {'name': 'tackle'}}]})
+    add_move_to_pokemon(roster[3], "tackle")
+
+    team_id = create_team("ash", "rain", [roster[3], roster[0], roster[7]])
+    team = get_team(team_id)
+
+    assert team.name == "rain"
+    assert [member.id for member in team.members] == [roster[3], roster[0], roster[7]]
+    assert team.members[0].learned_moves == ["tackle"]
+    assert team.members[0].stats.hp == [13, 0]
+
+def test_teams_load_in_constant_queries(roster, count_queries):
+    """Test that the number of queries does not grow with the number of teams or members."""
+    team_ids = [create_team("ash", f"team{i}", roster[i:i + 6]) for i in range(6)]
+
+    queries = {}
+    for count in (1, 6):
+        teams, queries[count] = count_queries(lambda: get_teams(team_ids[:count]))
+        assert len(teams) == count
+    user_teams, queries['user'] = count_queries(lambda: get_user_teams("ash"))
+
+    assert queries == {1: 2, 6: 2, 'user': 2}
+    assert [len(team.members) for team in user_teams] == [6] * 6
+
+@pytest.mark.parametrize("pokemon_ids, error", [
+    ([], "1 to 6"),
+    (list(range(7)), "1 to 6"),
+    ([0, 0], "only be in a team once"),
+    (["0"], "1 to 6"),
+    ([999], "Pokemon with ID 999 not found"),
+])
+def test_create_team_invalid_members(roster, pokemon_ids, error):
+    """Test that bad member lists are rejected and nothing is written."""
+    with pytest.raises(ValueError, match=error):
+        create_team("ash", "bad", pokemon_ids)
+
+    assert get_user_teams("ash") == []
+
+def test_set_team_members(roster):
+    """Test replacing a team's members, only by its owner."""
+    team_id = create_team("ash", "sun", roster[:3])
+
+    set_team_members(team_id, "ash", [roster[5], roster[4]])
+
+    assert [member.id for member in get_team(team_id).members] == [roster[5], roster[4]]
+    with pytest.raises(ValueError, match=f"Team with ID {team_id} not found"):
+        set_team_members(team_id, "misty", [roster[0]])
+
+def test_get_team_of_user(roster):
+    """Test that a team is found for its owner only."""
+    team_id = create_team("ash", "sun", roster[:3])
+
+    assert get_team(team_id, "ash").id == team_id
+    assert get_teams([team_id], "misty") == []
+    with pytest.raises(ValueError, match=f"Team with ID {team_id} not found"):
+        get_team(team_id, "misty")
+
+def test_teams_with_pokemon_uses_index(roster, sqlite_db):
+    """Test finding the teams of a pokemon through the team_members index."""
+    first = create_team("ash", "a", [roster[0], roster[1]])
+    second = create_team("misty", "b", [roster[2], roster[1]])
+
+    assert get_teams_with_pokemon(roster[1]) == [{'id': first, 'name': 'a', 'slot': 1}, {'id': second, 'name': 'b', 'slot': 1}]
+    assert get_teams_with_pokemon(roster[9]) == []
+
+    conn = sqlite3.connect(sqlite_db)
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT team_id FROM team_members WHERE pokemon_id = ?", (1,)).fetchall()
+    conn.close()
+    assert "USING COVERING INDEX team_members_pokemon_id" in plan[0][-1]
+
+######################################################
+#
+#    Routes
+#
+######################################################
+
+def test_team_routes(roster):
+    """Test creating, listing, reading and updating teams over HTTP."""
+    client = wsgi.app.test_client()
+    headers = {"Authorization": f"Bearer {token_signer.issue('ash')}"}
+
+    response = client.post('/api/teams', json={'name': 'rain', 'pokemon_ids': roster[:2]}, headers=headers)
+    assert response.status_code == 200
+    team_id = response.get_json()['team_id']
+
+    assert client.put(f'/api/teams/{team_id}/members', json={'pokemon_ids': [roster[2]]}, headers=headers).status_code == 200
+    team = client.get(f'/api/teams/{team_id}', headers=headers).get_json()['team']
+    assert [member['name'] for member in team['members']] == ["mon2"]
+    assert [team['id'] for team in client.get('/api/teams', headers=headers).get_json()['teams']] == [team_id]
+    assert client.get(f'/api/pokemon/{roster[2]}/teams').get_json()['teams'] == [{'id': team_id, 'name': 'rain', 'slot': 0}]
+
+    assert client.post('/api/teams', json={'name': 'x', 'pokemon_ids': [roster[0]]}).status_code == 401
+    assert client.post('/api/teams', json={'name': '', 'pokemon_ids': [roster[0]]}, headers=headers).status_code == 400
+    assert client.get('/api/teams/999', headers=headers).status_code == 400
+    assert client.get(f'/api/teams/{team_id}').status_code == 401
+    misty = {"Authorization": f"Bearer {token_signer.issue('misty')}"}
+    assert client.get(f'/api/teams/{team_id}', headers=misty).status_code == 400
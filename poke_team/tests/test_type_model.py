@@ -0,0 +1,191 @@
+import random
+import sqlite3
+
+import numpy as np
+import pytest
+
+from app.models import poke_model, type_model
+from app.models.team_model import create_team
+from app.models.type_model import NO_TYPE, TYPE_CHART, TYPE_INDEX, analyze_teams, coverage, pokemon_coverage, team_coverage
+from app.services import pokeapi_mirror
+from app.services.pokeapi_mirror import sync
+from app.utils.auth_tokens import token_signer
+import wsgi
+
+
+SPECIES = {
+    'charizard': (6, ("fire", "flying"), ["flamethrower", "air-slash", "roost"]),
+    'gyarados': (130, ("water", "flying"), ["waterfall"]),
+    'venusaur': (3, ("grass", "poison"), ["giga-drain", "sludge-bomb"]),
+    'pikachu': (25, ("electric",), ["thunderbolt", "quick-attack"]),
+}
+MOVES = {
+    'flamethrower': ("fire", 90, "special"),
+    'air-slash': ("flying", 75, "special"),
+    'roost': ("flying", None, "status"),
+    'waterfall': ("water", 80, "physical"),
+    'giga-drain': ("grass", 75, "special"),
+    'sludge-bomb': ("poison", 90, "special"),
+    'thunderbolt': ("electric", 90, "special"),
+    'quick-attack': ("normal", 40, "physical"),
+}
+
+
+def species_doc(name):
+    game_id, types, moves = SPECIES[name]
+    return {
+        'id': game_id,
+        'name': name,
+        'stats': [{'base_stat': 80, 'stat': {'name': stat}}
+                  for stat in ('hp', 'attack', 'defense', 'special-attack', 'special-defense', 'speed')],
+        'types': [{'slot': i, 'type': {'name': t}} for i, t in enumerate(types, start=1)],
+        'moves': [{'move': {'name': move}} for move in moves],
+    }
+
+def move_doc(i, name):
+    type_name, power, damage_class = MOVES[name]
+    return {'id': i, 'name': name, 'type': {'name': type_name}, 'power': power, 'damage_class': {'name': damage_class}}
+
+
+######################################################
+#
+#    Fixtures
+#
+######################################################
+
+@pytest.fixture(autouse=True)
+def catalogs(mocker):
+    """Empty species and move catalogs for every test."""
+    mocker.patch.object(type_model, "species_types", {})
+    mocker.patch.object(type_model, "move_data", {})
+
+@pytest.fixture
+def roster(sqlite_db, mocker):
+    """The species and moves above in the mirror, and one Pokemon of each species knowing all its moves."""
+    mocker.patch("app.utils.http_client.get", side_effect=AssertionError("unexpected HTTP request"))
+    mocker.patch.object(pokeapi_mirror, "POKEAPI_MIRROR", True)
+    sync([species_doc(name) for name in SPECIES] + [move_doc(i, name) for i, name in enumerate(MOVES, start=1)])
+
+    ids = {}
+    for name, (_, _, moves) in SPECIES.items():
+        ids[name] = poke_model.create_pokemon_by_name(name)
+        for move in moves:
+            poke_model.add_move_to_pokemon(ids[name], move)
+    conn = sqlite3.connect(sqlite_db)
+    conn.execute("INSERT INTO users (username, hashed_passwd, salt) VALUES ('ash', 'x', 'x')")
+    conn.commit()
+    conn.close()
+    return ids
+
+
+######################################################
+#
+#    Type chart
+#
+######################################################
+
+def test_type_chart():
+    """Test the shape and totals of the chart, and a few well-known matchups."""
+    assert TYPE_CHART.shape == (18, 18)
+    assert [(TYPE_CHART == value).sum() for value in (2, 0.5, 0)] == [51, 61, 8]
+    assert TYPE_CHART[TYPE_INDEX['electric'], TYPE_INDEX['ground']] == 0
+    assert TYPE_CHART[TYPE_INDEX['fire'], TYPE_INDEX['grass']] == 2
+    assert TYPE_CHART[TYPE_INDEX['dragon'], TYPE_INDEX['fairy']] == 0
+
+def test_coverage_dual_types_and_padding():
+    """Test that dual types multiply and empty slots count for nothing."""
+    fire_flying = [TYPE_INDEX['fire'], TYPE_INDEX['flying']]
+    members = np.array([[fire_flying, [NO_TYPE, NO_TYPE]]])
+    attacks = np.zeros((1, 18), dtype=bool)
+
+    weak, resist, immune, offense = coverage(members, attacks)
+
+    assert weak[0, TYPE_INDEX['rock']] == 1
+    assert resist[0, TYPE_INDEX['grass']] == 1  # 0.25x
+    assert weak[0, TYPE_INDEX['ice']] == resist[0, TYPE_INDEX['ice']] == 0  # 2x * 0.5x
+    assert immune[0, TYPE_INDEX['ground']] == 1
+    assert weak.sum() == 3
+    assert not offense.any()
+
+######################################################
+#
+#    Teams
+#
+######################################################
+
+def test_team_coverage(roster):
+    """Test a team's weaknesses, resistances and offensive coverage from mirrored data."""
+    team_id = create_team("ash", "sky", [roster['charizard'], roster['gyarados']])
+
+    result = team_coverage([team_id])[0]
+
+    assert result['team_id'] == team_id
+    assert result['weaknesses'] == {'water': 1, 'electric': 2, 'rock': 2}
+    assert result['immunities'] == {'ground': 2}
+    assert result['resistances']['bug'] == 2
+    assert result['exposed'] == ['electric', 'rock']
+    assert result['super_effective'] == ['fire', 'grass', 'ice', 'fighting', 'ground', 'bug', 'rock', 'steel']
+    assert len(result['uncovered']) == 10
+
+def test_status_moves_do_not_cover(roster, mocker):
+    """Test that only damaging moves count towards offensive coverage."""
+    charizard = poke_model.get_pokemon_by_id(roster['charizard'])
+    charizard.learned_moves = ["roost"]
+
+    assert analyze_teams([[charizard]])[0]['super_effective'] == []
+
+def test_batch_matches_single_teams(roster):
+    """Test that hundreds of teams analyzed at once give the same results as one by one."""
+    rng = random.Random(0)
+    teams = [rng.sample(list(roster.values()), rng.randint(1, 4)) for _ in range(300)]
+
+    batch = pokemon_coverage(teams)
+
+    assert batch == [pokemon_coverage([ids])[0] for ids in teams]
+
+def test_unknown_team_or_pokemon(roster):
+    """Test that unknown ids are an error rather than an empty team."""
+    with pytest.raises(ValueError, match="Team with ID 999 not found"):
+        team_coverage([999])
+    with pytest.raises(ValueError, match="Pokemon with ID 999 not found"):
+        pokemon_coverage([[roster['pikachu'], 999]])
+
+######################################################
+#
+#    Routes
+#
+######################################################
+
+def test_coverage_routes(roster):
+    """Test the team and batch coverage routes and their validation."""
+    client = wsgi.app.test_client()
+    headers = {"Authorization": f"Bearer {token_signer.issue('ash')}"}
+    team_id = create_team("ash", "sky", [roster['charizard'], roster['gyarados']])
+
+    response = client.get(f'/api/teams/{team_id}/coverage', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['coverage']['exposed'] == ['electric', 'rock']
+
+    response = client.post('/api/coverage', json={'teams': [[roster['pikachu']], [roster['venusaur'], roster['gyarados']]]},
+                           headers=headers)
+    assert response.status_code == 200
+    assert [result['pokemon_ids'] for result in response.get_json()['coverage']] == \
+        [[roster['pikachu']], [roster['venusaur'], roster['gyarados']]]
+    assert response.get_json()['coverage'][0]['weaknesses'] == {'ground': 1}
+
+    assert client.post('/api/coverage', json={'team_ids': [team_id]}, headers=headers).get_json()['coverage'][0]['team_id'] == team_id
+    assert client.post('/api/coverage', json={}, headers=headers).status_code == 400
+    assert client.post('/api/coverage', json={'teams': [[]]}, headers=headers).status_code == 400
+    assert client.post('/api/coverage', json={'teams': [[True]]}, headers=headers).status_code == 400
+    assert client.post('/api/coverage', json={'team_ids': [999]}, headers=headers).status_code == 400
+
+def test_coverage_routes_require_the_owner(roster):
+    """Test that a team's coverage is only shown to its owner."""
+    client = wsgi.app.test_client()
+    team_id = create_team("ash", "sky", [roster['charizard']])
+    misty = {"Authorization": f"Bearer {token_signer.issue('misty')}"}
+
+    assert client.get(f'/api/teams/{team_id}/coverage').status_code == 401
+    assert client.post('/api/coverage', json={'team_ids': [team_id]}).status_code == 401
+    assert client.get(f'/api/teams/{team_id}/coverage', headers=misty).status_code == 400
+    assert client.post('/api/coverage', json={'team_ids': [team_id]}, headers=misty).status_code == 400
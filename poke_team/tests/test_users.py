@@ -10,6 +10,8 @@ from app.models.user_model import (
     update_password,
     login
 )
+from app.utils.db_utils import get_db_connection
+from app.utils.password_hasher import PasswordHasher, hash_rounds
 
 
 ######################################################
@@ -35,13 +37,20 @@ def mock_cursor(mocker):
 
     # Mock the get_db_connection context manager from sql_utils
     @contextmanager
-    def mock_get_db_connection():
+    def mock_get_db_connection(*args, **kwargs):
         yield mock_conn  # Yield the mocked connection object
 
     mocker.patch("app.models.user_model.get_db_connection", mock_get_db_connection)
 
     return mock_cursor  # Return the mock cursor so we can set expectations per test
 
+@pytest.fixture
+def hasher(mocker):
+    """Hash on the calling thread with a low work factor."""
+    hasher = PasswordHasher(workers=0, rounds=4)
+    mocker.patch("app.models.user_model.password_hasher", hasher)
+    return hasher
+
 ######################################################
 #
 #    Create account
@@ -179,4 +188,50 @@ def test_login_wrong_password(mock_cursor):
     """Test logging into existing account with a wrong password"""
     mock_cursor.fetchone.return_value = False
 
-    assert False == login(username="user", password="wrong"), "Expected False, but got true"
\ No newline at end of file
+    assert False == login(username="user", password="wrong"), "Expected False, but got true"
+
+def stored_hash(username):
+    with get_db_connection(read_only=True) as conn:
+        return conn.execute("SELECT hashed_passwd FROM users WHERE username = ?", (username,)).fetchone()[0]
+
+def test_login_rehashes_with_configured_cost(sqlite_db, hasher):
+    """Test that a successful login upgrades a hash made with another work factor."""
+    create_account(username="bucket", password="hehehe")
+    assert hash_rounds(stored_hash("bucket")) == 4
+
+    hasher.rounds = 5
+    assert login(username="bucket", password="hehehe") is True
+
+    assert hash_rounds(stored_hash("bucket")) == 5
+    assert login(username="bucket", password="hehehe") is True
+    assert hasher.stats()['completed'] == 4  # create, check, rehash, check
+
+def test_login_succeeds_when_rehash_is_rejected(sqlite_db, hasher, mocker):
+    """Test that a saturated hasher skips the rehash but still logs the user in."""
+    create_account(username="bucket", password="hehehe")
+    before = stored_hash("bucket")
+    hasher.rounds = 5
+    hasher.queue_timeout = 0
+    check = hasher.check
+
+    def check_then_saturate(*args):
+        # Other requests take every slot between the password check and the rehash
+        result = check(*args)
+        hasher.queue_size = 0
+        return result
+    mocker.patch.object(hasher, "check", side_effect=check_then_saturate)
+
+    assert login(username="bucket", password="hehehe") is True
+
+    assert stored_hash("bucket") == before
+    assert hasher.stats()['rejected'] == 1
+
+def test_failed_login_does_not_rehash(sqlite_db, hasher):
+    """Test that a wrong password never rewrites the stored hash."""
+    create_account(username="bucket", password="hehehe")
+    before = stored_hash("bucket")
+
+    hasher.rounds = 5
+    assert login(username="bucket", password="wrong") is False
+
+    assert stored_hash("bucket") == before
@@ -0,0 +1,15 @@
+import wsgi
+
+
+def test_wsgi_serves_the_flask_app():
+    """Test that the production entry point exposes the app defined in app.py."""
+    response = wsgi.app.test_client().get("/api/health")
+
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'healthy'}
+
+def test_warm_caches_never_blocks_startup(mocker):
+    """Test that a failed warm-up is logged and the server still starts."""
+    mocker.patch("wsgi.poke_model.warm_pokemon_cache", side_effect=Exception("no such table: pokemon"))
+
+    wsgi.warm_caches(10)
@@ -0,0 +1,243 @@
+"""
+Local PokeAPI stand-in, for tests, benchmarks and offline runs of the app.
+
+Documents come from a dict given in code or from a cassette directory, where
+the document of /api/v2/pokemon/ditto is stored in api/v2/pokemon/ditto.json.
+A resource recorded by name is also served by id and the other way round. With
+record_from set, paths missing from the cassettes are fetched from that server
+(e.g. https://pokeapi.co) and saved, so a later run can replay them offline.
+
+Latency, random errors and throttling (429 with Retry-After once a token
+bucket runs dry) can be injected to reproduce a slow or flaky upstream.
+
+Usage:
+    python -m tools.fake_pokeapi --cassettes tests/cassettes [--record https://pokeapi.co]
+        [--port 8000] [--latency 0.05] [--jitter 0.05] [--error-rate 0.1] [--rate 20 --burst 40]
+
+then run the app with POKEAPI_URL=http://127.0.0.1:8000/api/v2/.
+"""
+import argparse
+from collections import Counter, defaultdict, deque
+import glob
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+import requests
+
+from app.utils.rate_limiter import TokenBucketLimiter
+
+
+class FakePokeAPI:
+    """
+    Minimal PokeAPI stand-in served from a background thread.
+
+    Documents are registered per path (e.g. "/api/v2/pokemon/ditto") or read
+    from cassette_dir. A path can also be given a queue of scripted status
+    codes that are answered before the document, to exercise retries.
+
+    Args:
+        documents (dict): Documents by path, checked before the cassettes.
+        latency (float): Seconds added to every answer.
+        jitter (float): Up to this many more seconds, drawn at random.
+        cassette_dir (str): Directory of recorded documents.
+        record_from (str): Server to fetch and record missing paths from.
+        error_rate (float): Fraction of requests answered with error_status.
+        error_status (int): Status of the injected errors.
+        rate (float): Requests allowed per second before answering 429, None for no limit.
+        burst (float): Requests allowed at once, rate by default.
+        seed (int): Seed of the latency and error draws, for repeatable runs.
+
+    Usage:
+        with FakePokeAPI({"/api/v2/pokemon/ditto": {...}}) as fake:
+            requests.get(fake.url + "/api/v2/pokemon/ditto")
+            assert fake.hits["/api/v2/pokemon/ditto"] == 1
+    """
+
+    def __init__(self, documents=None, latency=0.0, jitter=0.0, cassette_dir=None, record_from=None,
+                 error_rate=0.0, error_status=503, rate=None, burst=None, seed=None, host="127.0.0.1", port=0):
+        self.documents = dict(documents or {})
+        self.latency = latency
+        self.jitter = jitter
+        self.cassette_dir = cassette_dir
+        self.record_from = record_from.rstrip("/") if record_from else None
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.limiter = TokenBucketLimiter(rate, burst or rate) if rate else None
+        self.scripted = defaultdict(deque)
+        self.hits = Counter()
+        self.injected = Counter()
+        self.recorded = 0
+        self.address = (host, port)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def script(self, path, *statuses):
+        self.scripted[path].extend(statuses)
+
+    # Documents
+
+    def _cassette_path(self, path):
+        return os.path.join(self.cassette_dir, *path.strip("/").split("/")) + ".json"
+
+    def _from_cassettes(self, path):
+        if self.cassette_dir is None:
+            return None
+        try:
+            with open(self._cassette_path(path), "r") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            pass
+        # /pokemon/25 recorded as /pokemon/pikachu, or the other way round
+        resource, _, identifier = path.rpartition("/")
+        for candidate in glob.glob(os.path.join(self._cassette_path(resource)[:-len(".json")], "*.json")):
+            with open(candidate, "r") as fh:
+                document = json.load(fh)
+            if isinstance(document, dict) and identifier in (str(document.get('id')), document.get('name')):
+                return document
+        return None
+
+    def _record(self, path):
+        response = requests.get(self.record_from + path, timeout=30)
+        if response.status_code != 200:
+            return None
+        document = response.json()
+        target = self._cassette_path(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w") as fh:
+            json.dump(document, fh, sort_keys=True)
+        with self._lock:
+            self.recorded += 1
+        return document
+
+    def lookup(self, path):
+        """The document served for path, or None for a 404."""
+        document = self.documents.get(path)
+        if document is None:
+            document = self._from_cassettes(path)
+            if document is None and self.record_from and self.cassette_dir is not None:
+                document = self._record(path)
+            if document is not None:
+                # Parsed once, then served from memory
+                self.documents[path] = document
+        return document
+
+    # Faults
+
+    def _delay(self):
+        with self._lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+        return self.latency + extra
+
+    def _fault(self, path):
+        """The status to answer instead of the document, and the headers to send with it."""
+        with self._lock:
+            if self.scripted[path]:
+                return self.scripted[path].popleft(), {}
+        if self.limiter is not None:
+            retry_after = self.limiter.acquire("all")
+            if retry_after:
+                with self._lock:
+                    self.injected[429] += 1
+                return 429, {'Retry-After': str(math.ceil(retry_after))}
+        with self._lock:
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.injected[self.error_status] += 1
+                return self.error_status, {}
+        return None, {}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                # Like pokeapi.co, tolerate "v2//pokemon" style urls.
+                path = re.sub(r"/+", "/", self.path.split("?", 1)[0]).rstrip("/")
+                with fake._lock:
+                    fake.hits[path] += 1
+                status, headers = fake._fault(path)
+                delay = fake._delay()
+                if delay:
+                    time.sleep(delay)
+
+                document = fake.lookup(path) if status in (None, 200) else None
+                if status is None:
+                    status = 200 if document is not None else 404
+                body = json.dumps(document if status == 200 else {'detail': 'Not found.'}).encode('utf-8')
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(self.address, self._handler())
+        self._server.daemon_threads = True
+        # A short poll interval keeps stop() quick
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve recorded PokeAPI documents locally.")
+    parser.add_argument("--cassettes", required=True, help="directory of recorded documents")
+    parser.add_argument("--record", metavar="URL", help="fetch and record missing paths from this server, e.g. https://pokeapi.co")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every answer")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more seconds, at random")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate", type=float, help="requests per second before answering 429")
+    parser.add_argument("--burst", type=float)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    fake = FakePokeAPI(
+        cassette_dir=args.cassettes, record_from=args.record, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, error_status=args.error_status, rate=args.rate, burst=args.burst,
+        seed=args.seed, host=args.host, port=args.port,
+    )
+    fake.start()
+    print(f"Serving {args.cassettes} on {fake.url} (POKEAPI_URL={fake.url}/api/v2/)", flush=True)
+    try:
+        fake._thread.join()
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
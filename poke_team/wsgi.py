@@ -0,0 +1,51 @@
+"""
+WSGI entry point for production servers.
+
+The app package shadows app.py on the import path, so the Flask application is
+loaded from the file directly. With preloading on, this runs once in the server's
+master process before the workers are forked, so the caches warmed here are
+shared copy-on-write by every worker.
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import importlib.util
+import logging
+import os
+
+from app.models import poke_model
+from app.utils import db_utils
+from app.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+# Number of pokemon loaded into the Pokemon cache before the workers start
+WEB_WARM_POKEMON = int(os.getenv("WEB_WARM_POKEMON", "0"))
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location(
+        "poke_team_app", os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def warm_caches(limit: int = WEB_WARM_POKEMON) -> None:
+    if limit <= 0:
+        return
+    try:
+        logger.info("Warmed %d pokemon into the Pokemon cache", poke_model.warm_pokemon_cache(limit))
+    except Exception as e:
+        # A cold cache only costs latency; never refuse to start over it
+        logger.warning("Could not warm the Pokemon cache: %s", str(e))
+    finally:
+        # Workers open their own connections; do not carry the master's across fork
+        db_utils.close_db_connections()
+
+
+app = load_app()
+warm_caches()